@@ -0,0 +1,6 @@
+#!/bin/sh
+set -x
+LOGLEVEL=${1:-WARNING}
+
+# time the MIL pair features on sentences with at least 20 entities of the distant supervision corpus
+python src/mil_features_benchmark.py --log $LOGLEVEL --goldstd mirna_ds_annotated --models results/mirnads_ner --pairtype miRNA-gene --min-entities 20
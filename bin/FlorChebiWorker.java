@@ -0,0 +1,56 @@
+import java.io.BufferedReader;
+import java.io.FileDescriptor;
+import java.io.FileOutputStream;
+import java.io.InputStreamReader;
+import java.io.PrintStream;
+import java.util.ArrayList;
+
+import xldb.flor.match.FlorTextChebi3star;
+import xldb.flor.match.TextMatch;
+import xldb.flor.ontology_vocabulary.ProcessTerms;
+import xldb.tools.Database;
+
+/*
+ * Resident florchebi matcher, used by postprocessing/florchebi.py.
+ * The stopwords and the database connection are loaded once; then each line read from stdin is a term, and one line
+ * is written to stdout for each term: "id\tname\tscore" of the best match, an empty line if there is no match,
+ * or "ERROR\tmessage".
+ * args: the arguments of FlorTextChebi3star, without the text
+ * args[0] - icType (annotations/children)
+ * args[1] - use synonyms
+ * args[2] - ontology
+ * args[3] - use lemmas
+ * args[4] - find word location
+ * args[5] - tokenizer
+ * args[6] - stoplist
+ * args[7] - number of matches to return
+ */
+public class FlorChebiWorker {
+
+	public static void main(String[] args) throws Exception {
+		ArrayList<String> stopwords = ProcessTerms.getStopWords(args[6]);
+		Database db = new Database(args[2]);
+		PrintStream out = new PrintStream(new FileOutputStream(FileDescriptor.out), true, "UTF-8");
+		// the matcher prints debug lines, which would be mixed with the results
+		System.setOut(System.err);
+		BufferedReader in = new BufferedReader(new InputStreamReader(System.in, "UTF-8"));
+		String term;
+		while ((term = in.readLine()) != null) {
+			try {
+				FlorTextChebi3star ft = new FlorTextChebi3star(term, args[0], Boolean.parseBoolean(args[1]), stopwords,
+						db, args[2], Boolean.parseBoolean(args[3]), Boolean.parseBoolean(args[4]), args[5]);
+				TextMatch[] matches = ft.matchAll(Integer.parseInt(args[7]));
+				if (matches.length > 0) {
+					out.println(matches[0].getTerm().getId() + "\t" + matches[0].getTerm().getName() + "\t"
+							+ matches[0].getScore());
+				} else {
+					out.println();
+				}
+			} catch (Exception e) {
+				out.println("ERROR\t" + e.toString().replace('\n', ' '));
+			}
+		}
+		db.close();
+	}
+
+}
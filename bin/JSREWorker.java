@@ -0,0 +1,95 @@
+import java.io.BufferedReader;
+import java.io.BufferedWriter;
+import java.io.File;
+import java.io.FileDescriptor;
+import java.io.FileInputStream;
+import java.io.FileOutputStream;
+import java.io.InputStreamReader;
+import java.io.OutputStreamWriter;
+import java.io.PrintStream;
+import java.lang.reflect.InvocationTargetException;
+import java.lang.reflect.Method;
+import java.security.Permission;
+import java.util.ArrayList;
+
+/*
+ * Resident jSRE classifier, used by classification/rext/jsreserver.py.
+ * The JVM is started and the jSRE classes are loaded and compiled once; then each batch is read from stdin as a line
+ * with the number of examples followed by the example lines, classified with org.itc.irst.tcc.sre.Predict, and one
+ * line is written to stdout for each example, or a single "ERROR\tmessage" line if the batch could not be classified.
+ * Predict only reads the model from its file, so the model file is read again for each batch, from the page cache.
+ * args[0] - jSRE model file
+ * args[1] - directory for the examples and results files of the batches
+ */
+public class JSREWorker {
+
+	static class ExitException extends SecurityException {
+		ExitException(int status) {
+			super("jSRE exited with status " + status);
+		}
+	}
+
+	public static void main(String[] args) throws Exception {
+		File model = new File(args[0]);
+		File examples = new File(args[1], "examples.txt");
+		File results = new File(args[1], "results.txt");
+		Method predict = Class.forName("org.itc.irst.tcc.sre.Predict").getMethod("main", String[].class);
+		PrintStream out = new PrintStream(new FileOutputStream(FileDescriptor.out), true, "UTF-8");
+		// jSRE prints its evaluation, which would be mixed with the results
+		System.setOut(System.err);
+		// Predict must not stop the JVM at the end of a batch
+		System.setSecurityManager(new SecurityManager() {
+			public void checkExit(int status) {
+				throw new ExitException(status);
+			}
+
+			public void checkPermission(Permission perm) {
+			}
+		});
+		BufferedReader in = new BufferedReader(new InputStreamReader(System.in, "UTF-8"));
+		String header;
+		while ((header = in.readLine()) != null) {
+			int n = Integer.parseInt(header.trim());
+			ArrayList<String> lines = new ArrayList<String>(n);
+			for (int i = 0; i < n; i++) {
+				lines.add(in.readLine());
+			}
+			try {
+				results.delete();
+				BufferedWriter writer = new BufferedWriter(new OutputStreamWriter(new FileOutputStream(examples),
+						"UTF-8"));
+				for (String line : lines) {
+					writer.write(line);
+					writer.write("\n");
+				}
+				writer.close();
+				try {
+					predict.invoke(null, (Object) new String[] { examples.getPath(), model.getPath(),
+							results.getPath() });
+				} catch (InvocationTargetException e) {
+					if (!(e.getCause() instanceof ExitException)) {
+						throw e;
+					}
+				}
+				ArrayList<String> predictions = new ArrayList<String>(n);
+				BufferedReader reader = new BufferedReader(new InputStreamReader(new FileInputStream(results),
+						"UTF-8"));
+				String line;
+				while ((line = reader.readLine()) != null) {
+					predictions.add(line);
+				}
+				reader.close();
+				if (predictions.size() != n) {
+					throw new Exception("jSRE returned " + predictions.size() + " predictions for " + n + " examples");
+				}
+				for (String prediction : predictions) {
+					out.println(prediction);
+				}
+			} catch (Exception e) {
+				Throwable cause = e instanceof InvocationTargetException ? e.getCause() : e;
+				out.println("ERROR\t" + cause.toString().replace('\n', ' '));
+			}
+		}
+	}
+
+}
@@ -0,0 +1,49 @@
+from __future__ import division
+import argparse
+import codecs
+import logging
+import time
+
+from config import config
+from postprocessing import chebi_resolution
+from postprocessing.chebi_index import ChebiIndex
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare ChEBI resolution with the database and with the ChEBI index')
+    parser.add_argument("terms", help="file with one term per line")
+    parser.add_argument("--index", dest="index", default=config.chebi_index_path, help="ChEBI index file")
+    parser.add_argument("--skip-db", action="store_true", dest="skip_db", help="only time the index")
+    parser.add_argument("--log", action="store", dest="loglevel", default="WARNING", help="Log level")
+    options = parser.parse_args()
+    logging.basicConfig(level=getattr(logging, options.loglevel.upper()),
+                        format='%(asctime)s %(levelname)s %(filename)s:%(lineno)s:%(funcName)s %(message)s')
+
+    with codecs.open(options.terms, 'r', 'utf-8') as termsfile:
+        terms = [l.strip().encode("utf-8") for l in termsfile if l.strip()]
+    start_time = time.time()
+    index = ChebiIndex(options.index)
+    print "index opened in {:.3f}s".format(time.time() - start_time)
+    start_time = time.time()
+    index_matches = [index.find_term(t) for t in terms]
+    index_time = time.time() - start_time
+    print "index: {} terms in {:.1f}s ({:.1f} terms/s)".format(len(terms), index_time,
+                                                               len(terms) / max(index_time, 0.000001))
+    if options.skip_db:
+        return
+    config.chebi_backend = "mysql"
+    start_time = time.time()
+    db_matches = [chebi_resolution.find_chebi_term(t) for t in terms]
+    db_time = time.time() - start_time
+    print "database: {} terms in {:.1f}s ({:.1f} terms/s)".format(len(terms), db_time,
+                                                                  len(terms) / max(db_time, 0.000001))
+    different = [(t, m1, m2) for t, m1, m2 in zip(terms, db_matches, index_matches)
+                 if (m1[0], round(m1[2], 6)) != (m2[0], round(m2[2], 6))]
+    print "different matches: {}".format(len(different))
+    for t, m1, m2 in different[:10]:
+        print t, m1, m2
+    print "speedup: {:.1f}x".format(db_time / max(index_time, 0.000001))
+
+
+if __name__ == "__main__":
+    main()
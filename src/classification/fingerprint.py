@@ -0,0 +1,51 @@
+import hashlib
+import logging
+import os
+
+# increment when the sentence splitting or tokenization changes, so that every document is tagged again
+PREPROCESSING_VERSION = "1"
+
+
+def model_identity(path):
+    """
+    Identify a model by its path and the size and modification time of its files
+    :param path: model path, without extension
+    :return: string
+    """
+    identity = [path]
+    for f in (path, path + ".model", path + ".ser.gz"):
+        if os.path.isfile(f):
+            stat = os.stat(f)
+            identity.append("{}:{}:{}".format(os.path.basename(f), stat.st_size, int(stat.st_mtime)))
+    return "|".join(identity)
+
+
+def document_fingerprint(document, model_id):
+    """
+    Fingerprint of the text, pre-processing and model used to tag a document
+    :param document: Document object
+    :param model_id: string returned by model_identity
+    :return: hex digest
+    """
+    h = hashlib.md5()
+    h.update(PREPROCESSING_VERSION)
+    h.update(model_id.encode("utf-8"))
+    for sentence in document.sentences:
+        h.update(sentence.sid.encode("utf-8"))
+        h.update(" ".join([t.text for t in sentence.tokens]).encode("utf-8"))
+    return h.hexdigest()
+
+
+def get_fingerprints(corpus, model_id):
+    return dict((did, document_fingerprint(corpus.documents[did], model_id)) for did in corpus.documents)
+
+
+def get_changed_documents(corpus, fingerprints, previous_fingerprints):
+    """
+    :param fingerprints: did => fingerprint of the current documents
+    :param previous_fingerprints: did => fingerprint stored with the previous results
+    :return: list of dids that have to be tagged again
+    """
+    changed = [did for did in corpus.documents if previous_fingerprints.get(did) != fingerprints[did]]
+    logging.info("{}/{} documents changed since the previous results".format(len(changed), len(corpus.documents)))
+    return changed
@@ -0,0 +1,157 @@
+import atexit
+import logging
+import os
+import re
+import time
+from collections import OrderedDict
+
+from config import config
+
+
+class LoadedModel(object):
+    """Resources of a model kept warm by the registry, shared by every model object with the same path and type"""
+    def __init__(self, path, mtype, resource, size, load_time, unload=None):
+        self.path = path
+        self.mtype = mtype
+        self.resource = resource
+        self.size = size  # estimated memory in MB
+        self.load_time = load_time
+        self.unload = unload
+        self.hits = 0
+        self.refs = 0  # number of users that pinned the model; pinned models are not evicted
+
+    def close(self):
+        if self.unload is not None:
+            try:
+                self.unload(self.resource)
+            except Exception as e:
+                logging.info("could not unload {}: {}".format(self.path, e))
+        self.resource = None
+
+
+class ModelRegistry(object):
+    """
+    Keep loaded models (CRFsuite taggers, StanfordNER servers, matcher patterns, relation classifiers) in memory,
+    keyed by model path and type. Models are loaded lazily the first time they are requested and the least
+    recently used ones are unloaded when the memory budget (in MB) is exceeded.
+    A resource may be unloaded after get returns, so model objects should get it again each time they use it instead
+    of keeping it; models pinned with get(pin=True) are not unloaded until they are released.
+    """
+    def __init__(self, max_memory):
+        self.max_memory = max_memory
+        self.models = OrderedDict()  # (path, mtype) => LoadedModel, least recently used first
+        self.misses = {}  # (path, mtype) => number of times it had to be loaded
+        self.evictions = 0
+
+    def get(self, path, mtype, loader, unload=None, size=None, pin=False):
+        """
+        Return the resource associated with a model, loading it only if it is not in memory
+        :param path: path of the model file
+        :param mtype: type of model (crfsuite, stanfordner, matcher...)
+        :param loader: function without arguments that loads the model and returns the resource to be kept
+        :param unload: function that receives the resource and frees it (close tagger, kill process...)
+        :param size: estimated memory used by the model in MB; if None, the size of the model file is used
+        :param pin: do not unload the model until release is called
+        :return: model resource
+        """
+        key = (path, mtype)
+        if key in self.models:
+            entry = self.models.pop(key)
+            self.models[key] = entry  # move to the end: most recently used
+            entry.hits += 1
+            if pin:
+                entry.refs += 1
+            logging.debug("registry hit: {} ({})".format(path, mtype))
+            return entry.resource
+        logging.info("registry miss: loading {} ({})".format(path, mtype))
+        start_time = time.time()
+        resource = loader()
+        load_time = time.time() - start_time
+        if size is None:
+            size = file_size(path)
+        self.models[key] = LoadedModel(path, mtype, resource, size, load_time, unload)
+        if pin:
+            self.models[key].refs += 1
+        self.misses[key] = self.misses.get(key, 0) + 1
+        logging.info("loaded {} ({}) in {:.2f}s, {:.1f}MB".format(path, mtype, load_time, size))
+        self.evict(keep=key)
+        return resource
+
+    def release(self, path, mtype):
+        """
+        Unpin a model pinned by get, so that it can be evicted again
+        """
+        key = (path, mtype)
+        if key in self.models and self.models[key].refs > 0:
+            self.models[key].refs -= 1
+            self.evict()
+
+    def used_memory(self):
+        return sum([self.models[k].size for k in self.models])
+
+    def evict(self, keep=None):
+        """
+        Unload least recently used models until the memory budget is respected; pinned models are not unloaded
+        :param keep: key of a model that should never be unloaded (the one that was just requested)
+        """
+        for key in list(self.models.keys()):
+            if self.used_memory() <= self.max_memory:
+                break
+            if key == keep or self.models[key].refs > 0:
+                continue
+            logging.info("evicting {} ({}) from the registry".format(*key))
+            self.unload(*key)
+            self.evictions += 1
+        if self.used_memory() > self.max_memory:
+            logging.warning("registry is using {:.1f}MB of {}MB: the other models are in use".format(self.used_memory(),
+                                                                                                   self.max_memory))
+
+    def unload(self, path, mtype):
+        key = (path, mtype)
+        if key in self.models:
+            self.models.pop(key).close()
+
+    def unload_all(self):
+        for key in list(self.models.keys()):
+            self.unload(*key)
+
+    def stats(self):
+        """
+        :return: dictionary with load time, hits and size of each model in memory
+        """
+        models = []
+        for key in self.models:
+            entry = self.models[key]
+            models.append({"path": entry.path, "type": entry.mtype, "size": entry.size,
+                           "load_time": entry.load_time, "hits": entry.hits, "loads": self.misses.get(key, 0),
+                           "pinned": entry.refs})
+        return {"models": models, "used_memory": self.used_memory(), "max_memory": self.max_memory,
+                "evictions": self.evictions}
+
+    def log_stats(self):
+        for m in self.stats()["models"]:
+            logging.info("{path} ({type}): {hits} hits, {loads} loads, {load_time:.2f}s, {size:.1f}MB".format(**m))
+
+
+def file_size(path):
+    """
+    Estimate the memory used by a model from its file size, in MB
+    """
+    if os.path.isfile(path):
+        return os.path.getsize(path) / (1024.0 * 1024.0)
+    return 0
+
+
+def jvm_size(ram):
+    """
+    Convert a JVM memory option (-Xmx4g, -mx512m) to MB
+    """
+    match = re.search(r"(\d+)([kKmMgG]?)$", ram)
+    if not match:
+        return 0
+    value, unit = int(match.group(1)), match.group(2).lower()
+    return value * {"k": 1.0/1024, "m": 1, "g": 1024, "": 1.0/(1024*1024)}[unit]
+
+
+registry = ModelRegistry(config.model_registry_ram)
+atexit.register(registry.unload_all)
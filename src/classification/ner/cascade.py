@@ -0,0 +1,145 @@
+from __future__ import division
+import codecs
+import logging
+import time
+
+from classification.modelregistry import registry
+from classification.ner.matcher import MatcherModel
+from classification.ner.mirna_matcher import MirnaMatcher
+
+# registry key of the mirna filter, whose patterns are fixed and do not depend on a names file
+MIRNA_FILTER_PATH = "mirna_nomenclature"
+
+
+class CascadeFilter(object):
+    """
+    First stage of the NER cascade: cheap dictionary matching that decides which sentences
+    are sent to the expensive taggers (StanfordNER, CRFsuite, BANNER)
+    """
+    def __init__(self, matcher, path=None, size=None):
+        """
+        :param matcher: MatcherModel that loads the patterns
+        :param path: key of the patterns on the model registry; the path of the matcher by default
+        :param size: estimated memory of the patterns in MB; the size of the file of the matcher by default
+        """
+        self.matcher = matcher
+        if path is None:
+            path = matcher.path
+        self.names, self.patterns = registry.get(path, "cascade_" + matcher.etype, matcher.load_patterns, size=size)
+
+    def accept(self, sentence):
+        for p in self.patterns:
+            if p.search(sentence.text):
+                return True
+        return False
+
+
+def get_cascade_filter(name, path, etype):
+    """
+    :param name: matcher or mirna
+    :param path: path of the names pickle used by the matcher (ignored by the mirna filter)
+    :param etype: type of entities
+    :return: CascadeFilter object
+    """
+    if name == "mirna":
+        # a few regular expressions, built from the fixed miRNA prefixes
+        return CascadeFilter(MirnaMatcher(path), path=MIRNA_FILTER_PATH, size=0.1)
+    else:
+        return CascadeFilter(MatcherModel(path, etype))
+
+
+class CascadeReport(object):
+    """Speedup and recall lost by the first stage of the cascade, for each corpus"""
+    def __init__(self, etype):
+        self.etype = etype
+        self.corpora = {}  # corpus name => counts
+        self.filter_time = 0
+        self.tagging_time = 0
+
+    def add_sentence(self, corpus_name, sentence, accepted):
+        if corpus_name not in self.corpora:
+            self.corpora[corpus_name] = {"sentences": 0, "kept_sentences": 0, "tokens": 0, "kept_tokens": 0,
+                                         "entities": 0, "lost_entities": 0}
+        counts = self.corpora[corpus_name]
+        if self.etype == "all":
+            gold = sentence.entities.elist.get("goldstandard", [])
+        else:
+            gold = sentence.entities.elist.get("goldstandard_" + self.etype, [])
+        counts["sentences"] += 1
+        counts["tokens"] += len(sentence.tokens)
+        counts["entities"] += len(gold)
+        if accepted:
+            counts["kept_sentences"] += 1
+            counts["kept_tokens"] += len(sentence.tokens)
+        else:
+            counts["lost_entities"] += len(gold)
+
+    def get_lines(self):
+        """
+        Tagging time is assumed to be proportional to the number of tokens, so the time of the full run
+        is estimated from the time spent tagging the sentences that passed the filter.
+        """
+        lines = [["corpus", "sentences", "kept", "tokens", "kept", "speedup", "entities", "lost", "recall_lost"]]
+        all_tokens = sum([self.corpora[c]["tokens"] for c in self.corpora])
+        for c in sorted(self.corpora):
+            counts = self.corpora[c]
+            # share of the filter and tagging time spent on this corpus
+            filter_time = self.filter_time * counts["tokens"] / max(all_tokens, 1)
+            tagging_time = self.tagging_time * counts["kept_tokens"] / max(sum([self.corpora[x]["kept_tokens"]
+                                                                              for x in self.corpora]), 1)
+            if counts["kept_tokens"] > 0 and tagging_time + filter_time > 0:
+                full_time = tagging_time * counts["tokens"] / counts["kept_tokens"]
+                speedup = "{:.2f}".format(full_time / (tagging_time + filter_time))
+            else:
+                speedup = "NA"
+            if counts["entities"] > 0:
+                recall_lost = "{:.4f}".format(counts["lost_entities"] / counts["entities"])
+            else:
+                recall_lost = "NA"
+            lines.append([c, str(counts["sentences"]), str(counts["kept_sentences"]), str(counts["tokens"]),
+                          str(counts["kept_tokens"]), speedup, str(counts["entities"]), str(counts["lost_entities"]),
+                          recall_lost])
+        return lines
+
+    def write(self, path):
+        lines = self.get_lines()
+        for l in lines:
+            logging.info("\t".join(l))
+        logging.info("filter time: {:.2f}s tagging time: {:.2f}s".format(self.filter_time, self.tagging_time))
+        with codecs.open(path, 'w', 'utf-8') as reportfile:
+            for l in lines:
+                reportfile.write("\t".join(l) + "\n")
+        logging.info("wrote cascade report to {}".format(path))
+
+
+def apply_cascade(model, corpus, cascade_filter, etype, doc_sources={}):
+    """
+    Remove from the data loaded into a tagger the sentences rejected by the first stage of the cascade
+    :param model: SimpleTaggerModel with data already loaded (load_data)
+    :param corpus: Corpus object
+    :param cascade_filter: CascadeFilter object
+    :param etype: type of entities, used to count the gold standard entities lost
+    :param doc_sources: did => corpus name, to report each corpus separately
+    :return: CascadeReport object
+    """
+    report = CascadeReport(etype)
+    start_time = time.time()
+    kept = []
+    total = len(model.sids)
+    for isent, sid in enumerate(model.sids):
+        did = '.'.join(sid.split('.')[:-1])
+        sentence = corpus.documents[did].get_sentence(sid)
+        accepted = cascade_filter.accept(sentence)
+        report.add_sentence(doc_sources.get(did, corpus.path), sentence, accepted)
+        if accepted:
+            kept.append(isent)
+    model.sids = [model.sids[i] for i in kept]
+    model.data = [model.data[i] for i in kept]
+    model.tokens = [model.tokens[i] for i in kept]
+    if model.labels:
+        model.labels = [model.labels[i] for i in kept]
+    if getattr(model, "sentences", None):
+        model.sentences = [model.sentences[i] for i in kept]
+    report.filter_time = time.time() - start_time
+    logging.info("cascade kept {}/{} sentences".format(len(kept), total))
+    return report
@@ -0,0 +1,83 @@
+from __future__ import division
+import codecs
+import logging
+import os
+
+import pycrfsuite
+
+from classification.ner.crfsuitener import CrfSuiteModel
+from classification.ner.crfsweep import evaluate
+
+
+def get_model_info(modelpath):
+    tagger = pycrfsuite.Tagger()
+    tagger.open(modelpath)
+    info = tagger.info()
+    tagger.close()
+    return info
+
+
+def get_kept_attributes(modelpath, threshold=None, topk=None):
+    """
+    Select the state features of a trained model by weight
+    :param modelpath: CRFsuite model file
+    :param threshold: drop features with absolute weight below this value
+    :param topk: keep only the k features with the highest absolute weight
+    :return: set of attributes used by the features kept
+    """
+    state_features = get_model_info(modelpath).state_features  # (attribute, label) => weight
+    ranked = sorted(state_features.items(), key=lambda x: abs(x[1]), reverse=True)
+    if threshold is not None:
+        ranked = [f for f in ranked if abs(f[1]) >= threshold]
+    if topk is not None:
+        ranked = ranked[:topk]
+    logging.info("kept {}/{} state features".format(len(ranked), len(state_features)))
+    return set([f[0][0] for f in ranked])
+
+
+def prune_data(data, attributes):
+    return [tuple([set([f for f in token if f in attributes]) for token in xseq]) for xseq in data]
+
+
+def model_stats(modelpath, data, labels):
+    tagger = pycrfsuite.Tagger()
+    tagger.open(modelpath)
+    nfeatures = len(tagger.info().state_features)
+    f1, speed = evaluate(tagger, data, labels)
+    tagger.close()
+    return {"size": os.path.getsize(modelpath), "features": nfeatures, "speed": speed, "f1": f1}
+
+
+def prune_model(model, outpath, eval_data, eval_labels, threshold=None, topk=None):
+    """
+    Retrain a CRFsuite model using only the attributes of its highest weighted state features
+    :param model: CrfSuiteModel already trained, with its training data loaded
+    :param outpath: path of the compacted model, without extension
+    :param eval_data: features of the sentences used to compare both models
+    :param eval_labels: gold labels of the sentences used to compare both models
+    :return: stats of the original and compacted models
+    """
+    attributes = get_kept_attributes(model.path + ".model", threshold, topk)
+    pruned = CrfSuiteModel(outpath, model.etype, subtype=model.subtype)
+    pruned.data = prune_data(model.data, attributes)
+    pruned.labels = model.labels
+    pruned.train()
+    original_stats = model_stats(model.path + ".model", eval_data, eval_labels)
+    pruned_stats = model_stats(outpath + ".model", prune_data(eval_data, attributes), eval_labels)
+    return original_stats, pruned_stats
+
+
+def write_prune_report(original_stats, pruned_stats, path):
+    lines = ["model\tsize\tstate_features\ttokens_per_second\tf1"]
+    for name, stats in (("original", original_stats), ("pruned", pruned_stats)):
+        lines.append("{0}\t{1[size]}\t{1[features]}\t{1[speed]:.1f}\t{1[f1]:.4f}".format(name, stats))
+    lines.append("change\t{:+.1%}\t{:+.1%}\t{:+.1%}\t{:+.4f}".format(
+        pruned_stats["size"] / original_stats["size"] - 1,
+        pruned_stats["features"] / max(original_stats["features"], 1) - 1,
+        pruned_stats["speed"] / max(original_stats["speed"], 0.000001) - 1,
+        pruned_stats["f1"] - original_stats["f1"]))
+    with codecs.open(path, 'w', 'utf-8') as reportfile:
+        for l in lines:
+            logging.info(l)
+            reportfile.write(l + "\n")
+    logging.info("wrote pruning report to {}".format(path))
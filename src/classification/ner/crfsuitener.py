@@ -3,6 +3,7 @@ import math
 import pycrfsuite
 import sys
 
+from classification.modelregistry import registry
 from classification.ner.simpletagger import SimpleTaggerModel, create_entity
 from classification.results import ResultsNER
 
@@ -11,12 +12,15 @@ class CrfSuiteModel(SimpleTaggerModel):
     def __init__(self, path, etype, **kwargs):
         super(CrfSuiteModel, self).__init__(path, etype, **kwargs)
 
-    def train(self):
+    def train(self, params=None):
+        """
+        :param params: CRFsuite parameters that replace the default ones (c1, c2, max_iterations...)
+        """
         logging.info("Training model with CRFsuite")
         self.trainer = pycrfsuite.Trainer(verbose=False, algorithm="lbfgs")
         for xseq, yseq in zip(self.data, self.labels):
             self.trainer.append(xseq, yseq)
-        self.trainer.set_params({
+        trainer_params = {
             #'c1': 0.0,   # coefficient for L1 penalty
              #'c2': 1e-3,  # coefficient for L2 penalty
              #'c2': 2,
@@ -24,39 +28,59 @@ class CrfSuiteModel(SimpleTaggerModel):
 
             # include transitions that are possible, but not observed
             'feature.possible_transitions': True
-        })
+        }
+        if params:
+            trainer_params.update(params)
+        self.trainer.set_params(trainer_params)
         print "training model..."
         self.trainer.train(self.path + ".model")  # output model filename
         print "done."
 
 
     def load_tagger(self, port=None):
+        """
+        Load the tagger into the model registry. The tagger is not kept by the model, since the registry may unload
+        it when other models are loaded; test gets it from the registry again.
+        """
+        self.get_tagger()
+
+    def get_tagger(self, pin=False):
+        return registry.get(self.path + ".model", "crfsuite", self.open_tagger, unload=lambda t: t.close(), pin=pin)
+
+    def open_tagger(self):
         logging.info("Loading %s" % self.path + ".model")
-        self.tagger = pycrfsuite.Tagger()
-        self.tagger.open(self.path + ".model")
+        tagger = pycrfsuite.Tagger()
+        tagger.open(self.path + ".model")
+        return tagger
 
     def test(self, corpus, port=None):
         logging.info("Testing with %s" % self.path + ".model")
         #self.predicted = [tagger.tag(xseq) for xseq in self.data]
-        for xseq in self.data:
-            #logging.debug(xseq)
-            self.predicted.append(self.tagger.tag(xseq))
-            self.scores.append([])
-            for i, x in enumerate(self.predicted[-1]):
-                #logging.debug("{0}-{1}".format(i,x))
-                prob = self.tagger.marginal(x, i)
-                if math.isnan(prob):
-                    print "NaN!!"
-                    if x == "other":
-                        prob = 0
-                    else:
-                        print x, xseq[i]
-                        #print xseq
-                        #print self.predicted[-1]
-                        #sys.exit()
-                #else:
-                #    print prob
-                self.scores[-1].append(prob)
+        # pinned, so that the tagger is not closed while it is being used
+        self.tagger = self.get_tagger(pin=True)
+        try:
+            for xseq in self.data:
+                #logging.debug(xseq)
+                self.predicted.append(self.tagger.tag(xseq))
+                self.scores.append([])
+                for i, x in enumerate(self.predicted[-1]):
+                    #logging.debug("{0}-{1}".format(i,x))
+                    prob = self.tagger.marginal(x, i)
+                    if math.isnan(prob):
+                        print "NaN!!"
+                        if x == "other":
+                            prob = 0
+                        else:
+                            print x, xseq[i]
+                            #print xseq
+                            #print self.predicted[-1]
+                            #sys.exit()
+                    #else:
+                    #    print prob
+                    self.scores[-1].append(prob)
+        finally:
+            self.tagger = None
+            registry.release(self.path + ".model", "crfsuite")
         results = self.process_results(corpus)
         return results
 
@@ -0,0 +1,171 @@
+from __future__ import division
+import codecs
+import cPickle as pickle
+import itertools
+import logging
+import multiprocessing
+import os
+import random
+import time
+
+import pycrfsuite
+
+from classification.ner.crfsuitener import CrfSuiteModel
+from classification.results import SINGLE_TAG, START_TAG, MIDDLE_TAG, END_TAG
+
+# feature sets are selected from the feature dump by feature name
+FEATURE_SETS = {"all": None,
+                "nocontext": lambda f: not f.startswith("prev") and not f.startswith("next"),
+                "noaffix": lambda f: "prefix" not in f and "suffix" not in f,
+                "nolemma": lambda f: "lemma" not in f and "postag" not in f}
+
+# each configuration is trained once, L-BFGS stops when the log likelihood improves less than delta over period
+# iterations, or after max_iterations
+MAX_ITERATIONS = 1000
+
+sweep_data = None  # (train_data, train_labels, dev_data, dev_labels) loaded once by each worker
+
+
+def dump_features(model, path, dev_ratio=0.2, seed=1):
+    """
+    Split the data loaded into a CrfSuiteModel into train and dev sets and save it to be shared by the workers
+    :param model: CrfSuiteModel with data loaded (load_data)
+    :param path: dump file
+    :param dev_ratio: proportion of sentences used as held-out dev set
+    """
+    indexes = range(len(model.data))
+    random.Random(seed).shuffle(indexes)
+    ndev = int(len(indexes) * dev_ratio)
+    dev, train = indexes[:ndev], indexes[ndev:]
+    data = ([model.data[i] for i in train], [model.labels[i] for i in train],
+            [model.data[i] for i in dev], [model.labels[i] for i in dev])
+    with open(path, 'wb') as dumpfile:
+        pickle.dump(data, dumpfile, pickle.HIGHEST_PROTOCOL)
+    logging.info("saved {} train and {} dev sentences to {}".format(len(train), len(dev), path))
+
+
+def load_dump(path):
+    global sweep_data
+    with open(path, 'rb') as dumpfile:
+        sweep_data = pickle.load(dumpfile)
+
+
+def select_features(data, feature_set):
+    keep = FEATURE_SETS[feature_set]
+    if keep is None:
+        return data
+    return [tuple([set([f for f in token if keep(f.split("=")[0])]) for token in xseq]) for xseq in data]
+
+
+def get_spans(labels):
+    """
+    :param labels: sequence of token labels (single, start, middle, end, other)
+    :return: set of (start, end) token spans of the entities
+    """
+    spans = set()
+    start = None
+    for i, l in enumerate(labels):
+        if l == SINGLE_TAG:
+            spans.add((i, i))
+            start = None
+        elif l == START_TAG:
+            start = i
+        elif l == MIDDLE_TAG and start is None:
+            start = i
+        elif l == END_TAG:
+            spans.add((i if start is None else start, i))
+            start = None
+    return spans
+
+
+def evaluate(tagger, data, labels):
+    """
+    Tag the dev set and compare the entity spans with the gold labels
+    :return: F1, tokens tagged per second
+    """
+    tp, fp, fn = 0, 0, 0
+    ntokens = 0
+    start_time = time.time()
+    predicted = [tagger.tag(xseq) for xseq in data]
+    tagging_time = time.time() - start_time
+    for ipred, pred in enumerate(predicted):
+        ntokens += len(pred)
+        pred_spans = get_spans(pred)
+        gold_spans = get_spans(labels[ipred])
+        tp += len(pred_spans & gold_spans)
+        fp += len(pred_spans - gold_spans)
+        fn += len(gold_spans - pred_spans)
+    precision = tp / (tp + fp) if tp + fp > 0 else 0
+    recall = tp / (tp + fn) if tp + fn > 0 else 0
+    f1 = 2 * precision * recall / (precision + recall) if precision + recall > 0 else 0
+    return f1, ntokens / max(tagging_time, 0.000001)
+
+
+def run_config(args):
+    """
+    Train one configuration once, with the L-BFGS stopping criterion, and evaluate it on the dev set
+    :param args: (configuration dictionary, model path, period, delta)
+    :return: configuration dictionary updated with training time, tagging speed, F1 and iterations
+    """
+    conf, path, period, delta = args
+    train_data, train_labels, dev_data, dev_labels = sweep_data
+    train_data = select_features(train_data, conf["features"])
+    dev_data = select_features(dev_data, conf["features"])
+    model = CrfSuiteModel(path, "all")
+    model.data, model.labels = train_data, train_labels
+    start_time = time.time()
+    model.train(params={"c1": conf["c1"], "c2": conf["c2"], "max_iterations": MAX_ITERATIONS,
+                        "period": period, "delta": delta})
+    training_time = time.time() - start_time
+    iterations = len(model.trainer.logparser.iterations)
+    tagger = pycrfsuite.Tagger()
+    tagger.open(path + ".model")
+    f1, speed = evaluate(tagger, dev_data, dev_labels)
+    tagger.close()
+    logging.info("{}: {} iterations F1={:.4f}".format(os.path.basename(path), iterations, f1))
+    result = conf.copy()
+    result.update({"f1": f1, "speed": speed, "iterations": iterations, "training_time": training_time,
+                   "model": path + ".model"})
+    return result
+
+
+def get_configs(c1_values, c2_values, feature_sets, nsamples=None, seed=1):
+    """
+    :return: list of configurations of the grid, or a random sample of nsamples configurations
+    """
+    configs = [{"c1": c1, "c2": c2, "features": fs} for c1, c2, fs in itertools.product(c1_values, c2_values,
+                                                                                         feature_sets)]
+    if nsamples and nsamples < len(configs):
+        configs = random.Random(seed).sample(configs, nsamples)
+    return configs
+
+
+def run_sweep(dumppath, basepath, configs, nworkers=4, period=10, delta=1e-5):
+    """
+    Train each configuration in a pool of worker processes sharing the same feature dump
+    :param dumppath: features dump created with dump_features
+    :param basepath: path prefix of the models trained
+    :param configs: list of configuration dictionaries (c1, c2, features)
+    :param nworkers: number of worker processes
+    :param period: number of iterations used by the L-BFGS stopping criterion
+    :param delta: minimum improvement of the log likelihood over period iterations to continue training
+    :return: list of results sorted by F1
+    """
+    tasks = [(c, "{}_sweep{}".format(basepath, i), period, delta) for i, c in enumerate(configs)]
+    logging.info("running {} configurations on {} workers".format(len(tasks), nworkers))
+    pool = multiprocessing.Pool(processes=nworkers, initializer=load_dump, initargs=(dumppath,))
+    try:
+        results = pool.map(run_config, tasks, chunksize=1)
+    finally:
+        pool.close()
+        pool.join()
+    return sorted(results, key=lambda r: r["f1"], reverse=True)
+
+
+def write_leaderboard(results, path):
+    with codecs.open(path, 'w', 'utf-8') as board:
+        board.write("rank\tc1\tc2\tfeatures\titerations\ttraining_time\ttokens_per_second\tf1\tmodel\n")
+        for i, r in enumerate(results):
+            board.write("{0}\t{1[c1]}\t{1[c2]}\t{1[features]}\t{1[iterations]}\t{1[training_time]:.1f}\t"
+                        "{1[speed]:.1f}\t{1[f1]:.4f}\t{1[model]}\n".format(i + 1, r))
+    logging.info("wrote leaderboard to {}".format(path))
@@ -1,6 +1,7 @@
 import logging
 import pickle
 import re
+from classification.modelregistry import registry
 from text.offset import partial_overlap_after, partial_overlap_before, contained_by, perfect_overlap, Offsets, Offset, \
     contains
 
@@ -37,13 +38,18 @@ class MatcherModel(object):
         pickle.dump(self.names, open(self.path, "wb"))
         logging.info("saved to {}".format(self.path))
 
-    def test(self, corpus):
+    def load_patterns(self):
         logging.info("loading names...")
-        self.names = pickle.load(open(self.path, "rb"))
+        names = pickle.load(open(self.path, "rb"))
         logging.info("compiling regex...")
-        for n in self.names:
+        patterns = []
+        for n in names:
             logging.info(n)
-            self.p.append(re.compile(r"(\A|\s)(" + n + r")(\s|\Z|\.|,)", re.I))
+            patterns.append(re.compile(r"(\A|\s)(" + n + r")(\s|\Z|\.|,)", re.I))
+        return names, patterns
+
+    def test(self, corpus):
+        self.names, self.p = registry.get(self.path, "matcher", self.load_patterns)
         # self.p = [re.compile(r"(\A|\s)(" + n + r")(\s|\Z|\.)", rext.I) for n in self.names]
         logging.info("testing {} documents".format(len(corpus.documents)))
         did_count = 1
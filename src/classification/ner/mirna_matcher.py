@@ -10,7 +10,7 @@ class MirnaMatcher(MatcherModel):
        Does not need training, since it is based on the fixed nomenclature of miRNAs.
     """
     def __init__(self, path, **kwargs):
-        super(MirnaMatcher, self).__init__(path, **kwargs)
+        super(MirnaMatcher, self).__init__(path, "mirna", **kwargs)
         # best prefixes for miRNA corpus
         # self.names = set(["mir", "let", "miR", "hsa", "microRNA", "MicroRNA", "miR", "mir", "miR", "lin", "MiR",
         #                  "miRNA", "hsa-miR", "miRNA", "Let", "pre-miR", "premiR", "Hsa-miR", "Mir", "cel-miR"])
@@ -21,7 +21,8 @@ class MirnaMatcher(MatcherModel):
         # these expressions may be used to refer to multiple miRNAs
         #self.separators = set(["/",r"\s", r",\s", r"\sand\s", "-", r"\sand\s"])
 
-    def test(self, corpus):
+    def load_patterns(self):
+        patterns = []
         for n in self.names:
             # logging.info(n)
             # regex explanation:
@@ -29,12 +30,16 @@ class MirnaMatcher(MatcherModel):
             # include the prefix and then words or dashes
             # end with whitespace, end of string, dot, comma or )
             # best for miRNA corpus
-            self.p.append(re.compile(r"(\(|\A|\s|Ad-|pEGFP-)(" + n + r"[\s-]?\d{1,3}?\w?-?[a-z]?/?\d{0,3}?\w?)(\s|\Z|\.|\*|//|,|-[a-z]{3,}|\))")) # , rext.I))
+            patterns.append(re.compile(r"(\(|\A|\s|Ad-|pEGFP-)(" + n + r"[\s-]?\d{1,3}?\w?-?[a-z]?/?\d{0,3}?\w?)(\s|\Z|\.|\*|//|,|-[a-z]{3,}|\))")) # , rext.I))
             # best for miRTex
             #self.p.append(re.compile(r"(\(|\A|\s|\w|)(" + n + r"[\s-]?\d{1,3}?\w?-?[a-z]?\d{0,3}?\w?\*?)(\/|\s|\Z|\.|\*|,|-[a-z]{3,}|\)|\()")) # , rext.I))
 
             # self.p.append(rext.compile(r"(\(|\A|\s)(" + rext.escape(n) + r"[\w-]*[" + "|".join(self.separators) + r"\w" + r"]*)(\Z|\.|\)|/)"))
         # self.p = [rext.compile(r"(\A|\s)(" + n + r")(\s|\Z|\.)", rext.I) for n in self.names]
+        return self.names, patterns
+
+    def test(self, corpus):
+        self.names, self.p = self.load_patterns()
         logging.info("testing {} documents".format(len(corpus.documents)))
         logging.debug("with these patterns:")
         for r in self.p:
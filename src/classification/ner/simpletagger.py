@@ -9,7 +9,7 @@ import os
 import atexit
 import time
 import cPickle as pickle
-sys.path.append(os.path.abspath(os.path.dirname(__file__)
+sys.path.append(os.path.abspath(os.path.dirname(__file__)))
 import gc
 from classification.model import Model
 from text.chemical_entity import element_base, ChemicalEntity
@@ -11,6 +11,7 @@ import errno
 
 from text.protein_entity import ProteinEntity
 from text.offset import Offsets, Offset
+from classification.modelregistry import registry, jvm_size
 from classification.results import ResultsNER
 from classification.ner.simpletagger import SimpleTaggerModel, create_entity
 from config import config
@@ -86,18 +87,25 @@ class StanfordNERModel(SimpleTaggerModel):
 
         tagged_sentences = []
         logging.info("sending sentences to tagger {}...".format(self.path))
-        for isent, sid in enumerate(self.sids):
-            #out = self.tagger.tag_text(replace_abbreviations(" ".join([t.text for t in self.tokens[isent]])))
-            #out = self.tagger.tag_text(self.sentences[isent])
-            #text = self.sentences[isent]
-            text = " ".join([t.text for t in self.tokens[isent]])
-            #logging.info("tagging: {}/{} - {}={}".format(isent, len(self.sids), sid, did))
-            out = self.annotate_sentence(text)
-            tagged_sentences.append(out)
+        # pinned, so that the server is not killed while the sentences are sent
+        self.load_tagger(self.port or 9181, pin=True)
+        try:
+            for isent, sid in enumerate(self.sids):
+                #out = self.tagger.tag_text(replace_abbreviations(" ".join([t.text for t in self.tokens[isent]])))
+                #out = self.tagger.tag_text(self.sentences[isent])
+                #text = self.sentences[isent]
+                text = " ".join([t.text for t in self.tokens[isent]])
+                #logging.info("tagging: {}/{} - {}={}".format(isent, len(self.sids), sid, did))
+                out = self.annotate_sentence(text)
+                tagged_sentences.append(out)
+        finally:
+            registry.release(self.path + ".ser.gz", "stanfordner")
         results = self.process_results(tagged_sentences, corpus)
         return results
 
     def annotate_sentence(self, text):
+        # the server may have been killed by the registry since it was loaded: get it again, on the same port
+        self.load_tagger(self.port or 9181)
         self.tagger = ner.SocketNER("localhost", self.port, output_format='inlineXML')
         try:
             out = self.tagger.tag_text(text)
@@ -111,7 +119,7 @@ class StanfordNERModel(SimpleTaggerModel):
         return out
 
     def kill_process(self):
-        self.process.kill()
+        registry.unload(self.path + ".ser.gz", "stanfordner")
 
     def process_results(self, sentences, corpus):
         results = ResultsNER(self.path)
@@ -217,23 +225,31 @@ class StanfordNERModel(SimpleTaggerModel):
         return tagged
 
 
-    def load_tagger(self, port=9181):
+    def load_tagger(self, port=9181, pin=False):
         """
-        Start the server process with the classifier
+        Get the server process with the classifier from the model registry, starting it if necessary
+        :param pin: keep the server running until registry.release is called
         :return:
         """
+        self.process, self.port = registry.get(self.path + ".ser.gz", "stanfordner", lambda: self.start_server(port),
+                                               unload=lambda r: r[0].kill(), size=jvm_size(self.RAM_TEST), pin=pin)
+
+    def start_server(self, port):
+        """
+        Start the server process with the classifier
+        :return: (process, port)
+        """
         # check if it already loaded (and then kill that instance)
         kill_process(port)
-        self.port = port
         ner_args = ["java", self.RAM_TEST, "-Dfile.encoding=UTF-8", "-cp", self.STANFORD_NER, "edu.stanford.nlp.ie.NERServer",
                     "-port", str(port), "-loadClassifier", self.path + ".ser.gz",
                     "-tokenizerFactory", "edu.stanford.nlp.process.WhitespaceTokenizer", "-tokenizerOptions",
                     "tokenizeNLs=true"]
         logging.info(' '.join(ner_args))
-        logging.info("Starting the server for {} on {}...".format(self.path, self.port))
-        self.process = Popen(ner_args, stdin = PIPE, stdout = PIPE, stderr = PIPE, shell=False)
+        logging.info("Starting the server for {} on {}...".format(self.path, port))
+        process = Popen(ner_args, stdin = PIPE, stdout = PIPE, stderr = PIPE, shell=False)
         while True:
-            out = self.process.stderr.readline()
+            out = process.stderr.readline()
             if out and out != "":
                 logging.info(out)
             if "done" in out:
@@ -242,7 +258,7 @@ class StanfordNERModel(SimpleTaggerModel):
         #out = ner.communicate("Structure-activity relationships have been investigated for inhibition of DNA-dependent protein kinase (DNA-PK) and ATM kinase by a series of pyran-2-ones, pyran-4-ones, thiopyran-4-ones, and pyridin-4-ones.")
         #logging.info(out)
         #print 'Success!!'
-        atexit.register(self.kill_process)
+        return process, port
 
 
 def kill_process(port):
@@ -261,4 +277,3 @@ def kill_process(port):
             pid = match.group('pid')
             logging.info("killing process {}".format(pid))
             Popen(['kill', '-9', pid])
->>>>>>> master
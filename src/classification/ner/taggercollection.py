@@ -1,6 +1,7 @@
 import logging
 import multiprocessing
 
+from classification.modelregistry import registry
 from classification.ner.crfsuitener import CrfSuiteModel
 from classification.ner.simpletagger import feature_extractors
 from classification.results import ResultSetNER
@@ -54,6 +55,9 @@ class TaggerCollection(object):
             self.models[t] = model
 
     def load_models(self):
+        """
+        Load the model of each subtype; taggers already in the model registry are reused instead of reloaded
+        """
         for i, t in enumerate(self.types):
             # model = StanfordNERModel(self.basepath + "_" + t, t, subtypes=self.basemodel.subtypes)
             model = CrfSuiteModel(self.basepath + "_" + t, t, subtypes=self.basemodel.subtypes)
@@ -89,5 +93,6 @@ class TaggerCollection(object):
         for res, i in enumerate(all_results):
             #logging.debug("adding these results: {}".format(self.types[i]))
             results.add_results(res)
+        registry.log_stats()
         return results
 
@@ -91,6 +91,7 @@ class ResultsNER(object):
         self.name = name
         self.corpus = Corpus(self.name)
         self.basedir = "models/ensemble/"
+        self.fingerprints = {}  # did => fingerprint of the text, pre-processing and model used
 
     def get_ensemble_results(self, ensemble, corpus, model):
         """
@@ -148,6 +149,27 @@ class ResultsNER(object):
 
         self.corpus = corpus
 
+    def merge_previous(self, previous, corpus, changed):
+        """
+        Add the results of the documents that were not tagged again, from results saved by a previous run
+        :param previous: ResultsNER object loaded from a pickle
+        :param corpus: Corpus object with every document
+        :param changed: set of dids tagged by this run
+        """
+        reused = 0
+        for did in corpus.documents:
+            if did in changed or did not in previous.corpus:
+                continue
+            for sentence in corpus.documents[did].sentences:
+                if sentence.sid in previous.corpus[did]:
+                    sentence.entities = previous.corpus[did][sentence.sid]
+            reused += 1
+        for eid in previous.entities:
+            if previous.entities[eid].did not in changed and previous.entities[eid].did in corpus.documents:
+                self.entities[eid] = previous.entities[eid]
+        self.corpus = corpus
+        logging.info("reused the results of {} documents".format(reused))
+
     def combine_results(self, basemodel, name):
         # add another set of anotations to each sentence, ending in combined
         # each entity from this dataset should have a unique ID and a recognized_by attribute
@@ -0,0 +1,114 @@
+import cPickle as pickle
+import logging
+import os
+from collections import OrderedDict
+
+
+class BagStore(object):
+    """
+    Disk-backed store of multi-instance bags. Bags are appended to a data file as pickled records
+    (bag, instances, label) and an index keeps the position of the records of each bag, so bags can be read by entity
+    pair or iterated without loading the whole store into memory. A bag appended more than once (for example, from
+    different corpora) keeps all its instances, and its label is 1 if any of the records has label 1.
+    """
+    def __init__(self, path, mode="a"):
+        """
+        :param path: data file; the index is saved to path + ".idx"
+        :param mode: "w" to create an empty store, "a" to append to an existing store, "r" to only read
+        """
+        self.path = path
+        self.indexpath = path + ".idx"
+        self.mode = mode
+        self.index = OrderedDict()  # bag => list of (offset, length) of its records, in order of first insertion
+        self.labels = {}  # bag => label
+        self.ninstances = 0
+        if mode == "w":
+            for f in (self.path, self.indexpath):
+                if os.path.isfile(f):
+                    os.remove(f)
+        if not os.path.isfile(self.path):
+            open(self.path, 'wb').close()
+        elif os.path.isfile(self.indexpath) and os.path.getmtime(self.indexpath) >= os.path.getmtime(self.path):
+            self.load_index()
+        else:
+            self.rebuild_index()
+        self.datafile = open(self.path, 'rb' if mode == "r" else 'a+b')
+
+    def load_index(self):
+        with open(self.indexpath, 'rb') as indexfile:
+            self.index, self.labels, self.ninstances = pickle.load(indexfile)
+
+    def save_index(self):
+        with open(self.indexpath, 'wb') as indexfile:
+            pickle.dump((self.index, self.labels, self.ninstances), indexfile, pickle.HIGHEST_PROTOCOL)
+
+    def rebuild_index(self):
+        """
+        Read every record of the data file to build the index, if it was not saved or is older than the data
+        """
+        logging.info("rebuilding bag index of {}".format(self.path))
+        self.index, self.labels, self.ninstances = OrderedDict(), {}, 0
+        with open(self.path, 'rb') as datafile:
+            while True:
+                offset = datafile.tell()
+                try:
+                    bag, instances, label = pickle.load(datafile)
+                except EOFError:
+                    break
+                self.add_to_index(bag, offset, datafile.tell() - offset, len(instances), label)
+
+    def add_to_index(self, bag, offset, length, ninstances, label):
+        if bag not in self.index:
+            self.index[bag] = []
+            self.labels[bag] = label
+        self.index[bag].append((offset, length))
+        self.labels[bag] = max(self.labels[bag], label)
+        self.ninstances += ninstances
+
+    def append(self, bag, instances, label):
+        """
+        Add the instances of a bag to the store
+        :param bag: entity pair (e1.normalized, e2.normalized)
+        :param instances: list of instance strings
+        :param label: 1 or -1
+        """
+        if self.mode == "r":
+            raise IOError("{} was opened read-only".format(self.path))
+        self.datafile.seek(0, os.SEEK_END)
+        offset = self.datafile.tell()
+        pickle.dump((bag, instances, label), self.datafile, pickle.HIGHEST_PROTOCOL)
+        self.add_to_index(bag, offset, self.datafile.tell() - offset, len(instances), label)
+
+    def get(self, bag):
+        """
+        :param bag: entity pair
+        :return: list of instances and label of the bag
+        """
+        self.datafile.flush()
+        instances = []
+        for offset, length in self.index[bag]:
+            self.datafile.seek(offset)
+            instances += pickle.loads(self.datafile.read(length))[1]
+        return instances, self.labels[bag]
+
+    def __iter__(self):
+        """
+        Stream the bags of the store, in order of first insertion
+        :return: generator of (bag, instances, label)
+        """
+        for bag in list(self.index.keys()):
+            instances, label = self.get(bag)
+            yield bag, instances, label
+
+    def __contains__(self, bag):
+        return bag in self.index
+
+    def __len__(self):
+        return len(self.index)
+
+    def close(self):
+        if self.mode != "r":
+            self.datafile.flush()
+            self.save_index()
+        self.datafile.close()
+        logging.info("{}: {} bags, {} instances".format(self.path, len(self.index), self.ninstances))
@@ -0,0 +1,125 @@
+from collections import OrderedDict
+
+# relations whose two entities must have the same type
+IDENTICAL_TYPE_RELATIONS = ("Has_Sequence_Identical_To", "Is_Functionally_Equivalent_To")
+PRUNING_RULES = ("type", "identical_type", "same_offset", "same_text")
+
+
+class CandidateGenerator(object):
+    """
+    Candidate pairs of a relation type between the entities of a sentence.
+    The entities are bucketed by type, so only pairs of compatible types are enumerated, and the cheap rules
+    (identical types, same offset and same text) are applied before the pairs are returned.
+    The number of possible pairs, generated pairs and pairs pruned by each rule is kept in self.counts.
+    """
+    def __init__(self, source_types, target_types, pairtype=None, ordered=True, same_offset=False, same_text=False):
+        """
+        :param source_types: entity types of the first entity
+        :param target_types: entity types of the second entity
+        :param pairtype: relation type; if it is one of IDENTICAL_TYPE_RELATIONS, both entities must have the same type
+        :param ordered: if True, every ordered pair (e1, e2) is a candidate, as with itertools.permutations;
+        if False, each pair of entities is considered once, as with itertools.combinations, and returned with
+        the source entity first
+        :param same_offset: skip pairs of entities with the same start or end
+        :param same_text: skip pairs of entities with the same text
+        """
+        self.source_types = source_types
+        self.target_types = target_types
+        self.identical_type = pairtype in IDENTICAL_TYPE_RELATIONS
+        self.ordered = ordered
+        self.same_offset = same_offset
+        self.same_text = same_text
+        self.counts = None
+        self.reset_counts()
+
+    def reset_counts(self):
+        """
+        :return: counts before the reset
+        """
+        counts = self.counts
+        self.counts = OrderedDict([("total", 0), ("generated", 0)] + [(r, 0) for r in PRUNING_RULES])
+        return counts
+
+    def add_counts(self, counts):
+        for k in counts:
+            self.counts[k] = self.counts.get(k, 0) + counts[k]
+
+    def prune(self, rule, n=1):
+        """
+        Record n candidates removed by a rule applied outside of the generator
+        """
+        self.counts["generated"] -= n
+        self.counts[rule] = self.counts.get(rule, 0) + n
+
+    def report(self):
+        pruned = ", ".join(["{}: {}".format(k, self.counts[k]) for k in self.counts if k not in ("total", "generated")])
+        return "{} candidate pairs generated out of {} ({})".format(self.counts["generated"], self.counts["total"],
+                                                                   pruned)
+
+    def get_index_pairs(self, entities):
+        """
+        :param entities: list of entities of a sentence
+        :return: list of (i1, i2), indexes of the entities of each candidate, in the order of
+        itertools.permutations (or combinations, if not ordered)
+        """
+        n = len(entities)
+        buckets = OrderedDict()  # type => indexes of the entities of that type
+        for i, e in enumerate(entities):
+            buckets.setdefault(e.type, []).append(i)
+        sources = []
+        targets = []
+        for etype in buckets:
+            if etype in self.source_types:
+                sources += buckets[etype]
+            if etype in self.target_types:
+                targets += buckets[etype]
+        sources.sort()
+        targets.sort()
+        both = len(set(sources) & set(targets))
+        # number of pairs with compatible types
+        compatible = len(sources) * len(targets) - both
+        if self.ordered:
+            possible = n * (n - 1)
+        else:
+            possible = n * (n - 1) // 2
+            compatible -= both * (both - 1) // 2
+        if self.identical_type:
+            candidates = []
+            for etype in buckets:
+                if etype in self.source_types and etype in self.target_types:
+                    candidates += [(i1, i2) for i1 in buckets[etype] for i2 in buckets[etype]
+                                   if i1 != i2 and (self.ordered or i1 < i2)]
+            candidates.sort()
+            self.counts["identical_type"] += compatible - len(candidates)
+        elif self.ordered:
+            candidates = [(i1, i2) for i1 in sources for i2 in targets if i1 != i2]
+        else:
+            sources = set(sources)
+            targets = set(targets)
+            candidates = []
+            indexes = sorted(sources | targets)
+            for i1, i2 in [(i1, i2) for i1 in indexes for i2 in indexes if i1 < i2]:
+                if i1 in sources and i2 in targets:
+                    candidates.append((i1, i2))
+                elif i2 in sources and i1 in targets:
+                    candidates.append((i2, i1))
+        self.counts["total"] += possible
+        self.counts["type"] += possible - compatible
+        result = []
+        for i1, i2 in candidates:
+            e1, e2 = entities[i1], entities[i2]
+            if self.same_offset and (e1.start == e2.start or e1.end == e2.end):
+                self.counts["same_offset"] += 1
+            elif self.same_text and e1.text == e2.text:
+                self.counts["same_text"] += 1
+            else:
+                result.append((i1, i2))
+        self.counts["generated"] += len(result)
+        return result
+
+    def get_pairs(self, entities):
+        """
+        :param entities: list of entities of a sentence
+        :return: list of candidate pairs (e1, e2)
+        """
+        return [(entities[i1], entities[i2]) for i1, i2 in self.get_index_pairs(entities)]
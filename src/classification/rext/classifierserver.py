@@ -0,0 +1,155 @@
+import logging
+import os
+import threading
+import time
+from Queue import Queue, Empty
+
+from classification.rext.workspace import create_workspace, remove_workspace
+
+
+class ClassifierRequest(object):
+    """Example lines sent by one caller and the predictions returned for them, in the same order"""
+    def __init__(self, lines):
+        self.lines = lines
+        self.predictions = None
+        self.error = None
+        self.done = threading.Event()
+
+
+class ClassifierWorker(threading.Thread):
+    """
+    Resident classifier worker. Example lines queued by every caller during the batch window are classified by a
+    single run of the external classifier, so its startup and model loading are shared by the whole batch.
+    Each worker has its own workspace directory for the files exchanged with the classifier.
+    """
+    def __init__(self, server, wid):
+        super(ClassifierWorker, self).__init__(name="{}-worker-{}".format(server.name, wid))
+        self.daemon = True
+        self.server = server
+        self.workspace = create_workspace("{}_worker{}".format(server.name, wid), server.temp_dir)
+        self.batches = 0
+
+    def run(self):
+        while True:
+            request = self.server.requests.get()
+            if request is None:
+                self.server.requests.put(None)  # let the other workers stop too
+                break
+            batch = [request]
+            nlines = len(request.lines)
+            deadline = time.time() + self.server.batch_wait
+            # wait a little for other callers, to classify their examples with the same run
+            while nlines < self.server.max_batch:
+                try:
+                    request = self.server.requests.get(timeout=max(deadline - time.time(), 0))
+                except Empty:
+                    break
+                if request is None:
+                    self.server.requests.put(None)
+                    break
+                batch.append(request)
+                nlines += len(request.lines)
+            self.classify(batch)
+            if request is None:
+                break
+        remove_workspace(self.workspace)
+
+    def classify(self, batch):
+        lines = [l for r in batch for l in r.lines]
+        try:
+            # the server is created in the workspace of the model that started it, which may have been removed since
+            if not os.path.isdir(self.workspace):
+                os.makedirs(self.workspace)
+            predictions = self.server.classify(lines, self.workspace) if lines else []
+            if len(predictions) != len(lines):
+                raise RuntimeError("{} returned {} predictions for {} examples".format(self.server.name,
+                                                                                      len(predictions), len(lines)))
+            i = 0
+            for r in batch:
+                r.predictions = predictions[i:i + len(r.lines)]
+                i += len(r.lines)
+        except Exception as e:
+            logging.error("{} batch of {} examples failed: {}".format(self.server.name, len(lines), e))
+            for r in batch:
+                r.error = e
+        for r in batch:
+            r.done.set()
+        self.batches += 1
+        logging.debug("{}: classified {} examples from {} requests".format(self.name, len(lines), len(batch)))
+
+
+class ClassifierServer(object):
+    """
+    Long-lived classification service for one model of an external classifier. Callers send example lines with
+    predict and receive the predictions in the same order; with more than one worker, batches of concurrent callers
+    are classified in parallel (pool mode). Subclasses implement classify.
+    """
+    def __init__(self, name, modelpath, nworkers=1, batch_wait=0.05, max_batch=10000, temp_dir="temp/", timeout=600):
+        """
+        :param name: name of the classifier, used to name the workers and their workspaces
+        :param modelpath: model file
+        :param nworkers: number of batches classified at the same time
+        :param batch_wait: seconds to wait for other callers before starting a batch
+        :param max_batch: maximum number of examples per batch
+        :param temp_dir: directory where the workspaces of the workers are created
+        :param timeout: seconds to wait for the predictions of a request
+        """
+        self.name = name
+        self.modelpath = modelpath
+        self.nworkers = nworkers
+        self.batch_wait = batch_wait
+        self.max_batch = max_batch
+        self.temp_dir = temp_dir
+        self.timeout = timeout
+        self.requests = Queue()
+        self.workers = []
+        self.stopped = False
+
+    def start(self):
+        if not os.path.isfile(self.modelpath):
+            raise IOError("{} model {} not found".format(self.name, self.modelpath))
+        if not os.path.isdir(self.temp_dir):
+            os.makedirs(self.temp_dir)
+        for i in range(self.nworkers):
+            worker = ClassifierWorker(self, i)
+            worker.start()
+            self.workers.append(worker)
+        logging.info("started {} server for {} with {} workers".format(self.name, self.modelpath, self.nworkers))
+        return self
+
+    def predict(self, lines):
+        """
+        Classify example lines
+        :param lines: list of example lines, ending in newline
+        :return: list of prediction lines, in the same order
+        """
+        if not lines:
+            return []
+        if self.stopped:
+            raise RuntimeError("{} server for {} was stopped".format(self.name, self.modelpath))
+        request = ClassifierRequest(lines)
+        self.requests.put(request)
+        if not request.done.wait(self.timeout):
+            raise RuntimeError("{} server for {} did not classify {} examples in {}s".format(self.name, self.modelpath,
+                                                                                          len(lines), self.timeout))
+        if request.error is not None:
+            raise request.error
+        return request.predictions
+
+    def classify(self, lines, workspace):
+        """
+        Run the external classifier on a batch of example lines
+        :param lines: list of example lines
+        :param workspace: directory of the worker, for the input and output files
+        :return: list of prediction lines
+        """
+        raise NotImplementedError
+
+    def stop(self):
+        self.stopped = True
+        self.requests.put(None)
+        for worker in self.workers:
+            worker.join()
+        logging.info("stopped {} server for {} after {} batches".format(self.name, self.modelpath,
+                                                                         sum([w.batches for w in self.workers])))
+        self.workers = []
@@ -33,7 +33,7 @@ import relations
 
 
 basedir = "models/ddi_models/"
-temp_dir = "temp/"
+temp_dir = "temp/"  # default directory of the example and output files
 
 def reparse_tree(line):
     ptree = Tree.fromstring(line)
@@ -159,7 +159,7 @@ def generatejSRE_line(pairtext, pos, lemmas, ner):
         body += " " + str(it+1) + "&&#candidate#&&#candidate#&&-None-&&drug&&T "
     return body
 
-def generatejSREdata(pairs, sentence, basemodel, savefile, train=False):
+def generatejSREdata(pairs, sentence, basemodel, savefile, train=False, workspace=temp_dir):
     examplelines = []
     for pair in pairs:
         #logging.debug(pair)
@@ -191,11 +191,11 @@ def generatejSREdata(pairs, sentence, basemodel, savefile, train=False):
         #elif candidates[0] > 1 or candidates[1] > 1:
         #    print "multiple candidates!!", pairtext
     # logging.debug("writing to file...")
-    with open(temp_dir + savefile, 'w') as trainfile:
+    with open(workspace + savefile, 'w') as trainfile:
         for l in examplelines:
             #print l
             trainfile.write(l)
-    # logging.info("wrote " + temp_dir + savefile)
+    # logging.info("wrote " + workspace + savefile)
 
 
 def compact_id(eid):
@@ -239,11 +239,11 @@ def blind_all_entities(tokens, entities, eids, pos, lemmas, ner):
     return tokens, pos, lemmas, ner
 
 
-def trainjSRE(inputfile, model="slk_classifier.model"):
+def trainjSRE(inputfile, model="slk_classifier.model", workspace=temp_dir):
     if os.path.isfile("ddi_models/" + model):
         print "removed old model"
         os.remove("ddi_models/" + model)
-    if not os.path.isfile(temp_dir + inputfile):
+    if not os.path.isfile(workspace + inputfile):
         print "could not find training file " + basedir + inputfile
         sys.exit()
     if platform.system() == "Windows":
@@ -254,7 +254,7 @@ def trainjSRE(inputfile, model="slk_classifier.model"):
     classpath = 'jsre/jsre-1.1/bin/' + sep + sep.join(["jsre/jsre-1.1/lib/" + l for l in libs])
     jsrecall = ['java', '-mx8g', '-classpath', classpath, "org.itc.irst.tcc.sre.Train",
                       "-k",  "SL", "-n", "4", "-w", "3", "-m", "4098",  "-c", "2",
-                      temp_dir + inputfile, basedir + model]
+                      workspace + inputfile, basedir + model]
     #print " ".join(jsrecall)
     jsrecall = Popen(jsrecall, stdout = PIPE, stderr = PIPE)
     res  = jsrecall.communicate()
@@ -272,9 +272,9 @@ def trainjSRE(inputfile, model="slk_classifier.model"):
     #logging.debug(res)
 
 
-def testjSRE(inputfile, outputfile, model="slk_classifier.model"):
-    if os.path.isfile(temp_dir + outputfile):
-        os.remove(temp_dir + outputfile)
+def testjSRE(inputfile, outputfile, model="slk_classifier.model", workspace=temp_dir):
+    if os.path.isfile(workspace + outputfile):
+        os.remove(workspace + outputfile)
     if not os.path.isfile(basedir + model):
         print "model", basedir + model, "not found"
         sys.exit()   
@@ -282,30 +282,30 @@ def testjSRE(inputfile, outputfile, model="slk_classifier.model"):
         sep = ";"
     else:
         sep = ":"
-    #logging.debug("testing %s with %s to %s", temp_dir + inputfile,
-    #              basedir + model, temp_dir + outputfile)
+    #logging.debug("testing %s with %s to %s", workspace + inputfile,
+    #              basedir + model, workspace + outputfile)
     libs = ["libsvm-2.8.jar", "log4j-1.2.8.jar", "commons-digester.jar", "commons-beanutils.jar", "commons-logging.jar", "commons-collections.jar"]
     classpath = 'bin/jsre/jsre-1.1/bin/' + sep + sep.join(["bin/jsre/jsre-1.1/lib/" + l for l in libs])
     jsrecommand = ['java', '-mx4g', '-classpath', classpath, "org.itc.irst.tcc.sre.Predict",
-                      temp_dir + inputfile, basedir + model, temp_dir + outputfile]
+                      workspace + inputfile, basedir + model, workspace + outputfile]
     #print ' '.join(jsrecommand)
     jsrecall = Popen(jsrecommand, stdout = PIPE, stderr = PIPE)
     res = jsrecall.communicate()
     #logging.debug(res[0].strip().split('\n')[-2:])
     #os.system(' '.join(jsrecommand))
-    if not os.path.isfile(temp_dir + outputfile):
+    if not os.path.isfile(workspace + outputfile):
         print "something went wrong with JSRE!"
         print res
         sys.exit()
     #logging.debug("done.")
 
 
-def getjSREPredicitons(examplesfile, resultfile, pairs):
+def getjSREPredicitons(examplesfile, resultfile, pairs, workspace=temp_dir):
     #pred_y = []
-    with open(temp_dir + resultfile, 'r') as resfile:
+    with open(workspace + resultfile, 'r') as resfile:
         pred = resfile.readlines()
 
-    with open(temp_dir + examplesfile, 'r') as trainfile:
+    with open(workspace + examplesfile, 'r') as trainfile:
         original = trainfile.readlines()
 
     if len(pred) != len(original):
@@ -459,15 +459,15 @@ def trainSVMTK(docs, pairs, dditype, model="svm_tk_classifier.model", excludesen
         sys.exit()
 
 
-def testSVMTK(sentence, pairs, pairs_list, model="svm_tk_classifier.model", tag=""):
-    if os.path.isfile(basedir + tag + "svm_test_data.txt"):
-            os.remove(basedir + tag + "svm_test_data.txt")
-    if os.path.isfile(basedir + tag + "svm_test_output.txt"):
-            os.remove(basedir + tag + "svm_test_output.txt")
+def testSVMTK(sentence, pairs, pairs_list, model="svm_tk_classifier.model", tag="", workspace=temp_dir):
+    if os.path.isfile(workspace + tag + "svm_test_data.txt"):
+            os.remove(workspace + tag + "svm_test_data.txt")
+    if os.path.isfile(workspace + tag + "svm_test_output.txt"):
+            os.remove(workspace + tag + "svm_test_output.txt")
     #docs = use_external_data(docs, excludesentences, dditype)
     #pidlist = pairs.keys()
     total = 0
-    with open(temp_dir + tag + "svm_test_data.txt", 'w') as test:
+    with open(workspace + tag + "svm_test_data.txt", 'w') as test:
         for pid in pairs:
             sid = pairs[pid].sid
             tree = sentence.parsetree
@@ -484,17 +484,17 @@ def testSVMTK(sentence, pairs, pairs_list, model="svm_tk_classifier.model", tag=
             total += 1
     #print "tree errors:", xerrors, "total:", total
     svmtklightargs = ["./bin/svm-light-TK-1.2/svm-light-TK-1.2.1/svm_classify",
-                          temp_dir + tag + "svm_test_data.txt",  basedir + model,
-                          temp_dir + tag + "svm_test_output.txt"]
+                          workspace + tag + "svm_test_data.txt",  basedir + model,
+                          workspace + tag + "svm_test_output.txt"]
     svmlightcall = Popen(svmtklightargs, stdout=PIPE, stderr=PIPE)
     res  = svmlightcall.communicate()
     # logging.debug(res[0].split('\n')[-3:])
     #os.system(' '.join(svmtklightargs))
-    if not os.path.isfile(temp_dir + tag + "svm_test_output.txt"):
+    if not os.path.isfile(workspace + tag + "svm_test_output.txt"):
         print "something went wrong with SVM-light-TK"
         print res
         sys.exit()
-    with open(temp_dir + tag + "svm_test_output.txt", 'r') as out:
+    with open(workspace + tag + "svm_test_output.txt", 'r') as out:
         lines = out.readlines()
     if len(lines) != len(pairs_list):
         print "check " + tag + "svm_test_output.txt! something is wrong"
@@ -4,15 +4,65 @@ import logging
 import random
 import sys
 
+from classification.rext.candidates import CandidateGenerator
+from classification.rext.jsreserver import get_jsre_server
 from classification.rext.kernelmodels import ReModel
 from subprocess import Popen, PIPE
 import platform
 import itertools
 import codecs
+import multiprocessing
 from classification.results import ResultsRE
 from config import config
 from text.pair import Pairs
 
+jsre_generator = None  # JSREKernel used by each example generation worker
+
+
+def init_generator(pairtype, modelname, ner):
+    global jsre_generator
+    jsre_generator = JSREKernel(None, pairtype, modelname=modelname, ner=ner)
+
+
+def generate_document_candidates(document):
+    """
+    :return: candidates of the document and the candidate counts of this document
+    """
+    candidates = jsre_generator.get_document_candidates(document)
+    return candidates, jsre_generator.candidates.reset_counts()
+
+
+def iter_results(pred_lines, original_lines):
+    """
+    Parse the jSRE predictions together with their example lines, one line of each at a time, so that large results
+    files can be streamed instead of read into memory; each line is split only once
+    :param pred_lines: iterable of jSRE output lines (e.g. the open results file)
+    :param original_lines: iterable of jSRE input lines, in the same order
+    :return: generator of (pid, prediction, original line)
+    """
+    for pred, original in itertools.izip_longest(pred_lines, original_lines):
+        if pred is None or original is None:
+            raise ValueError("different number of predictions and examples")
+        # the second column is <pid>.i0
+        pid = original.split('\t', 2)[1].rsplit('.', 1)[0]
+        yield pid, float(pred.strip()), original
+
+
+def group_results(results):
+    """
+    Group parsed jSRE results by sentence, so that the results of each sentence are found in constant time
+    :param results: iterable of (pid, prediction, original line), with the pids of get_sentence_lines (<sid>.p<n>)
+    :return: dictionary {sid: ([(pid, prediction)], [original line])}
+    """
+    grouped = {}
+    for pid, p, original in results:
+        sid = pid.rsplit('.', 1)[0]
+        if sid not in grouped:
+            grouped[sid] = ([], [])
+        grouped[sid][0].append((pid, p))
+        grouped[sid][1].append(original)
+    return grouped
+
 
 class JSREKernel(ReModel):
 
@@ -25,15 +75,24 @@ class JSREKernel(ReModel):
         self.pairs = {}
         self.resultsfile = None
         self.examplesfile = None
+        self.server = None  # resident jSRE server, used instead of running jSRE for each call
         self.ner_model = ner
         self.entitytypes = (config.relation_types[self.pairtype]["source_types"], config.relation_types[self.pairtype]["target_types"])
+        # candidates of the annotated sentences, and of the training and test data
+        self.sentence_candidates = CandidateGenerator(self.entitytypes[0], self.entitytypes[1])
+        self.candidates = CandidateGenerator(self.entitytypes[0], self.entitytypes[1], pairtype=self.pairtype,
+                                             same_offset=True)
         self.corpus = corpus
 
-    def load_classifier(self, outputfile="jsre_results.txt"):
-        self.resultsfile = self.temp_dir + self.pairtype + "_" + outputfile
-        self.examplesfile = self.temp_dir + self.modelname + ".txt"
-        if os.path.isfile(self.temp_dir + self.pairtype + "_" + outputfile):
-            os.remove(self.temp_dir + self.pairtype + "_" + outputfile)
+    def load_classifier(self, outputfile="jsre_results.txt", server=False):
+        """
+        :param outputfile: name of the jSRE results file
+        :param server: classify with a resident jSRE server shared by every JSREKernel using the same model
+        """
+        self.resultsfile = self.workspace + self.pairtype + "_" + outputfile
+        self.examplesfile = self.get_examples_file()
+        if os.path.isfile(self.resultsfile):
+            os.remove(self.resultsfile)
         if not os.path.isfile(self.basedir + self.modelname):
             print "model", self.basedir +  self.modelname, "not found"
             sys.exit()
@@ -49,14 +108,32 @@ class JSREKernel(ReModel):
                           self.examplesfile, self.basedir + self.modelname,
                           self.resultsfile]
         #print ' '.join(jsrecommand)
+        if server:
+            self.get_server()
+
+    def get_server(self):
+        """
+        :return: resident jSRE server of the model; it is got from the model registry on each use, since the registry
+        stops the servers that it evicts
+        """
+        self.server = get_jsre_server(self.basedir + self.modelname, self.workspace)
+        return self.server
+
+    def get_examples_file(self):
+        """
+        :return: path of the examples file of this model instance, on its workspace
+        """
+        if self.examplesfile is None:
+            self.examplesfile = self.workspace + os.path.basename(self.modelname) + ".txt"
+        return self.examplesfile
 
     def train(self):
         self.generatejSREdata(self.corpus, train=True, pairtype=self.pairtype)
         if os.path.isfile(self.basedir + self.modelname):
             print "removed old model"
             os.remove(self.basedir + self.modelname)
-        if not os.path.isfile(self.temp_dir + self.modelname  + ".txt"):
-            print "could not find training file " + self.basedir + self.modelname + ".txt"
+        if not os.path.isfile(self.get_examples_file()):
+            print "could not find training file " + self.get_examples_file()
             sys.exit()
         if platform.system() == "Windows":
             sep = ";"
@@ -67,7 +144,7 @@ class JSREKernel(ReModel):
         classpath = 'bin/jsre/jsre-1.1/bin/' + sep + sep.join(["bin/jsre/jsre-1.1/lib/" + l for l in libs])
         jsrecall = ['java', '-mx8g', '-classpath', classpath, "org.itc.irst.tcc.sre.Train",
                           "-k",  "SL", "-n", "3", "-w", "3", "-m", "3072", #  "-c", str(3),
-                          self.temp_dir + self.modelname + ".txt", self.basedir + self.modelname]
+                          self.get_examples_file(), self.basedir + self.modelname]
         logging.info("saving model to {}".format(self.basedir + self.modelname))
         print " ".join(jsrecall)
         jsrecall = Popen(jsrecall) #, stdout=PIPE, stderr=PIPE)
@@ -88,6 +165,13 @@ class JSREKernel(ReModel):
 
     def test(self):
         self.generatejSREdata(self.corpus, train=False, pairtype=self.pairtype)
+        if self.server is not None:
+            with codecs.open(self.examplesfile, 'r', 'utf-8') as examples:
+                pred = self.get_server().predict(examples.readlines())
+            with open(self.resultsfile, 'w') as resfile:
+                resfile.writelines(pred)
+            logging.debug("done.")
+            return
         # print " ".join(self.test_jsre)
         jsrecall = Popen(self.test_jsre, stdout=PIPE, stderr=PIPE)
         res = jsrecall.communicate()
@@ -117,9 +201,10 @@ class JSREKernel(ReModel):
                                        [e1id, e2id], pos, lemmas, ner)
 
     def annotate_sentence(self, sentence):
-        self.write_sentence_data_to_file(sentence)
-        self.run_jsre()
-        return self.open_results()
+        """
+        :return: (pred, original) of the sentence, as accepted by process_sentence
+        """
+        return self.annotate_sentences([sentence])[sentence.sid]
 
     def run_jsre(self):
         jsrecall = Popen(self.test_jsre, stdout=PIPE, stderr=PIPE)
@@ -131,10 +216,25 @@ class JSREKernel(ReModel):
             with open(self.resultsfile, 'r') as results:
                 return results.read()
 
-    def write_sentence_data_to_file(self, sentence):
-        if os.path.isfile(self.temp_dir + self.modelname + ".txt"):
+    def write_sentence_data_to_file(self, sentences):
+        """
+        Write the example lines of a list of sentences to a new examples file
+        """
+        if os.path.isfile(self.get_examples_file()):
             logging.info("removed old data")
-            os.remove(self.temp_dir + self.modelname + ".txt")
+            os.remove(self.get_examples_file())
+        examplelines = [l for sentence in sentences for l in self.get_sentence_lines(sentence)]
+        logging.debug("writing {} lines to file...".format(len(examplelines)))
+        with codecs.open(self.get_examples_file(), 'a', "utf-8") as trainfile:
+            for il, l in enumerate(examplelines):
+                trainfile.write(l)
+
+    def get_sentence_lines(self, sentence):
+        """
+        Generate the jSRE example lines of each candidate pair of a sentence
+        :param sentence: Sentence object
+        :return: list of example lines
+        """
         pcount = 0
         examplelines = []
         if self.ner_model == "all":
@@ -145,42 +245,35 @@ class JSREKernel(ReModel):
             sentence_entities = [entity for entity in sentence.entities.elist[self.ner_model]]
         #print sentence.sid, self.ner_model, len(sentence.entities.elist[self.ner_model]), sentence_entities
         # logging.debug("sentence {} has {} entities ({})".format(sentence.sid, len(sentence_entities), len(sentence.entities.elist["goldstandard"])))
-        for pair in itertools.permutations(sentence_entities, 2):
-            if pair[0].type in self.entitytypes[0] and pair[1].type in self.entitytypes[1]:  # or\
-                pid = sentence.sid + ".p" + str(pcount)
-                self.pairs[pid] = pair
-                tokens_text, pos, lemmas, ner = self.get_sentence_instance(sentence, pair[0].eid, pair[1].eid, pair)
-                body = self.generatejSRE_line(tokens_text, pos, lemmas, ner)
-                examplelines.append('0\t' + pid + '.i' + '0\t' + body + '\n')
-                pcount += 1
-        logging.debug("writing {} lines to file...".format(len(examplelines)))
-        with codecs.open(self.temp_dir + self.modelname + ".txt", 'a', "utf-8") as trainfile:
-            for il, l in enumerate(examplelines):
-                trainfile.write(l)
+        for pair in self.sentence_candidates.get_pairs(sentence_entities):
+            pid = sentence.sid + ".p" + str(pcount)
+            self.pairs[pid] = pair
+            tokens_text, pos, lemmas, ner = self.get_sentence_instance(sentence, pair[0].eid, pair[1].eid, pair)
+            body = self.generatejSRE_line(tokens_text, pos, lemmas, ner)
+            examplelines.append('0\t' + pid + '.i' + '0\t' + body + '\n')
+            pcount += 1
+        return examplelines
 
     def annotate_sentences(self, sentences):
         """
-        Process multiple sentences at once
+        Process multiple sentences at once: jSRE is run once for every sentence and its output is parsed once
         :param sentences: List of sentence objects (should be from the same doc
-        :return: Dictionary {sid: (pred, original}
+        :return: Dictionary {sid: (pred, original)}, where pred is the list of (pid, prediction) and original the list
+        of example lines of the sentence
         """
+        if self.server is not None:
+            # send every sentence in the same request, so that they are classified by the same batch
+            lines = [l for sentence in sentences for l in self.get_sentence_lines(sentence)]
+            results = group_results(iter_results(self.get_server().predict(lines), lines))
+        else:
+            self.write_sentence_data_to_file(sentences)
+            self.run_jsre()
+            with open(self.resultsfile, 'r') as resfile:
+                with codecs.open(self.examplesfile, 'r', 'utf-8') as trainfile:
+                    results = group_results(iter_results(resfile, trainfile))
         for sentence in sentences:
-            self.write_sentence_data_to_file(sentence)
-        self.run_jsre()
-        results = {}
-        with open(self.resultsfile, 'r') as resfile:
-            pred = resfile.readlines()
-        with codecs.open(self.examplesfile, 'r', 'utf-8') as trainfile:
-            original = trainfile.readlines()
-        for sentence in sentences:
-            sentence_pred, sentence_original = [], []
-            for i in range(len(pred)):
-                original_tsv = original[i].split('\t')
-                sid = '.'.join(original_tsv[1].split('.')[:-2])
-                if sid == sentence.sid:
-                    sentence_pred.append(pred[i])
-                    sentence_original.append(original[i])
-            results[sentence.sid] = (sentence_pred, sentence_original)
+            if sentence.sid not in results:
+                results[sentence.sid] = ([], [])
         return results
 
     def open_results(self):
@@ -192,107 +285,103 @@ class JSREKernel(ReModel):
 
     def process_sentence(self, pred, original, sentence):
         """
-        Given the raw output and input of JSRE, return list of relations
-        :param pred: JSRE output string
-        :param original: JSRE input string
+        Given the parsed output and input of JSRE, return list of relations
+        :param pred: list of (pid, prediction), as returned by annotate_sentences
+        :param original: JSRE input lines
         :param sentence: sentence object
         :return: list of pairs
         """
         pairs = []
-        for i in range(len(pred)):
-            original_tsv = original[i].split('\t')
-            pid = '.'.join(original_tsv[1].split('.')[:-1])
-
-            p = float(pred[i].strip())
+        for pid, p in pred:
             if p == 1:
                 pair = sentence.add_relation(self.pairs[pid][0], self.pairs[pid][1], self.pairtype,
                                                           relation=True)
                 pairs.append(pair)
         return pairs
 
-    def generatejSREdata(self, corpus, train=False, pairtype="all"):
-        if os.path.isfile(self.temp_dir + self.modelname + ".txt"):
-            # print "removed old data"
-            os.remove(self.temp_dir + self.modelname + ".txt")
+    def generatejSREdata(self, corpus, train=False, pairtype="all", nworkers=None):
+        """
+        Write the jSRE examples of a corpus to the examples file, in the order of its documents and sentences.
+        The candidates of each document are generated by worker processes and written by a single writer, which
+        assigns the pids and keeps self.pairs pointing to the entities of this corpus.
+        :param corpus: Corpus object
+        :param train: if True, skip false candidates while the true/total ratio is too low
+        :param nworkers: number of worker processes; config.generate_workers by default
+        """
+        if nworkers is None:
+            nworkers = config.generate_workers
         pcount = 0
         truepcount = 0
         strue = 0
         sfalse = 0
         skipped = 0
-        for sentence in corpus.get_sentences(self.ner_model):
-        #for did in corpus.documents:
-            did = sentence.did
-            examplelines = []
-            pos_sentences = set()
-            sids = []
-            # print len(corpus.type_sentences[pairtype])
-            sentence_entities = [entity for entity in sentence.entities.elist[self.ner_model]]
-            # print sentence.sid, self.ner_model, len(sentence.entities.elist[self.ner_model]), sentence_entities
-            # logging.debug("sentence {} has {} entities ({})".format(sentence.sid, len(sentence_entities), len(sentence.entities.elist["goldstandard"])))
-            for pair in itertools.permutations(sentence_entities, 2):
-                sid1 = pair[0].eid.split(".")[-2]
-                sid2 = pair[1].eid.split(".")[-2]
-                # if pairtype in corpus.type_sentences and pair[0].sid not in corpus.type_sentences[pairtype]:
-                #     continue
-                sids.append((pair[0].sid, pair[0].sid))
-                sn1 = int(sid1[1:])
-                sn2 = int(sid2[1:])
-
-                if pair[0].start == pair[1].start or pair[0].end == pair[1].end:
-                    continue
-                if pairtype in ("Has_Sequence_Identical_To", "Is_Functionally_Equivalent_To") and pair[0].type != pair[1].type:
-                    continue
-                if pair[0].type in self.entitytypes[0] and pair[1].type in self.entitytypes[1]: # or\
-                    # logging.debug(pair)
-                    entities_between = sentence.get_entitites_between(pair[0], pair[1], self.ner_model)
-                    if len(entities_between) > 1:
-                        print entities_between
-                        continue
-                    """if pair[0].type == pairtypes[0]:
-
-                    else:
-                        e1id = pair[1].eid
-                        e2id = pair[0].eid
-                        pair = (pair[1], pair[0])"""
-                    # print e1id, e2id
-                    e1id = pair[0].eid
-                    e2id = pair[1].eid
-                    pid = did + ".p" + str(pcount)
-                    # self.pairs[pid] = (e1id, e2id)
-                    self.pairs[pid] = pair
-                    tokens_text, pos, lemmas, ner = self.get_sentence_instance(sentence, e1id, e2id, pair)
-                    trueddi = 0
-                    if (e2id, pairtype) in pair[0].targets:
-                    #if any((pair[1].eid, pt) in pair[0].targets for pt in config.event_types[self.pairtype]["subtypes"]):
-                        trueddi = 1
-                        truepcount += 1
-                        strue += 1
-                    else:
-                        sfalse += 1
-                    # true/total ratio
-                    if train is True and trueddi == 0 and 1.0*strue/(strue+sfalse) < 0.001:
-                        sfalse -= 1
-                        skipped += 1
-                        continue
-                    else:
-                        #pos_sentences.add(pair[0].sid)
-                        #pos_sentences.add(pair[1].sid)
-                        body = self.generatejSRE_line(tokens_text, pos, lemmas, ner)
-                        examplelines.append(str(trueddi) + '\t' + pid + '.i' + '0\t' + body + '\n')
+        documents = [corpus.documents[did] for did in corpus.documents]
+        pool = None
+        if nworkers > 1:
+            pool = multiprocessing.Pool(processes=nworkers, initializer=init_generator,
+                                        initargs=(self.pairtype, self.modelname, self.ner_model))
+            candidates = pool.imap(generate_document_candidates, documents, chunksize=4)
+        else:
+            candidates = itertools.imap(lambda d: (self.get_document_candidates(d), self.candidates.reset_counts()),
+                                        documents)
+        counts = CandidateGenerator(*self.entitytypes)
+        try:
+            with codecs.open(self.get_examples_file(), 'w', "utf-8") as trainfile:
+                for document, (document_candidates, document_counts) in itertools.izip(documents, candidates):
+                    counts.add_counts(document_counts)
+                    sentences = dict((sentence.sid, sentence) for sentence in document.sentences)
+                    for sid, i1, i2, trueddi, body in document_candidates:
+                        sentence = sentences[sid]
+                        if trueddi == 1:
+                            truepcount += 1
+                            strue += 1
+                        else:
+                            sfalse += 1
+                        # true/total ratio
+                        if train is True and trueddi == 0 and 1.0*strue/(strue+sfalse) < 0.001:
+                            sfalse -= 1
+                            skipped += 1
+                            continue
+                        pid = sentence.did + ".p" + str(pcount)
+                        sentence_entities = sentence.entities.elist[self.ner_model]
+                        self.pairs[pid] = (sentence_entities[i1], sentence_entities[i2])
+                        trainfile.write(str(trueddi) + '\t' + pid + '.i' + '0\t' + body + '\n')
                         pcount += 1
-            # print strue, sfalse, skipped
-            #for il, l in enumerate(examplelines):
-
-            logging.debug("writing {} lines to file...".format(len(examplelines)))
-            with codecs.open(self.temp_dir + self.modelname + ".txt", 'a', "utf-8") as trainfile:
-                for il, l in enumerate(examplelines):
-                    # print sids[il], random.sample(pos_sentences, 1)
-                    #if sids[il][0] in pos_sentences or  sids[il][1] in pos_sentences or not train:
-                    trainfile.write(l)
-
-                # logging.info("wrote " + temp_dir + savefile)
+        finally:
+            if pool is not None:
+                pool.close()
+                pool.join()
+        logging.info(counts.report())
         logging.info("True/total relations:{}/{} ({})".format(truepcount, pcount, str(1.0*truepcount/(pcount+1))))
 
+    def get_document_candidates(self, document):
+        """
+        Generate the jSRE example body of each candidate pair of a document
+        :param document: Document object
+        :return: list of (sid, e1 index, e2 index, true relation, example body), with the indexes of the entities on
+        the entity list of the sentence
+        """
+        candidates = []
+        for sentence in document.sentences:
+            if self.ner_model not in sentence.entities.elist:
+                continue
+            sentence_entities = [entity for entity in sentence.entities.elist[self.ner_model]]
+            for i1, i2 in self.candidates.get_index_pairs(sentence_entities):
+                pair = (sentence_entities[i1], sentence_entities[i2])
+                entities_between = sentence.get_entitites_between(pair[0], pair[1], self.ner_model)
+                if len(entities_between) > 1:
+                    self.candidates.prune("entities_between")
+                    continue
+                e1id = pair[0].eid
+                e2id = pair[1].eid
+                tokens_text, pos, lemmas, ner = self.get_sentence_instance(sentence, e1id, e2id, pair)
+                trueddi = 0
+                if (e2id, self.pairtype) in pair[0].targets:
+                    trueddi = 1
+                body = self.generatejSRE_line(tokens_text, pos, lemmas, ner)
+                candidates.append((sentence.sid, i1, i2, trueddi, body))
+        return candidates
+
     def generatejSRE_line(self, pairtext, pos, lemmas, ner):
         candidates = [False,False]
         body = ''
@@ -363,23 +452,17 @@ class JSREKernel(ReModel):
     def get_predictions(self, corpus):
         # real_pair_type = config.event_types[self.pairtype]["subtypes"][0]
         #pred_y = []
-        with open(self.resultsfile, 'r') as resfile:
-            pred = resfile.readlines()
-
-        with codecs.open(self.examplesfile, 'r', 'utf-8') as trainfile:
-            original = trainfile.readlines()
-
-        if len(pred) != len(original):
-            print "different number of predictions!"
-            sys.exit()
         results = ResultsRE(self.resultsfile)
         temppreds = {}
-        for i in range(len(pred)):
-            original_tsv = original[i].split('\t')
-            # logging.debug(original_tsv)
-            pid = '.'.join(original_tsv[1].split('.')[:-1])
-
-            p = float(pred[i].strip())
+        with open(self.resultsfile, 'r') as resfile:
+            with codecs.open(self.examplesfile, 'r', 'utf-8') as trainfile:
+                try:
+                    # read both files line by line instead of loading them
+                    parsed = [(pid, p) for pid, p, original in iter_results(resfile, trainfile)]
+                except ValueError:
+                    print "different number of predictions!"
+                    sys.exit()
+        for pid, p in parsed:
             if p == 0:
                 p = -1
             if p == 2:
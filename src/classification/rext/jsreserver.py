@@ -0,0 +1,171 @@
+from __future__ import unicode_literals
+import codecs
+import logging
+import os
+import platform
+import threading
+from Queue import Queue, Empty
+from subprocess import Popen, PIPE, check_call, CalledProcessError
+
+from classification.modelregistry import registry, jvm_size
+from classification.rext.classifierserver import ClassifierServer
+from classification.rext.workspace import create_workspace, remove_workspace
+from config import config
+
+JSRE_WORKER = "bin/JSREWorker.java"
+
+JSRE_LIBS = ["libsvm-2.8.jar", "log4j-1.2.8.jar", "commons-digester.jar", "commons-beanutils.jar",
+             "commons-logging.jar", "commons-collections.jar"]
+
+
+def jsre_classpath(*paths):
+    if platform.system() == "Windows":
+        sep = ";"
+    else:
+        sep = ":"
+    return sep.join(['bin/jsre/jsre-1.1/bin'] + ["bin/jsre/jsre-1.1/lib/" + l for l in JSRE_LIBS] + list(paths))
+
+
+class JSREProcess(object):
+    """
+    Resident jSRE process (bin/JSREWorker.java) of one worker of a JSREServer, which stays up between batches.
+    Each batch is written to its stdin and one prediction line per example is read from its stdout; if the predictions
+    are not read before the timeout, or the process exits, the batch fails and the process is restarted for the next one.
+    """
+    def __init__(self, command, timeout=600):
+        self.command = command
+        self.timeout = timeout
+        self.process = None
+        self.lines = None
+        self.restarts = 0
+
+    def start(self):
+        self.process = Popen(self.command, stdin=PIPE, stdout=PIPE)
+        # the output is read by a thread, so that the predictions can be waited for with a timeout
+        self.lines = Queue()
+        reader = threading.Thread(target=self.read_output, args=(self.process, self.lines))
+        reader.daemon = True
+        reader.start()
+
+    @staticmethod
+    def read_output(process, lines):
+        for line in iter(process.stdout.readline, b""):
+            lines.put(line)
+        lines.put(None)
+
+    def stop(self):
+        if self.process is None:
+            return
+        try:
+            self.process.stdin.close()
+        except IOError:
+            pass
+        if self.process.poll() is None:
+            self.process.kill()
+        self.process.wait()
+        self.process = None
+
+    def restart(self):
+        self.stop()
+        self.restarts += 1
+        self.start()
+
+    def classify(self, lines):
+        """
+        :param lines: list of example lines
+        :return: list of prediction lines, in the same order
+        """
+        if self.process is None:
+            self.start()
+        elif self.process.poll() is not None:
+            self.restart()
+        try:
+            self.process.stdin.write("{}\n".format(len(lines)).encode("utf-8"))
+            for l in lines:
+                self.process.stdin.write(l.rstrip("\n").replace("\n", " ").encode("utf-8") + b"\n")
+            self.process.stdin.flush()
+        except IOError as e:
+            self.restart()
+            raise RuntimeError("jSRE worker exited: {}".format(e))
+        predictions = []
+        while len(predictions) < len(lines):
+            try:
+                line = self.lines.get(timeout=self.timeout)
+            except Empty:
+                self.restart()
+                raise RuntimeError("jSRE worker timed out after {}s".format(self.timeout))
+            if line is None:
+                self.restart()
+                raise RuntimeError("jSRE worker exited")
+            if line.startswith(b"ERROR\t"):
+                raise RuntimeError("something went wrong with JSRE! {}".format(line[len(b"ERROR\t"):].decode("utf-8")))
+            predictions.append(line)
+        return predictions
+
+
+class JSREServer(ClassifierServer):
+    """
+    Long-lived jSRE classification service for one model. Each worker keeps a resident jSRE process that classifies
+    its batches, so the JVM startup is shared by every batch; if JSREWorker cannot be compiled, each batch is
+    classified by one jSRE run instead.
+    """
+    def __init__(self, modelpath, ram="-mx4g", **kwargs):
+        super(JSREServer, self).__init__("jsre", modelpath, **kwargs)
+        self.ram = ram
+        self.classes = None  # workspace with the compiled JSREWorker
+        self.processes = {}  # workspace of a worker => its JSREProcess
+
+    def start(self):
+        # not in temp_dir, which may be the workspace of a model that is removed while the server is running
+        self.classes = create_workspace("jsre_classes")
+        try:
+            check_call(["javac", "-cp", jsre_classpath(), "-d", self.classes, JSRE_WORKER])
+        except (OSError, CalledProcessError) as e:
+            logging.warning("could not compile {}, running jSRE for each batch: {}".format(JSRE_WORKER, e))
+            remove_workspace(self.classes)
+            self.classes = None
+        return super(JSREServer, self).start()
+
+    def classify(self, lines, workspace):
+        if self.classes is None:
+            return self.classify_batch(lines, workspace)
+        # each worker has its own workspace and is the only one that uses its process
+        if workspace not in self.processes:
+            self.processes[workspace] = JSREProcess(['java', self.ram, '-classpath', jsre_classpath(self.classes),
+                                                     "JSREWorker", self.modelpath, workspace], self.timeout)
+        return self.processes[workspace].classify(lines)
+
+    def classify_batch(self, lines, workspace):
+        examplesfile = os.path.join(workspace, "examples.txt")
+        resultsfile = os.path.join(workspace, "results.txt")
+        if os.path.isfile(resultsfile):
+            os.remove(resultsfile)
+        with codecs.open(examplesfile, 'w', "utf-8") as examples:
+            for l in lines:
+                examples.write(l)
+        jsrecall = Popen(['java', self.ram, '-classpath', jsre_classpath(), "org.itc.irst.tcc.sre.Predict",
+                          examplesfile, self.modelpath, resultsfile], stdout=PIPE, stderr=PIPE)
+        res = jsrecall.communicate()
+        if not os.path.isfile(resultsfile):
+            raise RuntimeError("something went wrong with JSRE! {}".format(res[1]))
+        with open(resultsfile, 'r') as results:
+            return results.readlines()
+
+    def stop(self):
+        super(JSREServer, self).stop()
+        for process in self.processes.values():
+            process.stop()
+        self.processes = {}
+        if self.classes is not None:
+            remove_workspace(self.classes)
+            self.classes = None
+
+
+def get_jsre_server(modelpath, temp_dir="temp/"):
+    """
+    Return the jSRE server of a model, starting it the first time it is requested
+    """
+    return registry.get(modelpath, "jsre",
+                        lambda: JSREServer(modelpath, nworkers=config.jsre_workers, batch_wait=config.jsre_batch_wait,
+                                           temp_dir=temp_dir, timeout=config.classifier_timeout).start(),
+                        unload=lambda server: server.stop(), size=jvm_size("-mx4g") * config.jsre_workers)
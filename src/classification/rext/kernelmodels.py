@@ -19,11 +19,28 @@ from nltk.stem.wordnet import WordNetLemmatizer
 from nltk.corpus import wordnet
 
 import relations
+from classification.rext.workspace import create_workspace, remove_workspace
 
 class ReModel(object):
     def __init__(self):
         self.basedir = "models/kernel_models/"
         self.temp_dir = "temp/"
+        self._workspace = None
+
+    @property
+    def workspace(self):
+        """
+        Scratch directory of this model instance, for the files exchanged with external tools, created on first use.
+        It is removed by remove_workspace or when the process exits, unless config.keep_workspaces is set.
+        """
+        if getattr(self, "_workspace", None) is None:
+            self._workspace = create_workspace(self.__class__.__name__, getattr(self, "temp_dir", "temp/"))
+        return self._workspace
+
+    def remove_workspace(self, keep=None):
+        if getattr(self, "_workspace", None) is not None:
+            remove_workspace(self._workspace, keep)
+            self._workspace = None
 
     def reparse_tree(self, line):
         ptree = Tree.fromstring(line)
@@ -144,10 +161,10 @@ class ReModel(object):
 
     def get_pair(self, pid, corpus):
         did = '.'.join(pid.split(".")[:-1])
-        for p in corpus.documents[did].pairs.pairs:
-            if p.pid == pid:
-                return p
-        print "pid not found: {}".format(pid)
+        p = corpus.documents[did].pairs.get_pair(pid)
+        if p is None:
+            print "pid not found: {}".format(pid)
+        return p
 
 def main():
     parser = OptionParser(usage='train and evaluate ML model for DDI classification based on the DDI corpus')
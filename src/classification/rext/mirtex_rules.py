@@ -5,10 +5,13 @@ import logging
 import sys
 import itertools
 import re
+from collections import OrderedDict
 from subprocess import Popen, PIPE
 
 import config.seedev_types
 from classification.rext.kernelmodels import ReModel
+from classification.rext.treepatterns import NativeTreeMatcher
+from classification.rext.tregexservice import TregexService
 from classification.results import ResultsRE
 from config import config
 from text.pair import Pairs
@@ -23,10 +26,11 @@ class MirtexClassifier(ReModel):
         self.ptype = ptype
         self.corpus = corpus
         self.pairs = {}
-        self.pids = {}
+        self.pids = OrderedDict()  # pid => pair, in the order they were found
         self.trigger_words = {}
         self.tregexes_agent = set()
         self.tregexes_theme = set()
+        self.matcher = None  # matches the tregex patterns against the parse trees
         with open("corpora/miRTex/trigger_words.csv", 'r') as tfile:
             for l in tfile:
                 csv = l.split(";")
@@ -54,96 +58,103 @@ class MirtexClassifier(ReModel):
 
 
     def load_classifier(self):
-        pass
-
+        if config.tregex_matcher == "native":
+            self.matcher = NativeTreeMatcher(handles=("tr", "arg"))
+        else:
+            self.matcher = TregexService(handles=("tr", "arg"), nworkers=config.tregex_workers,
+                                         temp_dir=self.workspace)
 
     def test(self):
-        for sentence in self.corpus.get_sentences("goldstandard_mirna"):  # get only sentences with miRNAs
-            if "goldstandard_protein" in sentence.entities.elist:  # and proteins
-                #print sentence.parsetree.replace("\n", "").replace("  ", "")
-                # print sentence.sid, sentence.text
-                # check if the same mirna and trigger appear multiple times in the same sentence
-                sentence_mirnas = {}
-                for e in sentence.entities.elist["goldstandard_mirna"]:
-                    if e.text in sentence_mirnas:
-                        logging.info("repeated mirna ({}): {}".format(e.text, sentence.text))
-                    sentence_mirnas[e.text] = e
-                sentence_genes = {e.text: e for e in sentence.entities.elist["goldstandard_protein"]}
-                sentence_genes = {}
-                for e in sentence.entities.elist["goldstandard_protein"]:
-                    if e.text in sentence_genes:
-                        logging.info("repeated gene ({}): {}".format(e.text, sentence.text))
-                    sentence_genes[e.text] = e
-                #write parse tree to file
-                with open("temp/tregex_sentence.txt", 'w') as tfile:  # write sentence parse to file
-                    tfile.write(sentence.parsetree.replace("\n", "").replace("  ", ""))
-                    #tfile.write(sentence.bio_parse)
-                mirna_to_triggers = {} #mirna-> target for this sentence, assuming each mirna has only 1 mention
-                # test each regex for agent (mirna)
-                for tr in self.tregexes_agent:
-                    tregexcall = Popen(["./bin/stanford-tregex-2015-12-09/tregex.sh", "-h", "tr", "-h", "arg", "-t", tr,
-                                        "temp/tregex_sentence.txt"],
-                                       stdout=PIPE, stderr=PIPE)
-                    res = tregexcall.communicate()
-                    if res[0] != "":
-                        # print tr, "agent:", res[0]
-                        for r in res[0].split("\n"): # each match
-                            if r.strip() != "":
-                                words = [w.split("/")[0] for w in r.split()] #just words, without POS
-                                pos = [w.split("/")[1] for w in r.split()] # just POS
-                                #assumption: each mirna and trigger appear only once in the sentence
-                                mirna_agent = set(words) & set(sentence_mirnas.keys()) # mirnas found
-                                mirna_trigger = set(words) & set(self.trigger_words.keys()) # triggers found
-                                if mirna_agent and mirna_trigger:
-                                    for trigger in mirna_trigger:
-                                        trigger_i = words.index(trigger)
-                                        if pos[trigger_i] not in self.trigger_words[trigger]:
-                                            print "skipped because POS did not match:", r
-                                            # continue
-                                        if trigger not in mirna_to_triggers:
-                                            mirna_to_triggers[trigger] = set()
-                                        for m in mirna_agent: #
-                                            mirna_to_triggers[trigger].add(m)
-                                else: # no mirna-trigger
-                                    continue
-                    else: # no result
-                        continue
-                if not mirna_to_triggers:
-                    continue
-                # print mirna_targets
-                for tr in self.tregexes_theme:
-                    tregexcall = Popen(["./bin/stanford-tregex-2015-12-09/tregex.sh", "-h", "tr", "-h", "arg", "-t", tr,
-                                        "temp/tregex_sentence.txt"],
-                                       stdout=PIPE, stderr=PIPE)
-                    res = tregexcall.communicate()
-                    if res[0] != "":
-                        # print tr, "theme:", res[0]
-                        for r in res[0].split("\n"):
-                            if r.strip() != "":
-                                words = [w.split("/")[0] for w in r.split()]
-                                pos = [w.split("/")[1] for w in r.split()]  # just POS
-                                gene_agent = set(words) & set(sentence_genes.keys())
-                                gene_trigger = set(words) & set(self.trigger_words.keys())
-                                if gene_agent and gene_trigger:
-                                    for trigger in gene_trigger:
-                                        # print "target:", target
-                                        trigger_i = words.index(trigger)
-                                        if pos[trigger_i] not in self.trigger_words[trigger]:
-                                            print "skipped because POS did not match:", r
-                                            continue
-                                        if trigger in mirna_to_triggers:
-                                            for gene in gene_agent:
-                                                print "+".join(mirna_to_triggers[trigger]), trigger, gene
-                                                for mirna in mirna_to_triggers[trigger]:
-                                                    self.pids["p{}".format(len(self.pids))] = (sentence_mirnas[mirna],
-                                                                                                 sentence_genes[gene])
-                                            print sentence.text
-                                            print
+        # get only sentences with miRNAs and proteins
+        sentences = [sentence for sentence in self.corpus.get_sentences("goldstandard_mirna")
+                     if "goldstandard_protein" in sentence.entities.elist]
+        trees = [sentence.parsetree.replace("\n", "").replace("  ", "") for sentence in sentences]
+        # each pattern is matched against every sentence at once
+        agent_matches = self.matcher.match(trees, self.tregexes_agent)
+        theme_sentences = []
+        for isentence, sentence in enumerate(sentences):
+            #print sentence.parsetree.replace("\n", "").replace("  ", "")
+            # print sentence.sid, sentence.text
+            sentence_mirnas, sentence_genes = self.get_sentence_entities(sentence)
+            mirna_to_triggers = self.get_agent_triggers(agent_matches[isentence], sentence_mirnas)
+            if mirna_to_triggers:
+                theme_sentences.append((isentence, sentence_mirnas, sentence_genes, mirna_to_triggers))
+        theme_matches = self.matcher.match([trees[t[0]] for t in theme_sentences], self.tregexes_theme)
+        for (isentence, sentence_mirnas, sentence_genes, mirna_to_triggers), matches in zip(theme_sentences,
+                                                                                            theme_matches):
+            self.add_theme_pairs(sentences[isentence], matches, sentence_mirnas, sentence_genes, mirna_to_triggers)
+        self.matcher.close()
+        self.remove_workspace()
+
+    def get_sentence_entities(self, sentence):
+        # check if the same mirna and trigger appear multiple times in the same sentence
+        sentence_mirnas = {}
+        for e in sentence.entities.elist["goldstandard_mirna"]:
+            if e.text in sentence_mirnas:
+                logging.info("repeated mirna ({}): {}".format(e.text, sentence.text))
+            sentence_mirnas[e.text] = e
+        sentence_genes = {}
+        for e in sentence.entities.elist["goldstandard_protein"]:
+            if e.text in sentence_genes:
+                logging.info("repeated gene ({}): {}".format(e.text, sentence.text))
+            sentence_genes[e.text] = e
+        return sentence_mirnas, sentence_genes
 
-                                                    # print gene_agent, gene_target
-                        #sys.exit()
-            # print
+    def get_agent_triggers(self, matches, sentence_mirnas):
+        """
+        :param matches: dictionary agent pattern => output lines of the sentence
+        :param sentence_mirnas: miRNA text => entity
+        :return: trigger => set of miRNAs that are agents of that trigger
+        """
+        mirna_to_triggers = {} #mirna-> target for this sentence, assuming each mirna has only 1 mention
+        # test each regex for agent (mirna)
+        for tr in self.tregexes_agent:
+            # print tr, "agent:", matches[tr]
+            for r in matches[tr]: # each match
+                words = [w.split("/")[0] for w in r.split()] #just words, without POS
+                pos = [w.split("/")[1] for w in r.split()] # just POS
+                #assumption: each mirna and trigger appear only once in the sentence
+                mirna_agent = set(words) & set(sentence_mirnas.keys()) # mirnas found
+                mirna_trigger = set(words) & set(self.trigger_words.keys()) # triggers found
+                if mirna_agent and mirna_trigger:
+                    for trigger in mirna_trigger:
+                        trigger_i = words.index(trigger)
+                        if pos[trigger_i] not in self.trigger_words[trigger]:
+                            print "skipped because POS did not match:", r
+                            # continue
+                        if trigger not in mirna_to_triggers:
+                            mirna_to_triggers[trigger] = set()
+                        for m in mirna_agent: #
+                            mirna_to_triggers[trigger].add(m)
+        return mirna_to_triggers
 
+    def add_theme_pairs(self, sentence, matches, sentence_mirnas, sentence_genes, mirna_to_triggers):
+        """
+        Add a pair for each miRNA and gene that are agent and theme of the same trigger
+        :param matches: dictionary theme pattern => output lines of the sentence
+        """
+        for tr in self.tregexes_theme:
+            # print tr, "theme:", matches[tr]
+            for r in matches[tr]:
+                words = [w.split("/")[0] for w in r.split()]
+                pos = [w.split("/")[1] for w in r.split()]  # just POS
+                gene_agent = set(words) & set(sentence_genes.keys())
+                gene_trigger = set(words) & set(self.trigger_words.keys())
+                if gene_agent and gene_trigger:
+                    for trigger in gene_trigger:
+                        # print "target:", target
+                        trigger_i = words.index(trigger)
+                        if pos[trigger_i] not in self.trigger_words[trigger]:
+                            print "skipped because POS did not match:", r
+                            continue
+                        if trigger in mirna_to_triggers:
+                            for gene in gene_agent:
+                                print "+".join(mirna_to_triggers[trigger]), trigger, gene
+                                for mirna in mirna_to_triggers[trigger]:
+                                    self.pids["p{}".format(len(self.pids))] = (sentence_mirnas[mirna],
+                                                                                 sentence_genes[gene])
+                            print sentence.text
+                            print
 
     def get_predictions(self, corpus):
         results = ResultsRE("")
@@ -10,11 +10,15 @@ import gc
 
 import math
 import misvm
+import scipy.sparse
 from nltk import Tree
 from sklearn.externals import joblib
 from sklearn.feature_extraction.text import CountVectorizer, TfidfVectorizer
 from sklearn.pipeline import Pipeline
 
+from classification.modelregistry import registry
+from classification.rext import parsetrees
+from classification.rext.candidates import CandidateGenerator
 from classification.rext.kernelmodels import ReModel
 from subprocess import Popen, PIPE
 import platform
@@ -24,22 +28,63 @@ from classification.results import ResultsRE
 from config import config
 from text.pair import Pairs
 
+DENSE_CHUNK_SIZE = 10000  # maximum number of instances converted to dense arrays at the same time
+TRANSFORM_BATCH_SIZE = 100000  # number of instances transformed by each vectorizer call
+
+
+class PairFeatureContext(object):
+    """
+    Token information of a sentence, computed once and shared by the feature vectors of all its candidate pairs
+    """
+    def __init__(self, sentence, ner_model):
+        entity_tokens = set()
+        for elist in sentence.entities.elist:
+            if elist == ner_model or ner_model == "all":
+                for e in sentence.entities.elist[elist]:
+                    for t in e.tokens:
+                        entity_tokens.add(t.order)
+        self.entity_tokens = entity_tokens
+        self.is_entity = [t.order in entity_tokens for t in sentence.tokens]
+        self.token_features = [t.lemma + "-" + t.pos + "-" + t.tag for t in sentence.tokens]
+        self.indexes = range(len(sentence.tokens))  # sliced like sentence.tokens to get each window
+
+    def window_features(self, start, end, name):
+        """
+        :param start: first token of the window
+        :param end: token after the window
+        :param name: position of the window relative to the pair (before, middle, end)
+        :return: list of features of the tokens of the window
+        """
+        features = []
+        for i, it in enumerate(self.indexes[start:end]):
+            if self.is_entity[it]:
+                features.append(str(i) + "-" + name + "-entity")
+            else:
+                features.append(str(i) + "-" + name + "-" + self.token_features[it])
+        return features
+
+
 class MILClassifier(ReModel):
     def __init__(self, corpus, pairtype, relations, modelname="mil_classifier.model", test=False, ner="goldstandard",
                  generate=True):
         super(MILClassifier, self).__init__()
         self.modelname = modelname
         self.pairtype = pairtype
+        self.relations = relations  # known relations (e1.normalized, e2.normalized), used to label the bags
         self.pairs = {}  # (e1.normalized, e2.normalized) => (e1, e2)
         self.instances = {}  # bags of instances (e1.normalized, e2.normalized) -> all instances with these two entities
         self.labels = {} # (e1.normalized, e2.normalized) => label (-1/1)
         self.bag_labels = []  # ordered list of labels for each bag
         self.bag_pairs = []  # ordered list of pair labels (e1.normalized, e2.normalized)
-        self.data = []  # ordered list of bags, each is a list of feature vectors
+        self.data = []  # ordered list of bags, each is a dense array of feature vectors
+        self.instance_matrix = None  # sparse matrix with the instances of every bag, in the order of bag_pairs
+        self.bag_offsets = []  # first row of each bag on instance_matrix
         self.predicted = []  # ordered list of predictions for each bag
         self.resultsfile = None
         self.examplesfile = None
         self.ner_model = ner
+        self.candidates = CandidateGenerator(config.relation_types[self.pairtype]["source_types"],
+                                             config.relation_types[self.pairtype]["target_types"])
         self.vectorizer = CountVectorizer(min_df=0.2, ngram_range=(1, 1), token_pattern=r'\b\w+\-\w+\b')
         self.corpus = corpus
 
@@ -76,27 +121,17 @@ class MILClassifier(ReModel):
             # sentence_models = set([m for m in sentence.entities.elist])
             # print self.ner_model, sentence_models
             self.generate_sentence_data(sentence, test=test)
+        logging.info(self.candidates.report())
         logging.info("True/total relations:{}/{} ({})".format(truepcount, pcount,
                                                               str(1.0 * truepcount / (pcount + 1))))
         # print "total bags:", len(self.instances)
 
-    def write_to_file(self, filepath):
-        with codecs.open(filepath, 'a', 'utf-8') as f:
-            for bag in self.instances:
-                f.write('#'.join(bag) + "\t")
-                for i in self.instances[bag]:
-                    f.write(i + "\t")
-                f.write(str(self.labels[bag]) + "\n")
-
-    def load_from_file(self, filepath):
-        with codecs.open(filepath, 'r', 'utf-8') as f:
-            for l in f:
-                values = l.split("\t")
-                bag = tuple(values[0].split("#"))
-                self.instances[bag] = []
-                for i in values[1:-1]:
-                    self.instances[bag].append(i)
-                self.labels[bag] = int(values[-1])
+    def write_to_store(self, store):
+        """
+        Append the bags of self.instances to a BagStore
+        """
+        for bag in self.instances:
+            store.append(bag, self.instances[bag], self.labels[bag])
 
     def load_kb(self, kb_path):
         self.relations = set()
@@ -105,12 +140,17 @@ class MILClassifier(ReModel):
                 self.relations.add(tuple(l.strip().split('\t')))
 
     def load_classifier(self):
+        self.classifier, self.vectorizer = registry.get("{}/{}/{}.pkl".format(self.basedir, self.modelname, self.modelname),
+                                                        "mil", self.open_classifier)
+
+    def open_classifier(self):
         #self.classifier = joblib.load("{}/{}/{}.pkl".format(self.basedir, self.modelname, self.modelname))
         #self.vectorizer = joblib.load("{}/{}/{}_bow.pkl".format(self.basedir, self.modelname, self.modelname))
         with open("{}/{}/{}.pkl".format(self.basedir, self.modelname, self.modelname), 'r') as modelfile:
-            self.classifier = pickle.loads(modelfile.read())
+            classifier = pickle.loads(modelfile.read())
         with open("{}/{}/{}_bow.pkl".format(self.basedir, self.modelname, self.modelname), 'r') as modelfile:
-            self.vectorizer = pickle.loads(modelfile.read())
+            vectorizer = pickle.loads(modelfile.read())
+        return classifier, vectorizer
 
     def generate_vectorizer(self):
         logging.info("Building vocabulary...")
@@ -125,30 +165,77 @@ class MILClassifier(ReModel):
         #vocab = self.vectorizer.get_feature_names()
         #print vocab
 
-    def vectorize_text(self):
-        for pair in self.instances:
-            bag = []
-            # print self.instances[pair]
-
-            for i in self.instances[pair]:
-
-                x = self.vectorizer.transform([i]).toarray()
-                #print len(x[0]),
-                bag.append(x[0])
-            # print len(bag[0]), len(bag)
-            self.data.append(bag)
-            # print bag
-            self.bag_labels.append(self.labels[pair])
-            self.bag_pairs.append(pair)
-
+    def vectorize_text(self, densify=True):
+        """
+        Vectorize the bags of self.instances
+        :param densify: also build self.data, with a dense array for each bag, which is how misvm trains
+        """
+        self.vectorize_bags(((pair, self.instances[pair], self.labels[pair]) for pair in self.instances), densify)
 
-    def train(self):
-        self.generate_vectorizer()
-        # self.vectorizer = pickle.load("{}/{}/{}_bow.pkl".format(self.basedir, self.modelname, self.modelname))
-        self.vectorize_text()
+    def vectorize_bags(self, bags, densify=True):
+        """
+        Transform the instances of every bag in large batches, into one CSR matrix where the instances of each bag
+        are consecutive rows
+        :param bags: iterable of (bag, instances, label), such as a BagStore
+        :param densify: also build self.data, with a dense array for each bag, which is how misvm trains
+        """
+        self.bag_pairs = []
+        self.bag_labels = []
+        self.bag_offsets = [0]  # bag i has the rows bag_offsets[i]:bag_offsets[i+1]
+        matrices = []
+        batch = []
+        for bag, instances, label in bags:
+            self.bag_pairs.append(bag)
+            self.bag_labels.append(label)
+            self.bag_offsets.append(self.bag_offsets[-1] + len(instances))
+            batch += instances
+            if len(batch) >= TRANSFORM_BATCH_SIZE:
+                matrices.append(self.vectorizer.transform(batch))
+                batch = []
+        if batch or not matrices:
+            matrices.append(self.vectorizer.transform(batch))
+        self.instance_matrix = scipy.sparse.vstack(matrices).tocsr()
+        logging.info("vectorized {} instances of {} bags".format(self.bag_offsets[-1], len(self.bag_pairs)))
+        self.data = []
+        if densify:
+            for chunk in self.dense_chunks():
+                self.data += chunk
+
+    def dense_chunks(self, max_instances=DENSE_CHUNK_SIZE):
+        """
+        Densify consecutive bags of the instance matrix, at most max_instances rows at a time (unless a single bag
+        is larger than that)
+        :return: generator of lists of dense bags
+        """
+        first = 0
+        while first < len(self.bag_pairs):
+            last = first + 1
+            while last < len(self.bag_pairs) and self.bag_offsets[last + 1] - self.bag_offsets[first] <= max_instances:
+                last += 1
+            start = self.bag_offsets[first]
+            dense = self.instance_matrix[start:self.bag_offsets[last]].toarray()
+            yield [dense[self.bag_offsets[b] - start:self.bag_offsets[b + 1] - start] for b in range(first, last)]
+            first = last
+
+    def train(self, store=None):
+        """
+        misvm solves a single optimization problem over every bag and only accepts dense bags, so the whole training
+        set is densified into self.data before fitting, even when it is read from a store: the store only avoids
+        keeping the instance text in memory, and the memory needed by training is still that of the dense bags.
+        :param store: BagStore with the training bags; if None, the bags of self.instances are used
+        """
+        if store is not None:
+            # the instance text is streamed from the store, only the sparse vectors are kept until they are densified
+            logging.info("Building vocabulary...")
+            self.vectorizer.fit(i for bag, instances, label in store for i in instances)
+            self.vectorize_bags(store)
+        else:
+            self.generate_vectorizer()
+            # self.vectorizer = pickle.load("{}/{}/{}_bow.pkl".format(self.basedir, self.modelname, self.modelname))
+            self.vectorize_text()
         # print self.vectorizer
         # sys.exit()
-        logging.info("Training with {} bags".format(str(len(self.labels))))
+        logging.info("Training with {} bags".format(str(len(self.bag_labels))))
         # for i, d in enumerate(self.data):
         #     if self.bag_labels[i] == 1:
         #         print self.bag_pairs[i], len(d), self.bag_labels[i]
@@ -156,6 +243,8 @@ class MILClassifier(ReModel):
         #             print self.corpus.get_sentence(pair[0].sid).text
         #         print
 
+        # the dense bags have the same rows
+        self.instance_matrix = None
         gc.collect()
         self.classifier.fit(self.data, self.bag_labels)
         gc.collect()
@@ -172,9 +261,12 @@ class MILClassifier(ReModel):
             modelfile.write(s)
 
     def test(self):
-        self.vectorize_text()
+        self.vectorize_text(densify=False)
         # print self.data
-        self.predicted = self.classifier.predict(self.data)
+        # bags are classified independently, so only one chunk has to be dense at a time
+        self.predicted = []
+        for bags in self.dense_chunks():
+            self.predicted += list(self.classifier.predict(bags))
         #self.predicted = [1]*len(self.data)
         print Counter([round(x, 1) for x in self.predicted])
 
@@ -189,8 +281,11 @@ class MILClassifier(ReModel):
             # print "len pairs", self.pairs
         self.test()
 
-    def generate_sentence_data(self, sentence, test=True):
-        pairtypes = (config.relation_types[self.pairtype]["source_types"], config.relation_types[self.pairtype]["target_types"])
+    def get_sentence_entities(self, sentence):
+        """
+        :return: entities of the sentence considered for candidate pairs; with ner_model "all", the first entity of
+        each offset
+        """
         sentence_entities = []
         if self.ner_model == "all":
             offsets = set()
@@ -202,37 +297,50 @@ class MILClassifier(ReModel):
                         offsets.add(offset)
         else:
             sentence_entities = [entity for entity in sentence.entities.elist[self.ner_model]]
-        # print self.ner_model, sentence_entities
-        for pair in itertools.permutations(sentence_entities, 2):
-
-            if pair[0].type in pairtypes[0] and pair[1].type in pairtypes[1]: # and pair[0].normalized_score > 0 and pair[1].normalized_score > 0:
-                #if test:
-                #    bag = (sentence.did, pair[0].normalized, pair[1].normalized)
-                #else:
-                #    bag = (pair[0].normalized, pair[1].normalized)
-                bag = (pair[0].normalized, pair[1].normalized)
-                # print bag
-                if bag not in self.instances:
-                    # print "creating bag", bag
-                    self.instances[bag] = []
-                    self.labels[bag] = -1  # assume no relation until it's confirmed
-                    self.pairs[bag] = []
-                # print "adding pair", pair
-                self.pairs[bag].append(pair)
-                # if bag[1:] in relations:
-                # print pair[0].normalized, pair[1].normalized
-                if (pair[0].normalized, pair[1].normalized) in self.relations:
-                    self.labels[bag] = 1
-                    trueddi = 1
-                    #truepcount += 1
-                    #strue += 1
-                #else:
-                #    sfalse += 1
-                #pcount += 1
-                pair_features = self.get_pair_features(sentence, pair)
-                if sentence.text.startswith("These abnormalities reflect"):
-                    print bag, pair_features.encode("utf8")
-                self.instances[bag].append(pair_features)
+        return sentence_entities
+
+    def get_sentence_instances(self, sentence, sentence_entities):
+        """
+        Generate the instance of each candidate pair of a sentence, without adding it to the bags
+        :param sentence: Sentence object
+        :param sentence_entities: entities returned by get_sentence_entities
+        :return: list of (bag, i1, i2, features, label), with the indexes of the entities of the pair on
+        sentence_entities
+        """
+        instances = []
+        context = PairFeatureContext(sentence, self.ner_model)
+        for i1, i2 in self.candidates.get_index_pairs(sentence_entities):
+            pair = (sentence_entities[i1], sentence_entities[i2])
+            # if pair[0].normalized_score > 0 and pair[1].normalized_score > 0:
+            #if test:
+            #    bag = (sentence.did, pair[0].normalized, pair[1].normalized)
+            #else:
+            #    bag = (pair[0].normalized, pair[1].normalized)
+            bag = (pair[0].normalized, pair[1].normalized)
+            label = -1  # assume no relation until it's confirmed
+            if (pair[0].normalized, pair[1].normalized) in self.relations:
+                label = 1
+            pair_features = self.get_pair_features(sentence, pair, context)
+            if sentence.text.startswith("These abnormalities reflect"):
+                print bag, pair_features.encode("utf8")
+            instances.append((bag, i1, i2, pair_features, label))
+        return instances
+
+    def add_instance(self, bag, pair, features, label):
+        if bag not in self.instances:
+            # print "creating bag", bag
+            self.instances[bag] = []
+            self.labels[bag] = -1
+            self.pairs[bag] = []
+        self.pairs[bag].append(pair)
+        if label == 1:
+            self.labels[bag] = 1
+        self.instances[bag].append(features)
+
+    def generate_sentence_data(self, sentence, test=True):
+        sentence_entities = self.get_sentence_entities(sentence)
+        for bag, i1, i2, features, label in self.get_sentence_instances(sentence, sentence_entities):
+            self.add_instance(bag, (sentence_entities[i1], sentence_entities[i2]), features, label)
 
     def process_sentence(self, sentence):
         """
@@ -277,48 +385,26 @@ class MILClassifier(ReModel):
         return results
 
 
-    def get_pair_features(self, sentence, pair):
+    def get_pair_features(self, sentence, pair, context=None):
+        """
+        :param sentence: Sentence object
+        :param pair: tuple of two entities of the sentence
+        :param context: PairFeatureContext of the sentence, shared by all its pairs; built for this pair if None
+        :return: string with the features of the tokens around the pair
+        """
+        if context is None:
+            context = PairFeatureContext(sentence, self.ner_model)
         start1, end1, start2, end2 = pair[0].tokens[0].order, pair[0].tokens[-1].order,\
                                      pair[1].tokens[0].order, pair[1].tokens[-1].order
-        sentence_entities_tokens = []
-        for ner_model in sentence.entities.elist:
-            if ner_model == self.ner_model or self.ner_model == "all":
-                for e in sentence.entities.elist[ner_model]:
-                    for t in e.tokens:
-                        sentence_entities_tokens.append(t.order)
-        token_order1 = [t.order for t in pair[0].tokens]
-        token_order2 = [t.order for t in pair[1].tokens]
         order = "normal-order"
-        entitytext = [pair[0].text, pair[1].text]
         if start1 > start2:
             order = "reverse-order"
             #start, end = pair[1].tokens[-1].order, pair[0].tokens[0].order
             start1, end2, start2, end2 = start2, end2, start1, end1
-            entitytext = [pair[1].text, pair[0].text]
-        before_features = []
-        middle_features = []
-        end_features = []
         feature_window = 5
-        for i, t in enumerate(sentence.tokens[max(start1-feature_window, 0):start1]):
-            if t.order in sentence_entities_tokens:
-                before_features.append(str(i) + "-before-entity")
-            else:
-                before_features.append(str(i) + "-before-" + t.lemma + "-" + t.pos + "-" + t.tag)
-                #before_features.append("before-" + t.pos)
-
-        for i, t in enumerate(sentence.tokens[end1:max(end1+feature_window, start2)]):
-            if t.order in sentence_entities_tokens:
-                middle_features.append(str(i) + "-middle-entity")
-            else:
-                middle_features.append(str(i) + "-middle-" + t.lemma  + "-" + t.pos + "-" + t.tag)
-                #middle_features.append("middle-" + t.pos)
-
-        for i, t in enumerate(sentence.tokens[end2:end2+feature_window]):
-            if t.order in sentence_entities_tokens:
-                end_features.append(str(i) + "-end-entity")
-            else:
-                end_features.append(str(i) + "-end-" + t.lemma  + "-" + t.pos + "-" + t.tag)
-                #end_features.append("end-" + t.pos)
+        before_features = context.window_features(max(start1-feature_window, 0), start1, "before")
+        middle_features = context.window_features(end1, max(end1+feature_window, start2), "middle")
+        end_features = context.window_features(end2, end2+feature_window, "end")
         features = before_features + middle_features + end_features + [order]
         # try:
         #     tree = Tree.fromstring(sentence.parsetree)
@@ -374,46 +460,4 @@ class MILClassifier(ReModel):
         :param label: string to replace the original text
         :return: masked tree
         """
-        last_text = ""
-        match_text = entity.tokens[0].text
-        found = False
-        entity_token_index = entity.tokens[0].order
-        leaves_pos = tree.treepositions('leaves')
-        # logging.info("replace {} with {}".format(match_text, label))
-        if entity_token_index == 0:  # if the entity is the first in the sentence, it's easy
-            tree[leaves_pos[0]] = label
-            return tree
-        if entity_token_index > 0:  # otherwise we have to search because the tokenization may be different
-            ref_token = sentence.tokens[entity_token_index - 1].text
-            # logging.info("replace {}|({}) with {}".format(ref_token, match_text, label))
-            # ref_token is used to prevent from matching with the same text but corresponding to a different entity
-            # in this case, it is the previous token
-            for pos in leaves_pos:
-                # exact match case
-                if tree[pos] == match_text and (last_text in ref_token or ref_token in last_text):
-                    tree[pos] = label
-                    return tree
-                # partial match - cover tokenization issues
-                elif (tree[pos] in match_text or match_text in tree[pos]) and (
-                            ref_token in tree[pos] or ref_token in last_text or last_text in ref_token):
-                    tree[pos] = label
-                    return tree
-                last_text = tree[pos]
-        # if it was no found, use the next token as reference
-        if entity_token_index < sentence.tokens[-1].order and not found:
-            for ipos, pos in enumerate(leaves_pos[:-1]):
-                ref_token = sentence.tokens[entity_token_index + 1].text
-                # logging.info("replace ({})|{} with {}".format(match_text, ref_token, label))
-                next_pos = leaves_pos[ipos + 1]
-                next_text = tree[next_pos]
-                if tree[pos] == match_text and (next_text in ref_token or ref_token in next_text):
-                    tree[pos] = label
-                    return tree
-                elif (tree[pos] in match_text or match_text in tree[pos]) and (
-                            ref_token in tree[pos] or ref_token in next_text or next_text in ref_token):
-                    tree[pos] = label
-                    return tree
-
-        logging.debug("entity not found: |{}|{}|{}|{} in |{}|".format(entity_token_index, ref_token, match_text, label,
-                                                                      str(tree)))
-        return tree
+        return parsetrees.mask_entity(sentence, tree, entity, label)
@@ -15,9 +15,9 @@ class MultiR(ReModel):
 
     def generate_data(self, corpus, modelname, pairtypes):
         # TODO: refactor this part to corpus class
-        if os.path.isfile(self.temp_dir + modelname + ".pb"):
+        if os.path.isfile(self.workspace + modelname + ".pb"):
             print "removed old data"
-            os.remove(self.temp_dir + modelname + ".pb")
+            os.remove(self.workspace + modelname + ".pb")
         trainlines = []
         # get all entities of this document
         # doc_entities = []
@@ -42,7 +42,7 @@ class MultiR(ReModel):
                 ent.label = entity.text
                 nentities += 1
         # Write the new address book back to disk.
-        f = open("train.pb.gz", "wb")
+        f = open(self.workspace + "train.pb.gz", "wb")
         f.write(doc.SerializeToString())
         f.close()
 
@@ -0,0 +1,228 @@
+import copy
+import logging
+import multiprocessing
+from collections import OrderedDict
+
+from classification.rext.jsrekernel import JSREKernel
+from classification.rext.mirtex_rules import MirtexClassifier
+from classification.rext.multiinstance import MILClassifier
+from classification.rext.rules import RuleClassifier
+from classification.rext.svmtk import SVMTKernel
+from classification.results import ResultsRE
+from config import config
+from text.pair import Pairs
+
+# relation extraction kernels supported by the driver => source name used on the recognized_by of the pairs
+RE_KERNELS = OrderedDict([("jsre", "jsre"), ("svmtk", "svmtk"), ("rules", "rules"),
+                          ("mirtex_rules", "mirtex_rules"), ("mil", "mil")])
+
+
+def get_relation_model(kernel, corpus, ptype, tag="0", ner="goldstandard", relations=None):
+    if kernel == "jsre":
+        return JSREKernel(corpus, ptype, train=False, modelname=tag, ner=ner)
+    elif kernel == "svmtk":
+        return SVMTKernel(corpus, ptype, modelname=tag, ner=ner)
+    elif kernel == "rules":
+        return RuleClassifier(corpus, ptype, ner=ner)
+    elif kernel == "mirtex_rules":
+        return MirtexClassifier(corpus, ptype)
+    elif kernel == "mil":
+        return MILClassifier(corpus, ptype, relations, test=True, ner=ner)
+    raise ValueError("no relation extraction driver for kernel {}".format(kernel))
+
+
+def classify_corpus(kernel, model, corpus):
+    """
+    Classify the candidate pairs of a corpus with a model created by get_relation_model
+    :return: ResultsRE
+    """
+    if kernel == "mil":
+        model.generateMILdata(test=True)
+    return get_results(model, corpus)
+
+
+def get_results(model, corpus):
+    """
+    Classify the instances of a model and remove its workspace. The pids given by the kernels to the instances depend
+    on the documents classified by the model, so results.pairs is keyed by the pid of each pair on its document, as
+    with the results merged from the workers
+    :return: ResultsRE
+    """
+    model.load_classifier()
+    model.test()
+    results = model.get_predictions(corpus)
+    model.remove_workspace()
+    results.pairs = dict((pair.pid, pair) for pair in results.pairs.values())
+    return results
+
+
+def get_subcorpus(corpus, dids):
+    """
+    :return: shallow copy of the corpus with only the documents dids, so that only those are sent to a worker
+    """
+    subcorpus = copy.copy(corpus)
+    subcorpus.documents = OrderedDict((did, corpus.documents[did]) for did in dids)
+    return subcorpus
+
+
+def get_chunks(corpus, nworkers):
+    dids = list(corpus.documents)
+    chunk_size = max(1, len(dids) // (nworkers * 4))
+    return [dids[i:i + chunk_size] for i in range(0, len(dids), chunk_size)]
+
+
+def get_entity_locators(document):
+    """
+    Entities are located by (sid, entity source, position on the entity list), since eids are not unique across
+    entity sources
+    :return: id of each entity object => locator
+    """
+    locators = {}
+    for sentence in document.sentences:
+        for source in sentence.entities.elist:
+            for i, entity in enumerate(sentence.entities.elist[source]):
+                locators.setdefault(id(entity), (sentence.sid, source, i))
+    return locators
+
+
+def locate_entity(sentences, locator):
+    sid, source, i = locator
+    return sentences[sid].entities.elist[source][i]
+
+
+def classify_documents(args):
+    """
+    Worker: classify the documents of a subcorpus with a new model, with its own workspace and external classifier
+    process, and describe the resulting pairs of each document without references to the entity objects
+    :return: list of (did, pair records, indexes of the records on results.document_pairs[did],
+    indexes of the records on results.pairs)
+    """
+    kernel, ptype, tag, ner, relations, corpus = args
+    model = get_relation_model(kernel, corpus, ptype, tag, ner, relations)
+    results = classify_corpus(kernel, model, corpus)
+    result_pairs = set([id(p) for p in results.pairs.values()])
+    records = []
+    for did in corpus.documents:
+        document = corpus.documents[did]
+        locators = get_entity_locators(document)
+        pair_records = []
+        pair_index = {}
+        for pair in document.pairs.pairs:
+            if id(pair.entities[0]) not in locators or id(pair.entities[1]) not in locators:
+                logging.warning("{}: entities of pair {} not found on the sentences".format(did, pair.pid))
+                continue
+            pair_index[id(pair)] = len(pair_records)
+            pair_records.append((locators[id(pair.entities[0])], locators[id(pair.entities[1])], pair.relation,
+                                 dict(pair.recognized_by), pair.score))
+        document_results = []
+        if did in results.document_pairs:
+            document_results = [pair_index[id(p)] for p in results.document_pairs[did].pairs if id(p) in pair_index]
+        other_results = [pair_index[id(p)] for p in document.pairs.pairs if id(p) in result_pairs and
+                         id(p) in pair_index]
+        records.append((did, pair_records, document_results, other_results))
+    return records
+
+
+def merge_records(corpus, records, results, source):
+    """
+    Add the pairs described by classify_documents to the documents of the corpus and to the results, in the order of
+    the records, which is the order of a serial run
+    """
+    for did, pair_records, document_results, other_results in records:
+        document = corpus.documents[did]
+        sentences = dict((sentence.sid, sentence) for sentence in document.sentences)
+        pairs = []
+        for locator1, locator2, relation, recognized_by, score in pair_records:
+            e1 = locate_entity(sentences, locator1)
+            e2 = locate_entity(sentences, locator2)
+            pair = document.pairs.find(e1, e2, relation)
+            if pair is None:
+                pair = document.add_relation(e1, e2, relation, relation=True)
+            pairs.append(pair)
+        if document_results:
+            results.document_pairs[did] = Pairs()
+            for i in document_results:
+                results.document_pairs[did].add_pair(pairs[i], source)
+        for i in document_results + other_results:
+            results.pairs[pairs[i].pid] = pairs[i]
+        for pair, (locator1, locator2, relation, recognized_by, score) in zip(pairs, pair_records):
+            pair.recognized_by.update(recognized_by)
+            pair.score = score
+
+
+def generate_mil_documents(args):
+    """
+    Worker: generate the MIL instances of the sentences of a subcorpus
+    :return: list of (did, sid, instances of the sentence)
+    """
+    ptype, ner, relations, corpus = args
+    model = MILClassifier(corpus, ptype, relations, test=True, ner=ner)
+    records = []
+    for sentence in corpus.get_sentences(ner):
+        records.append((sentence.did, sentence.sid, model.get_sentence_instances(sentence,
+                                                                                 model.get_sentence_entities(sentence))))
+    return records
+
+
+def test_relations(corpus, kernel, ptype, tag="0", ner="goldstandard", relations=None, nworkers=None):
+    """
+    Classify the relations of a corpus, partitioned by document between worker processes.
+    Each worker creates its own model, so it has its own workspace and external classifier process; the pairs found
+    by the workers are merged in the order of the documents of the corpus, so the results are the same as with a
+    single process. MIL bags group instances of different documents, so with mil only the instances are generated
+    by the workers and the bags are classified by this process.
+    :param nworkers: number of worker processes; config.re_workers by default
+    :return: ResultsRE
+    """
+    if nworkers is None:
+        nworkers = config.re_workers
+    if nworkers <= 1:
+        model = get_relation_model(kernel, corpus, ptype, tag, ner, relations)
+        return classify_corpus(kernel, model, corpus)
+    chunks = get_chunks(corpus, nworkers)
+    logging.info("classifying {} documents in {} chunks with {} workers".format(len(corpus.documents), len(chunks),
+                                                                                 nworkers))
+    pool = multiprocessing.Pool(processes=nworkers)
+    try:
+        if kernel == "mil":
+            model = MILClassifier(corpus, ptype, relations, test=True, ner=ner)
+            tasks = [(ptype, ner, relations, get_subcorpus(corpus, dids)) for dids in chunks]
+            for records in pool.imap(generate_mil_documents, tasks):
+                sentences = dict((sentence.sid, sentence) for did in set([r[0] for r in records])
+                                 for sentence in corpus.documents[did].sentences)
+                for did, sid, instances in records:
+                    sentence = sentences[sid]
+                    sentence_entities = model.get_sentence_entities(sentence)
+                    for bag, i1, i2, features, label in instances:
+                        model.add_instance(bag, (sentence_entities[i1], sentence_entities[i2]), features, label)
+            return get_results(model, corpus)
+        results = ResultsRE("")
+        tasks = [(kernel, ptype, tag, ner, relations, get_subcorpus(corpus, dids)) for dids in chunks]
+        for records in pool.imap(classify_documents, tasks):
+            merge_records(corpus, records, results, RE_KERNELS[kernel])
+        results.corpus = corpus
+        return results
+    finally:
+        pool.close()
+        pool.join()
+
+
+def compare_results(results1, results2):
+    """
+    :return: list of documents whose pairs are different in the two results
+    """
+    different = []
+    for did in set(results1.corpus.documents) | set(results2.corpus.documents):
+        pairs = []
+        for results in (results1, results2):
+            document = results.corpus.documents.get(did)
+            if document is None:
+                pairs.append(None)
+                continue
+            pairs.append([(p.pid, p.eids, p.relation, sorted(p.recognized_by.items()),
+                           (p.entities[0].dstart, p.entities[1].dstart)) for p in document.pairs.pairs] +
+                         [[p.pid for p in results.document_pairs.get(did, Pairs()).pairs],
+                          sorted([pid for pid in results.pairs if results.pairs[pid].did == did])])
+        if pairs[0] != pairs[1]:
+            different.append(did)
+    return different
@@ -0,0 +1,99 @@
+import logging
+
+from nltk.tree import Tree
+
+
+def find_entity_leaf(sentence, leaves, entity_token_index):
+    """
+    Find the leaf of a parse tree corresponding to a token of the sentence. Since the tokenization of the parser may
+    be different, the leaf is matched by its text and by the text of the previous (or next) token.
+    :param sentence: sentence object
+    :param leaves: list of leaf strings of the parse tree
+    :param entity_token_index: order of the token in the sentence
+    :return: index of the leaf, or None if it was not found
+    """
+    last_text = ""
+    match_text = sentence.tokens[entity_token_index].text
+    ref_token = ""
+    if entity_token_index == 0:  # if the entity is the first in the sentence, it's easy
+        return 0
+    if entity_token_index > 0:  # otherwise we have to search because the tokenization may be different
+        ref_token = sentence.tokens[entity_token_index - 1].text
+        # ref_token is used to prevent from matching with the same text but corresponding to a different entity
+        # in this case, it is the previous token
+        for ileaf, leaf in enumerate(leaves):
+            # exact match case
+            if leaf == match_text and (last_text in ref_token or ref_token in last_text):
+                return ileaf
+            # partial match - cover tokenization issues
+            elif (leaf in match_text or match_text in leaf) and (
+                    ref_token in leaf or ref_token in last_text or last_text in ref_token):
+                return ileaf
+            last_text = leaf
+    # if it was no found, use the next token as reference
+    if entity_token_index < sentence.tokens[-1].order:
+        ref_token = sentence.tokens[entity_token_index + 1].text
+        for ileaf, leaf in enumerate(leaves[:-1]):
+            next_text = leaves[ileaf + 1]
+            if leaf == match_text and (next_text in ref_token or ref_token in next_text):
+                return ileaf
+            elif (leaf in match_text or match_text in leaf) and (
+                    ref_token in leaf or ref_token in next_text or next_text in ref_token):
+                return ileaf
+    logging.debug("entity not found: |{}|{}|{}| in |{}|".format(entity_token_index, ref_token, match_text,
+                                                               " ".join(leaves)))
+    return None
+
+
+def mask_entity(sentence, tree, entity, label):
+    """
+    Mask the entity names with a label
+    :param sentence: sentence object
+    :param tree: tree containing the entity
+    :param entity: entity object
+    :param label: string to replace the original text
+    :return: masked tree
+    """
+    leaves_pos = tree.treepositions('leaves')
+    ileaf = find_entity_leaf(sentence, [tree[pos] for pos in leaves_pos], entity.tokens[0].order)
+    if ileaf is not None:
+        tree[leaves_pos[ileaf]] = label
+    return tree
+
+
+class SentenceTree(object):
+    """
+    Parse tree of a sentence, parsed only once and shared by every candidate pair of the sentence.
+    The leaf matched by each token is computed the first time it is needed and kept, so masking the entities of a
+    pair is only a replacement of known leaves.
+    """
+    def __init__(self, sentence):
+        self.sentence = sentence
+        self.tree = Tree.fromstring(sentence.parsetree)
+        self.leaves_pos = self.tree.treepositions('leaves')
+        self.leaves = [self.tree[pos] for pos in self.leaves_pos]
+        self.alignment = {}  # token order => leaf index, or None if no leaf matches the token
+
+    def leaf_index(self, token_order):
+        if token_order not in self.alignment:
+            self.alignment[token_order] = find_entity_leaf(self.sentence, self.leaves, token_order)
+        return self.alignment[token_order]
+
+    def apply_masks(self, masks, function):
+        """
+        Replace the leaves of some entities with labels, apply a function to the masked tree and restore the leaves
+        :param masks: list of (entity, label)
+        :param function: function that receives the masked tree; it should not keep a reference to it
+        :return: result of the function
+        """
+        masked = []
+        for entity, label in masks:
+            ileaf = self.leaf_index(entity.tokens[0].order)
+            if ileaf is not None and ileaf not in masked:
+                self.tree[self.leaves_pos[ileaf]] = label
+                masked.append(ileaf)
+        try:
+            return function(self.tree)
+        finally:
+            for ileaf in masked:
+                self.tree[self.leaves_pos[ileaf]] = self.leaves[ileaf]
@@ -5,8 +5,10 @@ import logging
 import sys
 import itertools
 import re
+from collections import OrderedDict
 
 import config.seedev_types
+from classification.rext.candidates import CandidateGenerator
 from classification.rext.kernelmodels import ReModel
 from classification.results import ResultsRE
 from config import config
@@ -23,9 +25,12 @@ class RuleClassifier(ReModel):
         self.ptype = ptype
         self.corpus = corpus
         self.pairs = {}
-        self.pids = {}
+        self.pids = OrderedDict()  # pid => pair, in the order they were found
         self.trigger_words = set([])
         self.ner_model = ner
+        self.candidates = CandidateGenerator(config.relation_types[self.ptype]["source_types"],
+                                             config.relation_types[self.ptype]["target_types"], pairtype=self.ptype,
+                                             same_text=True)
 
 
     def load_classifier(self):
@@ -39,7 +44,6 @@ class RuleClassifier(ReModel):
         pcount = 0
         ptrue = 0
         unique_relations = {}
-        pairtypes = (config.relation_types[self.ptype]["source_types"], config.relation_types[self.ptype]["target_types"])
         # pairtypes = (config.event_types[pairtype]["source_types"], config.event_types[pairtype]["target_types"])
         for sentence in self.corpus.get_sentences(self.ner_model):
             #doc_entities = self.corpus.documents[did].get_entities("goldstandard")
@@ -47,35 +51,30 @@ class RuleClassifier(ReModel):
             sentence_entities = [entity for entity in sentence.entities.elist[self.ner_model]]
             # logging.debug("sentence {} has {} entities ({})".format(sentence.sid, len(sentence_entities), len(sentence.entities.elist["goldstandard"])))
             # doc_entities += sentence_entities
-            for pair in itertools.permutations(sentence_entities, 2):
-                if self.ptype in ("Has_Sequence_Identical_To", "Is_Functionally_Equivalent_To") and pair[0].type != pair[1].type:
-                    continue
-                if pair[0].text == pair[1].text:
-                    continue
+            # only pairs of the source and target types are generated, and all of them are true for this rule
+            for pair in self.candidates.get_pairs(sentence_entities):
                 pid = did + ".p" + str(pcount)
-                self.pids[pid] = pair
-                self.pairs[pid] = 0
                 # logging.info("relation: {}=>{}".format(pair[0].type, pair[1].type))
-                if pair[0].type in pairtypes[0] and pair[1].type in pairtypes[1]:
-                    # logging.info("mirna-dna relation: {}=>{}".format(pair[0].text, pair[1].text))
+                # logging.info("mirna-dna relation: {}=>{}".format(pair[0].text, pair[1].text))
 
-                    #rel_text = "{0.type}#{0.text}\t{1}\t{2.type}#{2.text}".format(pair[0], self.ptype, pair[1])
-                    #if rel_text in self.relations:
-                    self.pairs[pid] = 1
-                    ptrue += 1
-                    self.pids[pid] = pair
-                    """if rel_text not in self.relations:
-                        #unique_relations[rel_text] = set()
-                    if (pair[1].eid, self.ptype) in pair[0].targets:
-                        unique_relations[rel_text].add(1)
-                    else:
-                        unique_relations[rel_text].add(0)"""
+                #rel_text = "{0.type}#{0.text}\t{1}\t{2.type}#{2.text}".format(pair[0], self.ptype, pair[1])
+                #if rel_text in self.relations:
+                self.pairs[pid] = 1
+                ptrue += 1
+                self.pids[pid] = pair
+                """if rel_text not in self.relations:
+                    #unique_relations[rel_text] = set()
+                if (pair[1].eid, self.ptype) in pair[0].targets:
+                    unique_relations[rel_text].add(1)
+                else:
+                    unique_relations[rel_text].add(0)"""
                 #elif pair[1].type in config.pair_types[self.ptype]["source_types"] and\
                 #     pair[0].type in config.pair_types[self.ptype]["target_types"]:
                 #    self.pids[pid] = (pair[1], pair[0])
                 #    self.pairs[pid] = 1
                 #    ptrue += 1
                 pcount += 1
+        logging.info(self.candidates.report())
         # print unique_relations
         # never relation
         # print len([r for r in unique_relations if 0 in unique_relations[r] and len(unique_relations[r]) == 1])
@@ -1,14 +1,14 @@
 import os
 import logging
+import time
 
 import itertools
-import word2vec
 import numpy as np
 import sys
 from sklearn import svm
 from sklearn.dummy import DummyClassifier
 from sklearn.externals import joblib
-from sklearn.feature_extraction.text import CountVectorizer, TfidfTransformer
+from sklearn.feature_extraction.text import CountVectorizer, HashingVectorizer, TfidfTransformer
 from sklearn.feature_selection import SelectKBest, chi2
 from sklearn.linear_model import SGDClassifier
 from sklearn.naive_bayes import MultinomialNB
@@ -21,13 +21,18 @@ from sklearn.metrics import f1_score, make_scorer
 import config.seedev_types
 from classification.results import ResultsRE
 from classification.rext.kernelmodels import ReModel
+from classification.rext.wordclusters import get_clusters
 from config import config
 from text.pair import Pairs
 from text.sentence import Sentence
 
 
 class ScikitRE(ReModel):
-    def __init__(self, corpus, relationtype, modelname="scikit_classifier"):
+    def __init__(self, corpus, relationtype, modelname="scikit_classifier", vectorizer=None):
+        """
+        :param vectorizer: "count" for a vocabulary of every character n-gram, or "hashing" for a fixed number of
+        hashed features (config.scikit_hash_features), which bounds the memory used; config.scikit_vectorizer by default
+        """
         super(ScikitRE, self).__init__()
         self.modelname = relationtype + "_" + modelname
         self.relationtype = relationtype
@@ -37,10 +42,19 @@ class ScikitRE(ReModel):
         self.features = []
         self.labels = []
         self.pred = []
-        self.clusters = word2vec.load_clusters("corpora/Thaliana/documents-processed-clusters.txt")
+        self.clusters = get_clusters("corpora/Thaliana/documents-processed-clusters.txt")
         self.posfmeasure = make_scorer(f1_score, average='binary', pos_label=True)
         self.generate_data(corpus, modelname, relationtype)
-        self.text_clf = Pipeline([('vect', CountVectorizer(analyzer='char_wb', ngram_range=(3,20), min_df=0.0, max_df=0.7)),
+        if vectorizer is None:
+            vectorizer = config.scikit_vectorizer
+        self.vectorizer = vectorizer
+        if vectorizer == "hashing":
+            # max_df can not be applied without a vocabulary
+            vect = HashingVectorizer(analyzer='char_wb', ngram_range=(3,20), n_features=config.scikit_hash_features,
+                                     non_negative=True, norm=None)
+        else:
+            vect = CountVectorizer(analyzer='char_wb', ngram_range=(3,20), min_df=0.0, max_df=0.7)
+        self.text_clf = Pipeline([('vect', vect),
                                   #('vect', CountVectorizer(ngram_range=(1,3), binary=False, max_features=None)),
                                   #('tfidf', TfidfTransformer(use_idf=True, norm="l2")),
                                   #('clf', SGDClassifier(loss='hinge', penalty='l1', alpha=0.0001, n_iter=5, random_state=42)),
@@ -176,15 +190,21 @@ class ScikitRE(ReModel):
         # gs_clf = gs_clf.fit(self.features, self.labels)
         # print gs_clf.best_params_
         logging.info("Traning with {}/{} true pairs".format(str(sum(self.labels)), str(len(self.labels))))
+        start_time = time.time()
         try:
             self.text_clf = self.text_clf.fit(self.features, self.labels)
         except ValueError:
             print "error training {}".format(self.modelname)
             return
+        logging.info("{}: {} features, fit in {:.1f}s".format(self.modelname, self.get_nfeatures(),
+                                                             time.time() - start_time))
         if not os.path.exists(self.basedir + self.modelname):
             os.makedirs(self.basedir + self.modelname)
         logging.info("Training complete, saving to {}/{}/{}.pkl".format(self.basedir, self.modelname, self.modelname))
         joblib.dump(self.text_clf, "{}/{}/{}.pkl".format(self.basedir, self.modelname, self.modelname))
+        if self.vectorizer == "hashing":
+            # hashed features have no names
+            return
         ch2 = SelectKBest(chi2, k=20)
         half_point = int(len(self.features)*0.5)
         X_train = self.text_clf.named_steps["vect"].fit_transform(self.features[:half_point])
@@ -198,11 +218,25 @@ class ScikitRE(ReModel):
         # joblib.dump(gs_clf.best_estimator_, "{}/{}/{}.pkl".format(self.basedir, self.modelname, self.modelname))
         # self.test()
 
+    def get_nfeatures(self):
+        """
+        :return: vocabulary size of the count vectorizer, or the number of hashed features
+        """
+        vect = self.text_clf.named_steps["vect"]
+        if isinstance(vect, HashingVectorizer):
+            return vect.n_features
+        return len(vect.vocabulary_)
+
     def load_classifier(self):
         self.text_clf = joblib.load("{}/{}/{}.pkl".format(self.basedir, self.modelname, self.modelname))
 
     def test(self):
+        start_time = time.time()
         self.pred = self.text_clf.predict(self.features)
+        test_time = time.time() - start_time
+        logging.info("{}: classified {} pairs in {:.1f}s ({:.1f} pairs/s, {} features)".format(
+            self.modelname, len(self.features), test_time, len(self.features) / max(test_time, 0.000001),
+            self.get_nfeatures()))
 
         # for doc, category in zip(self.features, self.pred):
         #     print '%r => %s' % (doc, category)
@@ -24,9 +24,9 @@ class StanfordRE(ReModel):
         self.corpus = corpus
 
     def generate_data(self, corpus, modelname, pairtypes):
-        if os.path.isfile(self.temp_dir + modelname + ".txt"):
+        if os.path.isfile(self.workspace + modelname + ".txt"):
             print "removed old data"
-            os.remove(self.temp_dir + modelname + ".txt")
+            os.remove(self.workspace + modelname + ".txt")
         trainlines = []
         # get all entities of this document
         # doc_entities = []
@@ -82,25 +82,31 @@ class StanfordRE(ReModel):
 
 
         logging.info("Writing {} lines...".format(len(trainlines)))
-        with codecs.open(self.temp_dir + modelname + ".corp", 'w', "utf-8") as trainfile:
+        with codecs.open(self.workspace + modelname + ".corp", 'w', "utf-8") as trainfile:
             for l in trainlines:
                 # print l
                 trainfile.write("\t".join(l) + "\n")
         logging.info("True/total relations:{}/{} ({})".format(truepcount, pcount, str(1.0*truepcount/pcount)))
 
     def write_props(self):
+        """
+        Write a copy of the CoreNLP roth.properties to the workspace, pointing to the model and training file of this
+        run, so that the shared properties file is not modified
+        :return: path of the properties file
+        """
         with open(config.corenlp_dir + "roth.properties", 'r') as propfile:
             lines = propfile.readlines()
 
         print lines
-        with open(config.corenlp_dir + "roth.properties", 'w') as propfile:
+        with open(self.workspace + "roth.properties", 'w') as propfile:
             for l in lines:
                 if l.startswith("serializedRelationExtractorPath"):
                     propfile.write("serializedRelationExtractorPath = {}\n".format(config.corenlp_dir + self.modelname))
                 elif l.startswith("trainPath"):
-                    propfile.write("trainPath = {}\n".format(self.temp_dir + self.modelname + ".corp"))
+                    propfile.write("trainPath = {}\n".format(self.workspace + self.modelname + ".corp"))
                 else:
                     propfile.write(l)
+        return self.workspace + "roth.properties"
 
     def train(self):
         self.generate_data(self.corpus, self.modelname, pairtypes=self.relationtype)
@@ -108,13 +114,13 @@ class StanfordRE(ReModel):
         if os.path.isfile(config.corenlp_dir + self.modelname):
             print "removed old model"
             os.remove(config.corenlp_dir + self.modelname)
-        if not os.path.isfile(self.temp_dir + self.modelname  + ".corp"):
-            print "could not find training file " + config.corenlp_dir + self.modelname + ".corp"
+        if not os.path.isfile(self.workspace + self.modelname  + ".corp"):
+            print "could not find training file " + self.workspace + self.modelname + ".corp"
             sys.exit()
-        self.write_props()
+        propspath = self.write_props()
         classpath = config.corenlp_dir + "*"
         srecall = ['java', '-mx3g', '-classpath', classpath, "edu.stanford.nlp.ie.machinereading.MachineReading",
-                          "--arguments",  config.corenlp_dir + "roth.properties"]
+                          "--arguments",  propspath]
         print " ".join(srecall)
         # sys.exit()
         srecall = Popen(srecall) #, stdout=PIPE, stderr=PIPE)
@@ -4,10 +4,14 @@ from subprocess import Popen, PIPE
 import codecs
 import sys
 import re
+from collections import OrderedDict
 
 import itertools
 from config import config
+from classification.rext import parsetrees
+from classification.rext.candidates import CandidateGenerator
 from classification.rext.kernelmodels import ReModel
+from classification.rext.svmtkserver import get_svmtk_server, SVM_CLASSIFY
 # from nltk import WordNetLemmatizer
 from nltk.stem.porter import *
 from nltk.tree import Tree
@@ -23,85 +27,77 @@ class SVMTKernel(ReModel):
         super(SVMTKernel, self).__init__()
         self.modelname = relationtype + "_" + modelname + "_svmtk"
         self.test_svmtk = []
-        self.pids = {}
+        self.pids = OrderedDict()  # pid => pair, in the order of the examples file
         # self.lmtzr = WordNetLemmatizer()
         self.stemmer = PorterStemmer()
         self.pair_type = relationtype
         self.ner_model = ner
-        self.generate_data(corpus)
-
+        self.candidates = CandidateGenerator(config.relation_types[self.pair_type]["source_types"],
+                                             config.relation_types[self.pair_type]["target_types"], ordered=False)
+        self.server = None  # resident SVM-light-TK server, used instead of running svm_classify for each call
+        self.examplesfile = self.workspace + self.modelname + ".txt"
+        self.outputfile = self.workspace + "svm_test_output.txt"
+        if corpus is not None:
+            self.generate_data(corpus)
 
     def generate_data(self, corpus):
-        if os.path.isfile(self.temp_dir + self.modelname + ".txt"):
-            os.remove(self.temp_dir + self.modelname + ".txt")
-        xerrors = 0
-
-            #print pairs
-        pairtypes = (config.relation_types[self.pair_type]["source_types"], config.relation_types[self.pair_type]["target_types"])
-        for sentence in corpus.get_sentences("goldstandard"):
-            doc_lines = []
-            pcount = 0
-            logging.info("{}".format(sentence.sid))
-            sentence_entities = [entity for entity in sentence.entities.elist["goldstandard"]]
-            # logging.debug("sentence {} has {} entities ({})".format(sentence.sid, len(sentence_entities), len(sentence.entities.elist["goldstandard"])))
-            for pair in itertools.combinations(sentence_entities, 2):
-                if pair[0].type == pairtypes[0] and pair[1].type == pairtypes[1] or pair[1].type == pairtypes[0] and pair[0].type == pairtypes[1]:
-                    # logging.debug(pair)
-                    if pair[0].type == pairtypes[0]:
-                        e1id = pair[0].eid
-                        e2id = pair[1].eid
-                    else:
-                        e1id = pair[1].eid
-                        e2id = pair[0].eid
-                        pair = (pair[1], pair[0])
-                    pid = sentence.did + ".p" + str(pcount)
-                    """if sid1 != sid2:
-                        sentence1 = corpus.documents[did].get_sentence(sid1)
-                        tree1 = self.mask_entity(sentence1, Tree.fromstring(sentence1.parsetree), pair[0], "candidate1")
-                        sentence2 = corpus.documents[did].get_sentence(sid2)
-                        tree2 = self.mask_entity(sentence2, Tree.fromstring(sentence2.parsetree), pair[1], "candidate2")
-                        tree = self.join_trees(tree1, tree2)
-                    else:"""
-                    sentence1 = corpus.documents[sentence.did].get_sentence(pair[0].sid)
-                    if sentence1.parsetree == "SENTENCE_SKIPPED_OR_UNPARSABLE":
-                        logging.info("skipped {}=>{} on sentence {}-{}".format(pair[0].text, pair[1].text, sentence1.sid, sentence1.text))
-                        continue
-                    tree = Tree.fromstring(sentence1.parsetree)
-                    if "candidate1" in sentence1.parsetree:
-                        logging.info(sentence1.parsetree)
-                    tree = self.mask_entity(sentence1, tree, pair[0], "candidate1")
-                    tree = self.mask_entity(sentence1, tree, pair[1], "candidate2")
-                    # if tree[0] != '(':
-                    #     tree = '(S (' + tree + ' NN))'
-                    #this depends on the version of nlkt
-
-                    tree, found = self.get_path(tree)
-                    #if len(docs[sid][ddi.SENTENCE_ENTITIES]) > 20:
-                        #print line
-                    #    line = "1 |BT| (ROOT (NP (NN candidatedrug) (, ,) (NN candidatedrug))) |ET|"
-                    #    xerrors += 1
-                    #else:
-                    # tree = self.normalize_leaves(tree)
-                    line = self.get_svm_train_line(tree, pair)
-                    if (pair[1].eid, self.pair_type) not in pair[0].targets:
-                        line = '-' + line
-                    else:
-                        logging.debug("true relations: {}={}>{}".format(pair[0].text, self.pair_type, pair[1].text))
+        if os.path.isfile(self.examplesfile):
+            os.remove(self.examplesfile)
+        with codecs.open(self.examplesfile, 'a', "utf-8") as train:
+            for sentence in corpus.get_sentences("goldstandard"):
+                logging.info("{}".format(sentence.sid))
+                doc_lines = []
+                for pair, line in self.get_sentence_examples(sentence):
+                    pid = sentence.did + ".p" + str(len(self.pids))
                     self.pids[pid] = pair
                     doc_lines.append(line)
-                    pcount += 1
-            logging.debug("writing {} lines to file...".format(len(doc_lines)))
-            with codecs.open(self.temp_dir + self.modelname + ".txt", 'a', "utf-8") as train:
+                logging.debug("writing {} lines to file...".format(len(doc_lines)))
                 for l in doc_lines:
                     train.write(l)
-        logging.info("wrote {}{}.txt".format(self.temp_dir, self.modelname))
+        logging.info(self.candidates.report())
+        logging.info("wrote {}".format(self.examplesfile))
+
+    def get_sentence_examples(self, sentence):
+        """
+        Generate the tree kernel example of each candidate pair of a sentence
+        :param sentence: Sentence object
+        :return: list of (pair, example line)
+        """
+        examples = []
+        sentence_entities = [entity for entity in sentence.entities.elist["goldstandard"]]
+        sentence_tree = None  # parsed only if the sentence has candidate pairs
+        # logging.debug("sentence {} has {} entities ({})".format(sentence.sid, len(sentence_entities), len(sentence.entities.elist["goldstandard"])))
+        # each pair of entities is a candidate once, with the source entity first
+        for pair in self.candidates.get_pairs(sentence_entities):
+            # logging.debug(pair)
+            if sentence.parsetree == "SENTENCE_SKIPPED_OR_UNPARSABLE":
+                logging.info("skipped {}=>{} on sentence {}-{}".format(pair[0].text, pair[1].text, sentence.sid, sentence.text))
+                continue
+            if sentence_tree is None:
+                if "candidate1" in sentence.parsetree:
+                    logging.info(sentence.parsetree)
+                sentence_tree = parsetrees.SentenceTree(sentence)
+            # if tree[0] != '(':
+            #     tree = '(S (' + tree + ' NN))'
+            #this depends on the version of nlkt
+
+            tree, found = sentence_tree.apply_masks([(pair[0], "candidate1"), (pair[1], "candidate2")],
+                                                    self.get_path)
+            # tree = self.normalize_leaves(tree)
+            line = self.get_svm_train_line(tree, pair)
+            if (pair[1].eid, self.pair_type) not in pair[0].targets:
+                line = '-' + line
+            else:
+                logging.debug("true relations: {}={}>{}".format(pair[0].text, self.pair_type, pair[1].text))
+            examples.append((pair, line))
+        return examples
 
     def train(self, excludesentences=[]):
         if os.path.isfile(self.basedir + self.modelname):
             os.remove(self.basedir + self.modelname)
         svmlightargs = ["./bin/svm-light-TK-1.2/svm-light-TK-1.2.1/svm_learn", "-t", "5",
                                "-L", "0.5", "-T", "2", "-S", "2", "-g", "1",
-                              "-D", "1", "-C", "T", self.temp_dir + self.modelname + ".txt",
+                              "-D", "1", "-C", "T", self.examplesfile,
                               self.basedir + self.modelname]
         print " ".join(svmlightargs)
         svmlightcall = Popen(svmlightargs,)
@@ -112,14 +108,24 @@ class SVMTKernel(ReModel):
             print res
             sys.exit()
 
-    def load_classifier(self):
-        if os.path.isfile(self.basedir + "svm_test_data.txt"):
-                os.remove(self.basedir + "svm_test_data.txt")
-        if os.path.isfile(self.basedir + "svm_test_output.txt"):
-                os.remove(self.basedir + "svm_test_output.txt")
-        self.test_svmtk = ["./bin/svm-light-TK-1.2/svm-light-TK-1.2.1/svm_classify",
-                              self.temp_dir + self.modelname + ".txt",  self.basedir + self.modelname,
-                              self.temp_dir + "svm_test_output.txt"]
+    def load_classifier(self, server=False):
+        """
+        :param server: score the examples with a resident SVM-light-TK server shared by every SVMTKernel using the
+        same model
+        """
+        if os.path.isfile(self.outputfile):
+                os.remove(self.outputfile)
+        self.test_svmtk = [SVM_CLASSIFY, self.examplesfile,  self.basedir + self.modelname, self.outputfile]
+        if server:
+            self.get_server()
+
+    def get_server(self):
+        """
+        :return: resident server of the model; it is got from the model registry on each use, since the registry
+        stops the servers that it evicts
+        """
+        self.server = get_svmtk_server(self.basedir + self.modelname, self.workspace)
+        return self.server
 
     def test(self, model="svm_tk_classifier.model"):
         """
@@ -135,19 +141,38 @@ class SVMTKernel(ReModel):
         #pidlist = pairs.keys()
         total = 0
         #print "tree errors:", xerrors, "total:", total
-
+        if self.server is not None:
+            with codecs.open(self.examplesfile, 'r', "utf-8") as examples:
+                scores = self.get_server().predict(examples.readlines())
+            with open(self.outputfile, 'w') as out:
+                out.writelines(scores)
+            return
         svmlightcall = Popen(self.test_svmtk) #, stdout=PIPE, stderr=PIPE)
         res  = svmlightcall.communicate()
         # logging.debug(res[0].split('\n')[-3:])
         #os.system(' '.join(svmtklightargs))
-        if not os.path.isfile(self.temp_dir + "svm_test_output.txt"):
+        if not os.path.isfile(self.outputfile):
             print "something went wrong with SVM-light-TK"
             print res
             sys.exit()
 
+    def annotate_sentence(self, sentence):
+        """
+        Score the candidate pairs of one sentence with the resident server
+        :param sentence: Sentence object
+        :return: list of pairs classified as relations
+        """
+        examples = self.get_sentence_examples(sentence)
+        scores = self.get_server().predict([line for pair, line in examples])
+        pairs = []
+        for (pair, line), score in zip(examples, scores):
+            if float(score) >= 0:
+                pairs.append(sentence.add_relation(pair[0], pair[1], self.pair_type, relation=True))
+        return pairs
+
     def get_predictions(self, corpus, resultfile="jsre_results.txt"):
         results = ResultsRE(resultfile)
-        with open(self.temp_dir + "svm_test_output.txt", 'r') as out:
+        with open(self.outputfile, 'r') as out:
             lines = out.readlines()
         # npairs = sum([len(corpus.documents[did].pairs.pairs) for did in corpus.documents])
         # if len(lines) != npairs:
@@ -206,46 +231,7 @@ class SVMTKernel(ReModel):
         :param label: string to replace the original text
         :return: masked tree
         """
-        last_text = ""
-        match_text = entity.tokens[0].text
-        found = False
-        entity_token_index = entity.tokens[0].order
-        leaves_pos = tree.treepositions('leaves')
-        # logging.info("replace {} with {}".format(match_text, label))
-        if entity_token_index == 0: # if the entity is the first in the sentence, it's easy
-            tree[leaves_pos[0]] = label
-            return tree
-        if entity_token_index > 0: # otherwise we have to search because the tokenization may be different
-            ref_token = sentence.tokens[entity_token_index - 1].text
-            # logging.info("replace {}|({}) with {}".format(ref_token, match_text, label))
-            # ref_token is used to prevent from matching with the same text but corresponding to a different entity
-            # in this case, it is the previous token
-            for pos in leaves_pos:
-                #exact match case
-                if tree[pos] == match_text and (last_text in ref_token or ref_token in last_text):
-                    tree[pos] = label
-                    return tree
-                # partial match - cover tokenization issues
-                elif (tree[pos] in match_text or match_text in tree[pos]) and (ref_token in tree[pos] or ref_token in last_text or last_text in ref_token):
-                    tree[pos] = label
-                    return tree
-                last_text = tree[pos]
-        # if it was no found, use the next token as reference
-        if entity_token_index < sentence.tokens[-1].order and not found:
-            for ipos, pos in enumerate(leaves_pos[:-1]):
-                ref_token = sentence.tokens[entity_token_index + 1].text
-                # logging.info("replace ({})|{} with {}".format(match_text, ref_token, label))
-                next_pos = leaves_pos[ipos+1]
-                next_text = tree[next_pos]
-                if tree[pos] == match_text and (next_text in ref_token or ref_token in next_text):
-                    tree[pos] = label
-                    return tree
-                elif (tree[pos] in match_text or match_text in tree[pos]) and (ref_token in tree[pos] or ref_token in next_text or next_text in ref_token):
-                    tree[pos] = label
-                    return tree
-
-        logging.debug("entity not found: |{}|{}|{}|{} in |{}|".format(entity_token_index, ref_token, match_text, label, str(tree)))
-        return tree
+        return parsetrees.mask_entity(sentence, tree, entity, label)
 
     def normalize_leaves(self, tree):
         tree = Tree.fromstring(tree)
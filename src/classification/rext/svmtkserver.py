@@ -0,0 +1,57 @@
+from __future__ import unicode_literals
+import codecs
+import os
+from subprocess import Popen, PIPE
+
+from classification.modelregistry import registry
+from classification.rext.classifierserver import ClassifierServer
+from config import config
+
+SVM_CLASSIFY = "./bin/svm-light-TK-1.2/svm-light-TK-1.2.1/svm_classify"
+
+
+class SVMTKServer(ClassifierServer):
+    """
+    Long-lived SVM-light-TK classification service for one tree kernel model. The examples of each batch are split
+    into contiguous shards scored by svm_classify processes running at the same time, and the scores are joined in
+    the original order.
+    """
+    def __init__(self, modelpath, nshards=1, **kwargs):
+        """
+        :param nshards: number of svm_classify processes used for each batch
+        """
+        super(SVMTKServer, self).__init__("svmtk", modelpath, **kwargs)
+        self.nshards = nshards
+
+    def classify(self, lines, workspace):
+        shard_size = len(lines) // self.nshards + (len(lines) % self.nshards > 0)
+        shards = []
+        for i, start in enumerate(range(0, len(lines), shard_size)):
+            examplesfile = os.path.join(workspace, "shard{}.txt".format(i))
+            outputfile = os.path.join(workspace, "shard{}_output.txt".format(i))
+            if os.path.isfile(outputfile):
+                os.remove(outputfile)
+            with codecs.open(examplesfile, 'w', "utf-8") as examples:
+                for l in lines[start:start + shard_size]:
+                    examples.write(l)
+            process = Popen([SVM_CLASSIFY, examplesfile, self.modelpath, outputfile], stdout=PIPE, stderr=PIPE)
+            shards.append((process, outputfile))
+        scores = []
+        for process, outputfile in shards:
+            res = process.communicate()
+            if not os.path.isfile(outputfile):
+                raise RuntimeError("something went wrong with SVM-light-TK: {}".format(res[1]))
+            with open(outputfile, 'r') as output:
+                scores += output.readlines()
+        return scores
+
+
+def get_svmtk_server(modelpath, temp_dir="temp/"):
+    """
+    Return the SVM-light-TK server of a model, starting it the first time it is requested
+    """
+    return registry.get(modelpath, "svmtk",
+                        lambda: SVMTKServer(modelpath, nshards=config.svmtk_shards, nworkers=config.svmtk_workers,
+                                            batch_wait=config.svmtk_batch_wait, temp_dir=temp_dir,
+                                            timeout=config.classifier_timeout).start(),
+                        unload=lambda server: server.stop())
@@ -0,0 +1,487 @@
+from __future__ import unicode_literals
+import logging
+import re
+
+from nltk.tree import Tree
+
+# relation operators, longest first so that the parser takes the longest match
+RELATIONS = ["<<,", "<<-", ">>,", ">>-", "$++", "$--", "$..", "$,,", "<<", ">>", "$+", "$-", "$.", "$,", "..", ",,", "<,", "<-",
+             "<:", ">,", ">-", ">:", "<", ">", "$", ".", ","]
+LABEL_END = " \t\n()[]=<>"
+# characters that start the annotations of a label (NP-SBJ, NP=2), removed to get its basic category
+ANNOTATION_CHARS = "-=|#^~_"
+
+
+def basic_category(label):
+    """
+    :return: label without its annotations, as the Penn Treebank language pack of tregex does; a label that starts with
+    an annotation character keeps it and its closing character (-LRB-, -NONE-)
+    """
+    first = None
+    for i, c in enumerate(label):
+        if c in ANNOTATION_CHARS:
+            if i == 0:
+                first = c
+            elif c == first:
+                first = None
+            else:
+                return label[:i]
+    return label
+
+
+class TreeIndex(object):
+    """
+    Nodes of a parse tree in pre-order, with their labels, parents, children and terminal spans, built with a single
+    traversal. Leaves are nodes too, labeled with the word.
+    """
+    def __init__(self, tree):
+        self.labels = []
+        self.parents = []
+        self.children = []
+        self.starts = []  # index of the first terminal of each node
+        self.ends = []  # index after the last terminal of each node
+        self.tagged_words = []  # word/tag of each terminal
+        self.subtree_ends = []  # index after the last node of the subtree of each node
+        self.add_node(tree, None, None)
+
+    def add_node(self, tree, parent, parent_label):
+        node = len(self.labels)
+        self.parents.append(parent)
+        self.children.append([])
+        self.starts.append(len(self.tagged_words))
+        self.ends.append(None)
+        self.subtree_ends.append(None)
+        if isinstance(tree, Tree):
+            self.labels.append(tree.label())
+            for child in tree:
+                self.children[node].append(self.add_node(child, node, tree.label()))
+        else:
+            self.labels.append(tree)
+            self.tagged_words.append("{}/{}".format(tree, parent_label))
+        self.ends[node] = len(self.tagged_words)
+        self.subtree_ends[node] = len(self.labels)
+        return node
+
+    def descendants(self, node):
+        # in pre-order, the descendants of a node are the nodes that follow it until its subtree ends
+        return range(node + 1, self.subtree_ends[node])
+
+    def ancestors(self, node):
+        ancestors = []
+        parent = self.parents[node]
+        while parent is not None:
+            ancestors.append(parent)
+            parent = self.parents[parent]
+        return ancestors
+
+    def sisters(self, node):
+        if self.parents[node] is None:
+            return [], []
+        siblings = self.children[self.parents[node]]
+        i = siblings.index(node)
+        return siblings[:i], siblings[i+1:]
+
+    def tagged_yield(self, node):
+        return " ".join(self.tagged_words[self.starts[node]:self.ends[node]])
+
+    def related(self, node, op, nth=None):
+        """
+        :return: list of the nodes B such that "node op B" holds
+        """
+        parent = self.parents[node]
+        if op == "<":
+            if nth is None:
+                return self.children[node]
+            children = self.children[node]
+            i = nth - 1 if nth > 0 else len(children) + nth
+            return [children[i]] if 0 <= i < len(children) else []
+        elif op == ">":
+            if parent is None:
+                return []
+            if nth is None:
+                return [parent]
+            siblings = self.children[parent]
+            i = nth - 1 if nth > 0 else len(siblings) + nth
+            return [parent] if 0 <= i < len(siblings) and siblings[i] == node else []
+        elif op == "<<":
+            return self.descendants(node)
+        elif op == ">>":
+            return self.ancestors(node)
+        elif op == "<,":
+            return self.children[node][:1]
+        elif op == "<-":
+            return self.children[node][-1:]
+        elif op == "<:":
+            return self.children[node] if len(self.children[node]) == 1 else []
+        elif op == ">,":
+            return [parent] if parent is not None and self.children[parent][0] == node else []
+        elif op == ">-":
+            return [parent] if parent is not None and self.children[parent][-1] == node else []
+        elif op == ">:":
+            return [parent] if parent is not None and len(self.children[parent]) == 1 else []
+        elif op == "<<,":
+            nodes = []
+            while self.children[node]:
+                node = self.children[node][0]
+                nodes.append(node)
+            return nodes
+        elif op == "<<-":
+            nodes = []
+            while self.children[node]:
+                node = self.children[node][-1]
+                nodes.append(node)
+            return nodes
+        elif op == ">>,":
+            return [a for a in self.ancestors(node) if self.starts[a] == self.starts[node] and
+                    all(self.children[p][0] == c for c, p in self.chain(node, a))]
+        elif op == ">>-":
+            return [a for a in self.ancestors(node) if self.ends[a] == self.ends[node] and
+                    all(self.children[p][-1] == c for c, p in self.chain(node, a))]
+        elif op == "$":
+            left, right = self.sisters(node)
+            return left + right
+        elif op in ("$+", "$."):
+            return self.sisters(node)[1][:1]
+        elif op in ("$-", "$,"):
+            return self.sisters(node)[0][-1:]
+        elif op in ("$++", "$.."):
+            return self.sisters(node)[1]
+        elif op in ("$--", "$,,"):
+            return self.sisters(node)[0]
+        elif op == ".":
+            return [n for n in range(len(self.labels)) if self.starts[n] == self.ends[node] and
+                    self.ends[n] > self.starts[n]]
+        elif op == ",":
+            return [n for n in range(len(self.labels)) if self.ends[n] == self.starts[node] and
+                    self.ends[n] > self.starts[n]]
+        elif op == "..":
+            return [n for n in range(len(self.labels)) if self.starts[n] >= self.ends[node] and
+                    self.ends[n] > self.starts[n]]
+        elif op == ",,":
+            return [n for n in range(len(self.labels)) if self.ends[n] <= self.starts[node] and
+                    self.ends[n] > self.starts[n]]
+        raise ValueError("unknown relation {}".format(op))
+
+    def chain(self, node, ancestor):
+        # (child, parent) links from node up to ancestor
+        links = []
+        while node != ancestor:
+            links.append((node, self.parents[node]))
+            node = self.parents[node]
+        return links
+
+
+class NodePattern(object):
+    """Node description (label alternatives, regular expressions or __) with a name and relations"""
+    def __init__(self, alternatives, negated=False, name=None, basic=False):
+        self.alternatives = alternatives  # list of strings or compiled regular expressions; None matches any
+        self.negated = negated
+        self.name = name
+        self.basic = basic  # @: match the basic category of the labels
+        self.relations = None
+
+    def label_matches(self, label):
+        if self.basic:
+            label = basic_category(label)
+        if self.alternatives is None:
+            matches = True
+        else:
+            matches = any(a.search(label) if hasattr(a, "search") else a == label for a in self.alternatives)
+        return matches != self.negated
+
+    def match(self, index, node, bindings):
+        """
+        :return: generator of the bindings (name => node) of each way the pattern matches at node
+        """
+        if not self.label_matches(index.labels[node]):
+            return
+        if self.name is not None:
+            if self.name in bindings:
+                if bindings[self.name] != node:
+                    return
+            else:
+                bindings = dict(bindings)
+                bindings[self.name] = node
+        if self.relations is None:
+            yield bindings
+        else:
+            for b in self.relations.match(index, node, bindings):
+                yield b
+
+
+class Relation(object):
+    def __init__(self, op, target, nth=None, negated=False, optional=False):
+        self.op = op
+        self.target = target
+        self.nth = nth
+        self.negated = negated
+        self.optional = optional
+
+    def match(self, index, node, bindings):
+        found = False
+        for other in index.related(node, self.op, self.nth):
+            for b in self.target.match(index, other, bindings):
+                if self.negated:
+                    return
+                found = True
+                yield b
+        if self.negated or (self.optional and not found):
+            yield bindings
+
+
+class Conjunction(object):
+    def __init__(self, items, negated=False, optional=False):
+        self.items = items
+        self.negated = negated
+        self.optional = optional
+
+    def match(self, index, node, bindings):
+        found = False
+        for b in self.match_items(index, node, bindings, 0):
+            if self.negated:
+                return
+            found = True
+            yield b
+        if self.negated or (self.optional and not found):
+            yield bindings
+
+    def match_items(self, index, node, bindings, i):
+        if i == len(self.items):
+            yield bindings
+            return
+        for b in self.items[i].match(index, node, bindings):
+            for b2 in self.match_items(index, node, b, i + 1):
+                yield b2
+
+
+class Disjunction(object):
+    def __init__(self, items, negated=False, optional=False):
+        self.items = items
+        self.negated = negated
+        self.optional = optional
+
+    def match(self, index, node, bindings):
+        found = False
+        for item in self.items:
+            for b in item.match(index, node, bindings):
+                if self.negated:
+                    return
+                found = True
+                yield b
+        if self.negated or (self.optional and not found):
+            yield bindings
+
+
+class PatternParser(object):
+    """
+    Parser of the subset of the tregex syntax used by the miRTex rules: node labels, alternatives (A|B),
+    regular expressions (/re/), __, negated labels (!A), basic categories (@A), names (=name), the relations of
+    RELATIONS and <N/>N, negated (!) and optional (?) relations, relation disjunctions (|, [ ]) and parenthesized
+    sub-patterns.
+    """
+    def __init__(self, text):
+        self.text = text.strip()
+        self.pos = 0
+
+    def error(self, message):
+        return ValueError("{} at position {} of pattern {}".format(message, self.pos, self.text))
+
+    def skip_spaces(self):
+        while self.pos < len(self.text) and self.text[self.pos].isspace():
+            self.pos += 1
+
+    def peek(self):
+        self.skip_spaces()
+        return self.text[self.pos] if self.pos < len(self.text) else ""
+
+    def parse(self):
+        pattern = self.parse_pattern()
+        if self.peek() != "":
+            raise self.error("unexpected {}".format(self.peek()))
+        return pattern
+
+    def parse_pattern(self):
+        if self.peek() == "(":
+            self.pos += 1
+            node = self.parse_pattern()
+            if self.peek() != ")":
+                raise self.error("missing )")
+            self.pos += 1
+        else:
+            node = self.parse_node()
+        relations = self.parse_disjunction()
+        if relations is not None:
+            if node.relations is not None:
+                relations = Conjunction([node.relations, relations])
+            node.relations = relations
+        return node
+
+    def parse_node(self):
+        self.skip_spaces()
+        negated = False
+        if self.text.startswith("!", self.pos):
+            negated = True
+            self.pos += 1
+        basic = False
+        if self.text.startswith("@", self.pos):
+            basic = True
+            self.pos += 1
+        alternatives = []
+        while True:
+            if self.text.startswith("/", self.pos):
+                end = self.pos + 1
+                while end < len(self.text) and (self.text[end] != "/" or self.text[end - 1] == "\\"):
+                    end += 1
+                if end >= len(self.text):
+                    raise self.error("unclosed regular expression")
+                alternatives.append(re.compile(self.text[self.pos + 1:end].replace("\\/", "/")))
+                self.pos = end + 1
+            else:
+                end = self.pos
+                while end < len(self.text) and self.text[end] not in LABEL_END and self.text[end] != "|":
+                    end += 1
+                if end == self.pos:
+                    raise self.error("missing node label")
+                alternatives.append(self.text[self.pos:end])
+                self.pos = end
+            if self.text.startswith("|", self.pos) and self.pos + 1 < len(self.text) and\
+                    not self.text[self.pos + 1].isspace():
+                self.pos += 1
+            else:
+                break
+        if "__" in alternatives:
+            alternatives = None
+        name = None
+        if self.text.startswith("=", self.pos):
+            end = self.pos + 1
+            while end < len(self.text) and (self.text[end].isalnum() or self.text[end] == "_"):
+                end += 1
+            name = self.text[self.pos + 1:end]
+            self.pos = end
+        return NodePattern(alternatives, negated, name, basic)
+
+    def parse_disjunction(self):
+        items = []
+        conjunction = self.parse_conjunction()
+        if conjunction is None:
+            return None
+        items.append(conjunction)
+        while self.peek() == "|":
+            self.pos += 1
+            conjunction = self.parse_conjunction()
+            if conjunction is None:
+                raise self.error("missing relation after |")
+            items.append(conjunction)
+        return items[0] if len(items) == 1 else Disjunction(items)
+
+    def parse_conjunction(self):
+        items = []
+        while True:
+            c = self.peek()
+            if c == "&":
+                self.pos += 1
+                continue
+            if c in ("", ")", "]", "|"):
+                break
+            items.append(self.parse_relation())
+        if not items:
+            return None
+        return items[0] if len(items) == 1 else Conjunction(items)
+
+    def parse_relation(self):
+        negated = optional = False
+        c = self.peek()
+        if c == "!":
+            negated = True
+            self.pos += 1
+        elif c == "?":
+            optional = True
+            self.pos += 1
+        if self.peek() == "[":
+            self.pos += 1
+            group = self.parse_disjunction()
+            if self.peek() != "]":
+                raise self.error("missing ]")
+            self.pos += 1
+            if isinstance(group, Relation) or group is None:
+                group = Conjunction([group] if group is not None else [])
+            group.negated = negated
+            group.optional = optional
+            return group
+        op = None
+        nth = None
+        # <N, <-N, >N and >-N are checked first, since <- and >- would otherwise be taken as the relation
+        m = re.match(r"([<>])(-?\d+)", self.text[self.pos:])
+        if m:
+            op = m.group(1)
+            nth = int(m.group(2))
+            self.pos += len(m.group(0))
+        else:
+            for r in RELATIONS:
+                if self.text.startswith(r, self.pos):
+                    op = r
+                    break
+            if op is None:
+                raise self.error("unknown relation")
+            self.pos += len(op)
+        if self.peek() == "(":
+            self.pos += 1
+            target = self.parse_pattern()
+            if self.peek() != ")":
+                raise self.error("missing )")
+            self.pos += 1
+        else:
+            target = self.parse_node()
+        return Relation(op, target, nth, negated, optional)
+
+
+class NativeTreeMatcher(object):
+    """
+    Pure Python replacement of TregexService for the subset of tregex supported by PatternParser. Patterns are
+    compiled once, and every pattern is tried at each node of a tree during a single pre-order traversal.
+    The output lines mimic tregex -h ... -t: the tagged yield of each handle, for each match.
+    """
+    def __init__(self, handles=("tr", "arg")):
+        self.handles = handles
+        self.compiled = {}  # pattern string => NodePattern, or None if it could not be compiled
+
+    def compile(self, pattern):
+        """
+        :return: NodePattern of the pattern, or None if the pattern is not supported; the error is logged only the
+        first time
+        """
+        if pattern not in self.compiled:
+            try:
+                self.compiled[pattern] = PatternParser(pattern).parse()
+            except (ValueError, re.error) as e:
+                logging.warning("skipping pattern: {}".format(e))
+                self.compiled[pattern] = None
+        return self.compiled[pattern]
+
+    def match_tree(self, tree, patterns):
+        """
+        :param tree: parse tree string
+        :param patterns: list of tregex patterns
+        :return: dictionary pattern => list of output lines
+        """
+        results = dict((p, []) for p in patterns)
+        compiled = [(p, self.compile(p)) for p in patterns if self.compile(p) is not None]
+        try:
+            index = TreeIndex(Tree.fromstring(tree))
+        except ValueError:
+            logging.debug("could not read tree {}".format(tree))
+            return results
+        for node in range(len(index.labels)):
+            for p, pattern in compiled:
+                for bindings in pattern.match(index, node, {}):
+                    for h in self.handles:
+                        if h in bindings:
+                            results[p].append(index.tagged_yield(bindings[h]))
+        return results
+
+    def match(self, trees, patterns):
+        patterns = list(patterns)
+        return [self.match_tree(tree, patterns) for tree in trees]
+
+    def close(self):
+        pass
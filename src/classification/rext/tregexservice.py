@@ -0,0 +1,78 @@
+from __future__ import unicode_literals
+import codecs
+import logging
+import os
+import shutil
+import tempfile
+from multiprocessing.pool import ThreadPool
+from subprocess import Popen, PIPE
+
+from classification.rext.workspace import create_workspace, remove_workspace
+
+TREGEX = "./bin/stanford-tregex-2015-12-09/tregex.sh"
+
+
+class TregexService(object):
+    """
+    Long-lived tregex matcher. Each call receives a batch of parse trees, which are written once to the workspace
+    of the service, one file per tree, and each pattern is matched against the whole batch by a single tregex run.
+    The matches of each tree are recovered from the file names printed by tregex (-f).
+    """
+    def __init__(self, handles=("tr", "arg"), nworkers=4, temp_dir="temp/"):
+        """
+        :param handles: names of the nodes printed for each match (-h)
+        :param nworkers: number of tregex processes running at the same time
+        """
+        self.handles = handles
+        self.nworkers = nworkers
+        self.workspace = create_workspace("tregex", temp_dir)
+        self.pool = ThreadPool(nworkers)
+        self.runs = 0
+
+    def match(self, trees, patterns):
+        """
+        Match every pattern against every tree
+        :param trees: list of parse tree strings, one line each
+        :param patterns: list of tregex patterns
+        :return: list with a dictionary pattern => list of output lines for each tree
+        """
+        patterns = list(patterns)
+        results = [dict((p, []) for p in patterns) for t in trees]
+        if not trees or not patterns:
+            return results
+        batchdir = tempfile.mkdtemp(dir=self.workspace)
+        treefiles = {}  # file name => tree index
+        for i, tree in enumerate(trees):
+            treefile = "tree{}.txt".format(i)
+            with codecs.open(os.path.join(batchdir, treefile), 'w', 'utf-8') as tfile:
+                tfile.write(tree)
+            treefiles[treefile] = i
+        try:
+            outputs = self.pool.map(lambda p: self.run_tregex(p, batchdir), patterns)
+        finally:
+            shutil.rmtree(batchdir, ignore_errors=True)
+        for pattern, output in zip(patterns, outputs):
+            tree_index = None
+            for line in output.split("\n"):
+                if line.startswith("# ") and os.path.basename(line[2:].strip()) in treefiles:
+                    tree_index = treefiles[os.path.basename(line[2:].strip())]
+                elif line.strip() != "" and tree_index is not None:
+                    results[tree_index][pattern].append(line)
+        logging.debug("matched {} patterns against {} trees".format(len(patterns), len(trees)))
+        return results
+
+    def run_tregex(self, pattern, treedir):
+        args = [TREGEX, "-f"]
+        for h in self.handles:
+            args += ["-h", h]
+        args += ["-t", pattern, treedir]
+        tregexcall = Popen(args, stdout=PIPE, stderr=PIPE)
+        res = tregexcall.communicate()
+        self.runs += 1
+        return res[0].decode("utf-8")
+
+    def close(self):
+        self.pool.close()
+        self.pool.join()
+        remove_workspace(self.workspace)
+        logging.info("tregex service finished after {} runs".format(self.runs))
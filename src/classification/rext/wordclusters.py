@@ -0,0 +1,34 @@
+import codecs
+import logging
+import time
+
+loaded_clusters = {}  # path => cluster table, so each file is read only once per process
+
+
+def load_cluster_table(path):
+    """
+    Read a word2vec clusters file ("word cluster" per line) into a dictionary word => cluster. Cluster numbers are
+    shared between words, so the table only keeps one object per word plus the dictionary itself.
+    """
+    start_time = time.time()
+    table = {}
+    cluster_ids = {}
+    with codecs.open(path, 'r', 'utf-8') as clusterfile:
+        for l in clusterfile:
+            values = l.rstrip().rsplit(" ", 1)
+            if len(values) < 2:
+                continue
+            cluster = cluster_ids.setdefault(values[1], int(values[1]))
+            table[values[0]] = cluster
+    logging.info("loaded {} words in {} clusters from {} in {:.1f}s".format(len(table), len(cluster_ids), path,
+                                                                         time.time() - start_time))
+    return table
+
+
+def get_clusters(path):
+    """
+    :return: cluster table of the file, loaded on the first call of this process
+    """
+    if path not in loaded_clusters:
+        loaded_clusters[path] = load_cluster_table(path)
+    return loaded_clusters[path]
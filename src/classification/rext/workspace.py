@@ -0,0 +1,45 @@
+import atexit
+import logging
+import os
+import shutil
+import tempfile
+
+from config import config
+
+live_workspaces = set()  # workspaces created by this process that were not removed yet
+
+
+def create_workspace(prefix, temp_dir="temp/"):
+    """
+    Create a scratch directory that is not shared with any other model, run or process
+    :param prefix: name of the model or service that uses the workspace
+    :param temp_dir: directory where the workspace is created
+    :return: path of the workspace, ending with /
+    """
+    if not os.path.isdir(temp_dir):
+        os.makedirs(temp_dir)
+    path = tempfile.mkdtemp(prefix="{}_{}_".format(prefix.replace("/", "_"), os.getpid()), dir=temp_dir) + "/"
+    live_workspaces.add(path)
+    logging.debug("created workspace {}".format(path))
+    return path
+
+
+def remove_workspace(path, keep=None):
+    """
+    Remove a workspace and its files
+    :param path: path returned by create_workspace
+    :param keep: keep the files, for debugging; config.keep_workspaces by default
+    """
+    if keep is None:
+        keep = config.keep_workspaces
+    live_workspaces.discard(path)
+    if keep:
+        logging.info("keeping workspace {}".format(path))
+    else:
+        shutil.rmtree(path, ignore_errors=True)
+
+
+@atexit.register
+def remove_live_workspaces():
+    for path in list(live_workspaces):
+        remove_workspace(path)
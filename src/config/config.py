@@ -47,6 +47,26 @@ with open("settings.json") as settings:
     stanford_ner_test_ram = vals["stanford_ner_test_ram"]
     stoplist = vals["stoplist"]
     mirbase_path = vals["mirbase_path"]
+    model_registry_ram = vals.get("model_registry_ram", 16384)
+    jsre_workers = vals.get("jsre_workers", 1)
+    jsre_batch_wait = vals.get("jsre_batch_wait", 0.05)
+    classifier_timeout = vals.get("classifier_timeout", 600)  # seconds to wait for a jSRE or SVM-light-TK server
+    generate_workers = vals.get("generate_workers", 1)
+    svmtk_workers = vals.get("svmtk_workers", 1)
+    svmtk_shards = vals.get("svmtk_shards", 1)
+    svmtk_batch_wait = vals.get("svmtk_batch_wait", 0.05)
+    tregex_workers = vals.get("tregex_workers", 4)
+    tregex_matcher = vals.get("tregex_matcher", "tregex")  # tregex or native
+    keep_workspaces = vals.get("keep_workspaces", False)  # keep the scratch files of the relation models
+    re_workers = vals.get("re_workers", 1)
+    scikit_vectorizer = vals.get("scikit_vectorizer", "count")  # count or hashing
+    scikit_hash_features = vals.get("scikit_hash_features", 2 ** 20)
+    chebi_backend = vals.get("chebi_backend", "mysql")  # mysql or index
+    chebi_index_path = vals.get("chebi_index_path", "data/chebi_index.bin")
+    florchebi_workers = vals.get("florchebi_workers", 0)  # 0 starts a florchebi process for each term
+    florchebi_worker = vals.get("florchebi_worker", "java")  # java or stub
+    florchebi_timeout = vals.get("florchebi_timeout", 30)
+    chebi2go_path = vals.get("chebi2go_path", "data/chebi2go.idx")
 
 if use_chebi or use_go:
     import MySQLdb
@@ -53,6 +53,7 @@ paths.update({
         'annotations': "corpora/thymedata-1.1.0/coloncancer/test/",
         'format': "tempeval",
         'corpus': "data/coloncancer_test.pickle"
+    },
 
     ### miRNA corpus (Bagewadi 2013)
     'miRNACorpus_train': {
@@ -12,10 +12,15 @@ import itertools
 from subprocess import Popen, PIPE
 from pycorenlp import StanfordCoreNLP
 
+from classification.fingerprint import model_identity, get_fingerprints, get_changed_documents
 from classification.ner.banner import BANNERModel
+from classification.ner.cascade import get_cascade_filter, apply_cascade
+from classification.ner.crfprune import prune_model, write_prune_report
+from classification.ner.crfsweep import dump_features, get_configs, run_sweep, write_leaderboard
 from classification.ner.ensemble import EnsembleModel
 from classification.rext.mirtex_rules import MirtexClassifier
 from classification.rext.multiinstance import MILClassifier
+from classification.rext import parallelre
 from config.corpus_paths import paths
 from classification.ner.crfsuitener import CrfSuiteModel
 from classification.ner.matcher import MatcherModel
@@ -115,7 +120,7 @@ def main():
                       choices=["load_corpus", "annotate", "classify", "write_results", "write_goldstandard",
                                "train", "test", "train_multiple", "test_multiple", "train_matcher", "test_matcher",
                                "crossvalidation", "train_relations", "test_relations", "load_genia", "load_biomodel",
-                               "merge_corpus", "tuples", "generate_data"])
+                               "merge_corpus", "tuples", "generate_data", "sweep_crfsuite", "prune_crfsuite"])
     parser.add_argument("--goldstd", default="", dest="goldstd", nargs="+",
                         help="Gold standard to be used. Will override corpus, annotations",
                         choices=paths.keys())
@@ -143,6 +148,25 @@ considered when coadministering with megestrol acetate.''',
                         choices=["stanford", "crfsuite", "banner", "ensemble"])
     parser.add_argument("--log", action="store", dest="loglevel", default="WARNING", help="Log level")
     parser.add_argument("--kernel", action="store", dest="kernel", default="svmtk", help="Kernel for relation extraction")
+    parser.add_argument("--cascade", dest="cascade", default="none", choices=["none", "matcher", "mirna"],
+                        help="Filter sentences with a dictionary matcher before running the tagger")
+    parser.add_argument("--cascade-names", dest="cascade_names", help="names pickle used by the cascade matcher")
+    parser.add_argument("--sweep-c1", dest="sweep_c1", nargs="+", type=float, default=[0.0, 0.05, 0.1],
+                        help="c1 values of the CRFsuite sweep")
+    parser.add_argument("--sweep-c2", dest="sweep_c2", nargs="+", type=float, default=[0.001, 0.01, 0.1, 1.0],
+                        help="c2 values of the CRFsuite sweep")
+    parser.add_argument("--sweep-features", dest="sweep_features", nargs="+", default=["all"],
+                        help="feature sets of the CRFsuite sweep (all, nocontext, noaffix, nolemma)")
+    parser.add_argument("--sweep-samples", dest="sweep_samples", type=int,
+                        help="number of random configurations to sample instead of the full grid")
+    parser.add_argument("--workers", dest="workers", type=int, default=4, help="number of worker processes")
+    parser.add_argument("--incremental", action="store_true", default=False, dest="incremental",
+                        help="Tag only the documents that changed since the results saved on the output path")
+    parser.add_argument("--prune-threshold", dest="prune_threshold", type=float,
+                        help="drop CRFsuite features with absolute weight below this value")
+    parser.add_argument("--prune-topk", dest="prune_topk", type=int, help="keep only the top k CRFsuite features")
+    parser.add_argument("--prune-eval", dest="prune_eval", choices=paths.keys(),
+                        help="gold standard used to compare the original and pruned models")
     options = parser.parse_args()
 
     # set logger
@@ -219,6 +243,7 @@ considered when coadministering with megestrol acetate.''',
         corpus.save(paths[options.goldstd]["corpus"])
     else:
         corpus = Corpus("corpus/" + "&".join(options.goldstd))
+        doc_sources = {}  # did => goldstd, to report results of each corpus
         for g in options.goldstd:
             corpus_path = paths[g]["corpus"]
             logging.info("loading corpus %s" % corpus_path)
@@ -227,6 +252,8 @@ considered when coadministering with megestrol acetate.''',
             # docs = this_corpus.documents
             docs = dict((k, this_corpus.documents[k]) for k in this_corpus.documents.keys()[:13000])
             corpus.documents.update(docs)
+            for did in docs:
+                doc_sources[did] = g
         if options.actions == "write_goldstandard":
             model = BiasModel(options.output[1])
             model.load_data(corpus, [])
@@ -263,8 +290,30 @@ considered when coadministering with megestrol acetate.''',
                 features = time_features
             elif options.etype.startswith("event"):
                 features = event_features
-            model.load_data(corpus, features, options.etype, subtype=options.subtype)
+            model.load_data(corpus, features, options.etype)
             model.train()
+        elif options.actions == "sweep_crfsuite": # Train CRFsuite with multiple parameters and rank them on a dev set
+            model = CrfSuiteModel(options.models, options.etype, subtype=options.subtype)
+            model.load_data(corpus, feature_extractors.keys(), options.etype)
+            dump_features(model, options.models + "_sweep.pickle")
+            model = None
+            configs = get_configs(options.sweep_c1, options.sweep_c2, options.sweep_features, options.sweep_samples)
+            results = run_sweep(options.models + "_sweep.pickle", options.models, configs, nworkers=options.workers)
+            write_leaderboard(results, options.models + "_leaderboard.tsv")
+        elif options.actions == "prune_crfsuite": # Retrain a CRFsuite model with only its highest weighted features
+            model = CrfSuiteModel(options.models, options.etype, subtype=options.subtype)
+            model.load_data(corpus, feature_extractors.keys(), options.etype)
+            eval_model = CrfSuiteModel(options.models, options.etype, subtype=options.subtype)
+            if options.prune_eval:
+                logging.info("loading corpus %s" % paths[options.prune_eval]["corpus"])
+                eval_corpus = pickle.load(open(paths[options.prune_eval]["corpus"], 'rb'))
+                eval_model.load_data(eval_corpus, feature_extractors.keys(), options.etype, mode="test")
+            else:
+                logging.warning("no --prune-eval corpus, comparing the models on the training data")
+                eval_model.copy_data(model)
+            original_stats, pruned_stats = prune_model(model, options.models + "_pruned", eval_model.data,
+                                                       eval_model.labels, options.prune_threshold, options.prune_topk)
+            write_prune_report(original_stats, pruned_stats, options.models + "_pruned.tsv")
         elif options.actions == "train_matcher": # Train a simple classifier based on string matching
             model = MatcherModel(options.models, options.etype)
             model.train_list("temporal_list.txt")
@@ -325,8 +374,29 @@ considered when coadministering with megestrol acetate.''',
                     features = time_features
                 elif options.etype.startswith("event"):
                     features = event_features
-                model.load_data(corpus, features, options.etype, mode="test", subtype=options.subtype)
-                final_results = model.test(corpus)
+                fingerprints = get_fingerprints(corpus, model_identity(model.path))
+                tag_corpus = corpus
+                previous_results = None
+                if options.incremental and os.path.isfile(options.output[1] + ".pickle"):
+                    # tag only documents with different text, pre-processing or model since the previous run
+                    logging.info("loading previous results {}.pickle".format(options.output[1]))
+                    previous_results = pickle.load(open(options.output[1] + ".pickle", 'rb'))
+                    changed = get_changed_documents(corpus, fingerprints,
+                                                    getattr(previous_results, "fingerprints", {}))
+                    tag_corpus = Corpus(corpus.path, documents=dict((did, corpus.documents[did]) for did in changed))
+                model.load_data(tag_corpus, features, options.etype, mode="test")
+                if options.cascade != "none":
+                    cascade_filter = get_cascade_filter(options.cascade, options.cascade_names, options.etype)
+                    cascade_report = apply_cascade(model, tag_corpus, cascade_filter, options.etype, doc_sources)
+                    tagging_start = time.time()
+                    final_results = model.test(tag_corpus)
+                    cascade_report.tagging_time = time.time() - tagging_start
+                    cascade_report.write(options.output[1] + "_cascade.tsv")
+                else:
+                    final_results = model.test(tag_corpus)
+                if previous_results is not None:
+                    final_results.merge_previous(previous_results, corpus, set(changed))
+                final_results.fingerprints = fingerprints
             #with codecs.open(options.output[1] + ".txt", 'w', 'utf-8') as outfile:
             #    lines = final_results.corpus.write_chemdner_results(options.models, outfile)
             #final_results.lines = lines
@@ -367,29 +437,25 @@ considered when coadministering with megestrol acetate.''',
             logging.info("saving results...")
             final_results.save(options.output[1] + ".pickle")
         elif options.actions == "test_relations":
-            if options.kernel == "jsre":
-                model = JSREKernel(corpus, options.ptype, train=False, modelname=options.tag, ner=options.models)
-            elif options.kernel == "svmtk":
-                model = SVMTKernel(corpus, options.ptype, modelname=options.tag, ner=options.models)
-            elif options.kernel == "rules":
-                model = RuleClassifier(corpus, options.ptype, ner=options.models)
-            elif options.kernel == "mirtex_rules":
-                model = MirtexClassifier(corpus, options.ptype)
-            elif options.kernel == "stanfordre":
-                model = StanfordRE(corpus, options.ptype)
-            elif options.kernel == "scikit":
-                model = ScikitRE(corpus, options.ptype)
-            elif options.kernel == "crf":
-                model = CrfSuiteRE(corpus, options.ptype, test=True)
-            elif options.kernel == "mil":
+            if options.kernel in parallelre.RE_KERNELS:
                 relations = set()
-                with open("corpora/transmir/transmir_relations.txt") as rfile:
-                    for l in rfile:
-                        relations.add(tuple(l.strip().split('\t')))
-                model = MILClassifier(corpus, options.ptype, relations, test=True, ner=options.models)
-            model.load_classifier()
-            model.test()
-            results = model.get_predictions(corpus)
+                if options.kernel == "mil":
+                    with open("corpora/transmir/transmir_relations.txt") as rfile:
+                        for l in rfile:
+                            relations.add(tuple(l.strip().split('\t')))
+                # documents are classified by config.re_workers processes
+                results = parallelre.test_relations(corpus, options.kernel, options.ptype, tag=options.tag,
+                                                    ner=options.models, relations=relations)
+            else:
+                if options.kernel == "stanfordre":
+                    model = StanfordRE(corpus, options.ptype)
+                elif options.kernel == "scikit":
+                    model = ScikitRE(corpus, options.ptype)
+                elif options.kernel == "crf":
+                    model = CrfSuiteRE(corpus, options.ptype, test=True)
+                model.load_classifier()
+                model.test()
+                results = model.get_predictions(corpus)
             results.save(options.output[1] + ".pickle")
 
     total_time = time.time() - start_time
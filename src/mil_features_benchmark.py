@@ -0,0 +1,96 @@
+from __future__ import division
+import argparse
+import logging
+import time
+import cPickle as pickle
+import itertools
+
+from classification.rext.multiinstance import MILClassifier, PairFeatureContext
+from config import config
+from config.corpus_paths import paths
+
+
+def rebuilt_pair_features(sentence, pair, ner_model):
+    """
+    Features of a pair computed without a shared context: the entity tokens of the sentence are collected into a
+    list for every pair, as MILClassifier did before PairFeatureContext
+    """
+    start1, end1, start2, end2 = pair[0].tokens[0].order, pair[0].tokens[-1].order,\
+                                 pair[1].tokens[0].order, pair[1].tokens[-1].order
+    sentence_entities_tokens = []
+    for elist in sentence.entities.elist:
+        if elist == ner_model or ner_model == "all":
+            for e in sentence.entities.elist[elist]:
+                for t in e.tokens:
+                    sentence_entities_tokens.append(t.order)
+    order = "normal-order"
+    if start1 > start2:
+        order = "reverse-order"
+        start1, end2, start2, end2 = start2, end2, start1, end1
+    features = []
+    for name, window in (("before", sentence.tokens[max(start1-5, 0):start1]),
+                         ("middle", sentence.tokens[end1:max(end1+5, start2)]),
+                         ("end", sentence.tokens[end2:end2+5])):
+        for i, t in enumerate(window):
+            if t.order in sentence_entities_tokens:
+                features.append(str(i) + "-" + name + "-entity")
+            else:
+                features.append(str(i) + "-" + name + "-" + t.lemma + "-" + t.pos + "-" + t.tag)
+    return " ".join(features + [order])
+
+
+def get_sentence_pairs(sentence, ner_model, pairtypes):
+    sentence_entities = sentence.entities.elist[ner_model]
+    return [pair for pair in itertools.permutations(sentence_entities, 2)
+            if pair[0].type in pairtypes[0] and pair[1].type in pairtypes[1]]
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Time MIL pair feature generation on sentences with many entities')
+    parser.add_argument("--goldstd", nargs="+", help="Corpora to be used", choices=paths.keys())
+    parser.add_argument("--models", dest="models", default="goldstandard", help="entity annotations to be used")
+    parser.add_argument("--pairtype", dest="ptype", help="type of pairs to be considered", default="miRNA-gene")
+    parser.add_argument("--min-entities", dest="min_entities", type=int, default=20,
+                        help="use only sentences with at least this number of entities")
+    parser.add_argument("--log", action="store", dest="loglevel", default="WARNING", help="Log level")
+    options = parser.parse_args()
+    logging.basicConfig(level=getattr(logging, options.loglevel.upper()),
+                        format='%(asctime)s %(levelname)s %(filename)s:%(lineno)s:%(funcName)s %(message)s')
+
+    pairtypes = (config.relation_types[options.ptype]["source_types"],
+                 config.relation_types[options.ptype]["target_types"])
+    model = MILClassifier(None, options.ptype, [], ner=options.models, generate=False)
+    sentences = []
+    for goldstd in options.goldstd:
+        logging.info("loading corpus %s" % paths[goldstd]["corpus"])
+        corpus = pickle.load(open(paths[goldstd]["corpus"], 'rb'))
+        for sentence in corpus.get_sentences(options.models):
+            if len(sentence.entities.elist[options.models]) >= options.min_entities:
+                sentences.append(sentence)
+    npairs = sum([len(get_sentence_pairs(s, options.models, pairtypes)) for s in sentences])
+    print "{} sentences with at least {} entities, {} candidate pairs".format(len(sentences), options.min_entities,
+                                                                            npairs)
+
+    start_time = time.time()
+    rebuilt = [rebuilt_pair_features(s, pair, options.models) for s in sentences
+               for pair in get_sentence_pairs(s, options.models, pairtypes)]
+    rebuilt_time = time.time() - start_time
+
+    start_time = time.time()
+    shared = []
+    for s in sentences:
+        context = PairFeatureContext(s, options.models)
+        shared += [model.get_pair_features(s, pair, context) for pair in get_sentence_pairs(s, options.models,
+                                                                                             pairtypes)]
+    shared_time = time.time() - start_time
+
+    if rebuilt != shared:
+        print "features differ on {} pairs!".format(sum([a != b for a, b in zip(rebuilt, shared)]))
+    print "method\tseconds\tpairs_per_second"
+    print "per pair\t{:.3f}\t{:.1f}".format(rebuilt_time, npairs / max(rebuilt_time, 0.000001))
+    print "per sentence\t{:.3f}\t{:.1f}".format(shared_time, npairs / max(shared_time, 0.000001))
+    print "speedup: {:.2f}x".format(rebuilt_time / max(shared_time, 0.000001))
+
+
+if __name__ == "__main__":
+    main()
@@ -9,28 +9,24 @@ import sys
 from config.corpus_paths import paths
 from config import config
 from postprocessing import chebi_resolution
+from postprocessing.batch_normalization import normalize_corpus, report
 from postprocessing.ssm import get_ssm
 
 
-def normalize_entities(results, path, source):
+def normalize_entities(results, path, source, etype="all"):
+    """
+    Normalize the entities of the results, resolving each distinct (type, text) of the corpus only once
+    :param results: ResultsNER object
+    :param path: Path where the results should be saved
+    :param source: Base model path
+    :param etype: type of entities to be normalized
+    """
     #TODO add validation
-    mapped = 0
-    not_mapped = 0
-    total_score = 0
-    for idid, did in enumerate(results.corpus):
-        logging.info("{}/{}".format(idid, len(results.corpus)))
-        for sid in results.corpus[did]:
-            for s in results.corpus[did][sid].elist:
-                if s.startswith(source):
-                    # if s != source:
-                    #    logging.info("processing %s" % s)
-                    for entity in results.corpus[did][sid].elist[s]:
-                        entity.normalize()
-                        if entity.normalized_score > 0:
-                            mapped += 1
-                            total_score += entity.normalized_score
-                        else:
-                            not_mapped += 1
+    stats = normalize_corpus(results.corpus, source, etype)
+    print report(stats)
+    mapped = stats["mapped"]
+    not_mapped = stats["not_mapped"]
+    total_score = stats["total_score"]
     if mapped == 0:
         percentmapped = 0
     else:
@@ -41,42 +37,14 @@ def normalize_entities(results, path, source):
 
 def add_chebi_mappings(results, path, source, save=True):
     """
-    Go through each identified entity and add ChEBI mapping
+    Go through each identified entity and add ChEBI mapping, and the GO mappings of the ChEBI terms if use_go is set
     :param results: ResultsNER object
     :param path: Path where the results should be saved
     :param source: Base model path
     :param save: Save results to file
     :return: ResultsNER object
     """
-    mapped = 0
-    not_mapped = 0
-    total_score = 0
-    for idid, did in enumerate(results.corpus):
-        logging.info("{}/{}".format(idid, len(results.corpus)))
-        for sid in results.corpus[did]:
-            for s in results.corpus[did][sid].elist:
-                if s.startswith(source):
-                    #if s != source:
-                    #    logging.info("processing %s" % s)
-                    for entity in results.corpus[did][sid].elist[s]:
-                        chebi_info = chebi_resolution.find_chebi_term3(entity.text.encode("utf-8"))
-                        entity.chebi_id = chebi_info[0]
-                        entity.chebi_name = chebi_info[1]
-                        entity.chebi_score = chebi_info[2]
-                        entity.scores["chebi"] = chebi_info[2]
-                        # TODO: check for errors (FP and FN)
-                        if chebi_info[2] == 0:
-                            #logging.info("nothing for %s" % entity.text)
-                            not_mapped += 1
-                        else:
-                            #logging.info("%s => %s %s" % (entity.text, chebi_info[1], chebi_info[2]))
-                            mapped += 1
-                            total_score += chebi_info[2]
-    if mapped == 0:
-        percentmapped = 0
-    else:
-        percentmapped = total_score/mapped
-    logging.info("{0} mapped, {1} not mapped, average score: {2}".format(mapped, not_mapped, percentmapped))
+    results = chebi_resolution.add_chebi_mappings(results, source, go=config.use_go)
     if save:
         logging.info("saving results to %s" % path)
         pickle.dump(results, open(path, "wb"))
@@ -181,7 +149,7 @@ def main():
     # if options.action == "go":
     #    add_go_mappings(results, options.results + ".pickle", options.models)
     elif options.action in ("mirna", "protein", "all"):
-        normalize_entities(results, options.results + ".pickle", options.models)
+        normalize_entities(results, options.results + ".pickle", options.models, options.etype)
     elif options.action == "ssm":
         if options.measure.endswith("go"):
             ontology = "go"
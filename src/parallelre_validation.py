@@ -0,0 +1,49 @@
+from __future__ import division
+import argparse
+import logging
+import time
+import cPickle as pickle
+
+from classification.rext import parallelre
+from config.corpus_paths import paths
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare a document-parallel relation extraction run with a serial run')
+    parser.add_argument("--goldstd", help="Corpus to be classified", choices=paths.keys())
+    parser.add_argument("--kernel", default="jsre", choices=parallelre.RE_KERNELS.keys())
+    parser.add_argument("--pairtype", dest="ptype", help="type of pairs to be considered", default="all")
+    parser.add_argument("--tag", dest="tag", default="0", help="relation model name")
+    parser.add_argument("--models", dest="models", default="goldstandard", help="entity annotations to be used")
+    parser.add_argument("--workers", dest="workers", type=int, default=4, help="number of worker processes")
+    parser.add_argument("--log", action="store", dest="loglevel", default="WARNING", help="Log level")
+    options = parser.parse_args()
+    logging.basicConfig(level=getattr(logging, options.loglevel.upper()),
+                        format='%(asctime)s %(levelname)s %(filename)s:%(lineno)s:%(funcName)s %(message)s')
+
+    relations = set()
+    if options.kernel == "mil":
+        with open("corpora/transmir/transmir_relations.txt") as rfile:
+            for l in rfile:
+                relations.add(tuple(l.strip().split('\t')))
+    times = []
+    runs = []
+    for nworkers in (1, options.workers):
+        logging.info("loading corpus %s" % paths[options.goldstd]["corpus"])
+        corpus = pickle.load(open(paths[options.goldstd]["corpus"], 'rb'))
+        start_time = time.time()
+        runs.append(parallelre.test_relations(corpus, options.kernel, options.ptype, tag=options.tag,
+                                              ner=options.models, relations=relations, nworkers=nworkers))
+        times.append(time.time() - start_time)
+    different = parallelre.compare_results(runs[0], runs[1])
+    npairs = sum([len(runs[0].corpus.documents[did].pairs.pairs) for did in runs[0].corpus.documents])
+    print "{} documents, {} pairs".format(len(runs[0].corpus.documents), npairs)
+    print "documents with different pairs: {}".format(len(different))
+    for did in different[:10]:
+        print did
+    print "serial: {:.1f}s, {} workers: {:.1f}s ({:.2f}x)".format(times[0], options.workers, times[1],
+                                                                   times[0] / max(times[1], 0.000001))
+
+
+if __name__ == "__main__":
+    main()
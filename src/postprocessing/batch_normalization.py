@@ -0,0 +1,93 @@
+from __future__ import division, unicode_literals
+import logging
+import time
+from collections import OrderedDict
+
+
+def prefetch_chebi(texts):
+    from postprocessing import chebi_resolution
+    chebi_resolution.find_chebi_terms([t.encode("utf-8") for t in texts])
+
+# normalization backend => function that resolves a list of distinct texts at once, before the entities are normalized
+BULK_RESOLVERS = {"chebi": prefetch_chebi}
+
+
+def iter_sentence_entities(corpus):
+    """
+    :param corpus: Corpus object, or the dictionary {did: {sid: Entities}} of the results saved by ResultsNER.save
+    :return: generator of the Entities object of each sentence
+    """
+    if hasattr(corpus, "documents"):
+        for did in corpus.documents:
+            for sentence in corpus.documents[did].sentences:
+                yield sentence.entities
+    else:
+        for did in corpus:
+            for sid in corpus[did]:
+                yield corpus[did][sid]
+
+
+def get_normalization_groups(corpus, source, etype="all"):
+    """
+    Group the entities of a corpus that are normalized to the same value
+    :param corpus: Corpus object or dictionary of saved results, see iter_sentence_entities
+    :param source: entities of the sources that start with this name are considered
+    :param etype: type of entities to be considered
+    :return: total number of entities, and OrderedDict (type, text) => list of entities
+    """
+    groups = OrderedDict()
+    seen = set()  # each entity is on the list of its source and on the list of its source and type
+    for entities in iter_sentence_entities(corpus):
+        for s in entities.elist:
+            if not s.startswith(source):
+                continue
+            for entity in entities.elist[s]:
+                if id(entity) in seen or (etype != "all" and entity.type != etype):
+                    continue
+                seen.add(id(entity))
+                groups.setdefault((entity.type, entity.text), []).append(entity)
+    return len(seen), groups
+
+
+def normalize_corpus(corpus, source, etype="all"):
+    """
+    Normalize the entities of a corpus resolving each (type, text) only once: the distinct texts of each backend are
+    resolved with its bulk resolver, if there is one, then one entity of each group is normalized and the result is
+    copied to the rest of the group
+    :return: dictionary with the number of entities and distinct keys, the number of entities mapped and not mapped
+    and the sum of the scores of the mapped entities, and the keys, entities and time of each backend
+    """
+    nentities, groups = get_normalization_groups(corpus, source, etype)
+    backends = OrderedDict()  # backend => list of groups
+    for key in groups:
+        backends.setdefault(groups[key][0].normalization_backend, []).append(groups[key])
+    stats = {"entities": nentities, "keys": len(groups), "mapped": 0, "not_mapped": 0, "total_score": 0,
+             "backends": OrderedDict()}
+    for backend in backends:
+        start_time = time.time()
+        if backend in BULK_RESOLVERS:
+            BULK_RESOLVERS[backend]([entities[0].text for entities in backends[backend]])
+        for entities in backends[backend]:
+            entities[0].normalize()
+            for entity in entities[1:]:
+                entity.copy_normalization(entities[0])
+            if entities[0].normalized_score > 0:
+                stats["mapped"] += len(entities)
+                stats["total_score"] += entities[0].normalized_score * len(entities)
+            else:
+                stats["not_mapped"] += len(entities)
+        stats["backends"][backend] = {"keys": len(backends[backend]),
+                                      "entities": sum([len(entities) for entities in backends[backend]]),
+                                      "time": time.time() - start_time}
+    logging.info(report(stats))
+    return stats
+
+
+def report(stats):
+    lines = ["{} entities, {} distinct keys (dedup ratio: {:.2f})".format(stats["entities"], stats["keys"],
+                                                                           stats["entities"] / max(stats["keys"], 1))]
+    for backend, values in stats["backends"].items():
+        lines.append("{}: {} keys, {} entities, {:.1f}s ({:.1f} keys/s)".format(
+            backend, values["keys"], values["entities"], values["time"],
+            values["keys"] / max(values["time"], 0.000001)))
+    return "\n".join(lines)
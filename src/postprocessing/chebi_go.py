@@ -0,0 +1,99 @@
+from __future__ import unicode_literals
+import cPickle as pickle
+import logging
+import os
+import time
+
+from config import config
+from postprocessing.mmapindex import IndexWriter, MappedIndex
+
+loaded_mappings = {}  # path => ChebiGoMappings, so that the mappings are opened only once per process
+
+
+def chebi_key(chebiid):
+    chebiid = unicode(chebiid)
+    if not chebiid.startswith("CHEBI:"):
+        chebiid = "CHEBI:" + chebiid
+    return chebiid
+
+
+def write_mappings(c2gdic, path):
+    """
+    Save a dictionary CHEBI:id => list of GO ids as a memory-mapped table read by ChebiGoMappings
+    """
+    writer = IndexWriter()
+    chebi_ids = sorted(c2gdic)
+    offsets = [0]
+    go_ids = []
+    for c in chebi_ids:
+        go_ids += c2gdic[c]
+        offsets.append(len(go_ids))
+    writer.add_strings("chebi", chebi_ids, hashed=True)
+    writer.add_values("chebi.gos", offsets, "long")
+    writer.add_strings("go", go_ids)
+    writer.write(path, {"chebi": len(chebi_ids), "mappings": len(go_ids)})
+    logging.info("{} ChEBI to GO mappings of {} ChEBI terms written to {}".format(len(go_ids), len(chebi_ids), path))
+
+
+class ChebiGoMappings(object):
+    """
+    ChEBI to GO mappings written by write_mappings. The table is memory-mapped, so it is opened in constant time and
+    its pages are shared by the processes that use it, and each lookup is a hash table probe.
+    """
+    def __init__(self, path):
+        self.index = MappedIndex(path)
+
+    def get(self, chebiid):
+        """
+        :param chebiid: ChEBI id, with or without the CHEBI: prefix
+        :return: list of GO ids mapped to the ChEBI term
+        """
+        i = self.index.find_string("chebi", chebi_key(chebiid))
+        if i == -1:
+            return []
+        start, end = self.index.get_range("chebi.gos", i, i + 2)
+        return [self.index.get_string("go", g) for g in range(start, end)]
+
+    def get_many(self, chebiids):
+        """
+        :return: dictionary chebiid => list of GO ids, each distinct id looked up once
+        """
+        return dict((c, self.get(c)) for c in set(chebiids))
+
+
+def get_chebi_go_mappings(path=None, pickle_path="data/chebi2go.pickle"):
+    """
+    :param path: mappings file; config.chebi2go_path by default. If it does not exist, it is created from the
+    pickle written by chebi_resolution.loadC2G
+    :return: ChebiGoMappings opened on the first call of this process
+    """
+    if path is None:
+        path = config.chebi2go_path
+    if path not in loaded_mappings:
+        if not os.path.isfile(path):
+            logging.info("converting {} to {}".format(pickle_path, path))
+            write_mappings(pickle.load(open(pickle_path, "rb")), path)
+        start_time = time.time()
+        loaded_mappings[path] = ChebiGoMappings(path)
+        logging.info("opened ChEBI to GO mappings {} in {:.3f}s".format(path, time.time() - start_time))
+    return loaded_mappings[path]
+
+
+def add_go_ids(entities, mappings=None):
+    """
+    Set the GO ids (go_ids) and the GO term used by the SSM measures of GO (best_go) of entities with a ChEBI id,
+    with one lookup for each distinct ChEBI id
+    :param entities: list of entities with chebi_id
+    """
+    entities = [e for e in entities if getattr(e, "chebi_id", None) not in (None, '0')]
+    if not entities:
+        return
+    if mappings is None:
+        mappings = get_chebi_go_mappings()
+    go_ids = mappings.get_many([e.chebi_id for e in entities])
+    for e in entities:
+        e.go_ids = go_ids[e.chebi_id][:]
+        if e.go_ids:
+            e.best_go = e.go_ids[0]
+        else:
+            e.best_go = None
@@ -0,0 +1,211 @@
+from __future__ import division, unicode_literals
+import logging
+import os
+import re
+import time
+
+from config import config
+from postprocessing.mmapindex import IndexWriter, MappedIndex
+
+INDEX_VERSION = 1
+NO_MATCH = ('0', 'null', 0.0)
+
+loaded_index = {}  # path => ChebiIndex, so that the index is opened only once per process
+
+
+def to_unicode(text):
+    if isinstance(text, bytes):
+        return text.decode("utf-8")
+    return text
+
+
+def build_index(conn, path):
+    """
+    Build the index used by ChebiIndex from the tables of the ChEBI database used by find_chebi_term
+    :param conn: DB-API connection to the ChEBI database
+    :param path: file where the index is saved
+    """
+    start_time = time.time()
+    cur = conn.cursor()
+    writer = IndexWriter()
+    # every term, referenced by its position on the term table
+    cur.execute("""SELECT id, name FROM term ORDER BY id""")
+    term_ids = []
+    term_names = []
+    term_positions = {}
+    for tid, name in cur:
+        term_positions[tid] = len(term_ids)
+        term_ids.append(int(tid))
+        term_names.append(to_unicode(name) or "")
+    writer.add_values("term_ids", term_ids)
+    writer.add_strings("term_names", term_names)
+
+    # exact names and synonyms of the 3 star terms; names are compared ignoring case, as with the default collation
+    # of the database, and the first term of each name is kept
+    for table, query in (("names", """SELECT id, name FROM term
+                                      WHERE LENGTH(name)>0 and star=3 ORDER BY id"""),
+                         ("synonyms", """SELECT a.term_id, a.term_synonym
+                                         FROM term_synonym a, term b
+                                         WHERE b.id=a.term_id and LENGTH(a.term_synonym)>0 and star=3
+                                         ORDER BY a.term_id""")):
+        cur.execute(query)
+        keys = {}
+        for tid, name in cur:
+            keys.setdefault(to_unicode(name).lower(), term_positions[tid])
+        writer.add_strings(table, keys.keys(), hashed=True)
+        writer.add_values(table + ".terms", keys.values())
+        logging.info("{}: {}".format(table, len(keys)))
+
+    # descriptors of the terms with information content, for the partial matches
+    cur.execute("""SELECT c.id, c.term_id, ec
+                   FROM descriptor3 c JOIN term e ON (c.term_id=e.id) JOIN SSM_TermDesc f ON (e.id=f.term_id)
+                   ORDER BY c.id""")
+    descriptor_ids = []
+    descriptor_terms = []
+    descriptor_ec = []
+    descriptor_positions = {}
+    for did, tid, ec in cur:
+        descriptor_positions[did] = len(descriptor_ids)
+        descriptor_ids.append(int(did))
+        descriptor_terms.append(term_positions[tid])
+        descriptor_ec.append(float(ec or 0))
+    writer.add_values("descriptor_ids", descriptor_ids)
+    writer.add_values("descriptor_terms", descriptor_terms)
+    writer.add_values("descriptor_ec", descriptor_ec, "float")
+
+    # inverted word index: word => (descriptor, information content of the word) of each occurrence
+    cur.execute("""SELECT id, word, ic FROM word3""")
+    word_keys = {}
+    words = {}  # word id => (word, ic)
+    for wid, word, ic in cur:
+        key = to_unicode(word).lower()
+        words[wid] = (key, float(ic or 0))
+        word_keys.setdefault(key, len(word_keys))
+    postings = [[] for w in word_keys]
+    cur.execute("""SELECT word_id, descriptor_id FROM word2term3""")
+    for wid, did in cur:
+        if wid in words and did in descriptor_positions:
+            key, ic = words[wid]
+            postings[word_keys[key]].append((descriptor_positions[did], ic))
+    offsets = [0]
+    posting_descriptors = []
+    posting_ic = []
+    for word_postings in postings:
+        word_postings.sort()
+        posting_descriptors += [d for d, ic in word_postings]
+        posting_ic += [ic for d, ic in word_postings]
+        offsets.append(len(posting_descriptors))
+    writer.add_strings("words", sorted(word_keys, key=word_keys.get), hashed=True)
+    writer.add_values("words.postings", offsets, "long")
+    writer.add_values("postings.descriptors", posting_descriptors)
+    writer.add_values("postings.ic", posting_ic, "float")
+    writer.write(path, {"version": INDEX_VERSION, "terms": len(term_ids), "descriptors": len(descriptor_ids),
+                        "words": len(word_keys)})
+    logging.info("ChEBI index with {} terms, {} descriptors and {} words written to {} in {:.1f}s".format(
+        len(term_ids), len(descriptor_ids), len(word_keys), path, time.time() - start_time))
+
+
+class ChebiIndex(object):
+    """
+    ChEBI resolution with an index built by build_index instead of the MySQL queries of find_chebi_term: exact names
+    and synonyms are found on hash tables and partial matches with an inverted word index, with the same scores
+    """
+    def __init__(self, path):
+        self.index = MappedIndex(path)
+        if self.index.info.get("version") != INDEX_VERSION:
+            raise ValueError("{} has version {}, expected {}".format(path, self.index.info.get("version"),
+                                                                     INDEX_VERSION))
+
+    def get_term(self, t):
+        """
+        :return: ChEBI id and name of the term on position t
+        """
+        return str(self.index.get("term_ids", t)), self.index.get_string("term_names", t)
+
+    def find_name(self, table, term):
+        i = self.index.find_string(table, term.lower())
+        if i == -1:
+            return None
+        return self.get_term(self.index.get(table + ".terms", i))
+
+    def find_partial(self, term):
+        """
+        :return: (descriptor id, term name, score) of the descriptor whose words have the highest information content
+        relative to its own, or None
+        """
+        scores = {}
+        for word in set(term.lower().split(" ")):
+            w = self.index.find_string("words", word)
+            if w == -1:
+                continue
+            start, end = self.index.get_range("words.postings", w, w + 2)
+            for d, ic in zip(self.index.get_range("postings.descriptors", start, end),
+                             self.index.get_range("postings.ic", start, end)):
+                scores[d] = scores.get(d, 0) + ic
+        best = None
+        for d in sorted(scores):
+            ec = self.index.get("descriptor_ec", d)
+            if ec == 0:
+                continue
+            score = scores[d] / ec - 0.1
+            if best is None or score > best[0]:
+                best = (score, d)
+        if best is None:
+            return None
+        score, d = best
+        return (str(self.index.get("descriptor_ids", d)), self.get_term(self.index.get("descriptor_terms", d))[1],
+                float(score))
+
+    def find_term(self, term, adjust=0):
+        """
+        Same as chebi_resolution.find_chebi_term
+        :return: tuple (chebiID, chebiTerm, score); ('0', 'null', 0.0) if resolution fails
+        """
+        from text.chemical_entity import element_base
+        term = to_unicode(term)
+        match = ()
+        res = self.find_name("names", term)
+        if res is not None:
+            match = (res[0], res[1], 1.0 + adjust)
+        else:
+            res = self.find_name("synonyms", term)
+            if res is not None:
+                match = (res[0], res[1], 0.8 + adjust)
+            elif len(term) > 0 and term[-1] == 's':
+                match = self.find_term(term[:-1], -0.1)
+        if not match:
+            #(1)H -> hydrogen-1
+            terms = re.sub(r'[\(|\)|\[|\]| ]', ' ', term)
+            termlist = terms.strip().split(" ")
+            if len(termlist) == 2:
+                if termlist[0].isdigit() and termlist[1] in element_base:
+                    match = self.find_term(element_base[termlist[1]][0] + "-" + termlist[0], -0.1)
+                if termlist[1] == '+' and termlist[0] in element_base:
+                    match = self.find_term(element_base[termlist[0]][0] + ' cation', -0.1)
+                if termlist[1] == '-' and termlist[0] in element_base:
+                    match = self.find_term(element_base[termlist[0]][0] + ' anion', -0.1)
+        if not match:
+            match = self.find_partial(term)
+        if not match or match[2] < 0.0:
+            match = NO_MATCH
+        return match
+
+
+def get_chebi_index(path=None):
+    """
+    :param path: index file; config.chebi_index_path by default
+    :return: ChebiIndex opened on the first call of this process, or None if the index backend is not used or the
+    index file does not exist, so that the MySQL backend is used instead
+    """
+    if path is None:
+        if config.chebi_backend != "index":
+            return None
+        path = config.chebi_index_path
+    if path not in loaded_index:
+        if os.path.isfile(path):
+            loaded_index[path] = ChebiIndex(path)
+            logging.info("opened ChEBI index {} ({})".format(path, loaded_index[path].index.info))
+        else:
+            logging.warning("ChEBI index {} not found, using the database".format(path))
+            loaded_index[path] = None
+    return loaded_index[path]
@@ -1,6 +1,5 @@
 #!/usr/bin/env python
 from __future__ import division, unicode_literals
-import MySQLdb
 import re
 import sys
 import xml.etree.ElementTree as ET
@@ -12,9 +11,19 @@ import cPickle as pickle
 import logging
 from sys import platform as _platform
 import atexit
-from config.config import chebi_conn as db
+from config import config
+if config.use_chebi:
+    from config.config import chebi_conn as db
+else:
+    db = None
 from config.config import florchebi_path
 from config.config import stoplist
+from postprocessing.batch_normalization import iter_sentence_entities
+from postprocessing.chebi_index import build_index, get_chebi_index
+from postprocessing.florchebi import get_florchebi_pool
+from postprocessing.chebi_go import add_go_ids, get_chebi_go_mappings, write_mappings
+from postprocessing.chebi_synonyms import get_synonyms
+from postprocessing.mysqldump import open_sqlite_dump
 
 chebidic = "data/chebi_dic.pickle"
 
@@ -29,15 +38,39 @@ else:
     logging.info("new chebi dictionary")
 
 
+def get_chebi_db():
+    """
+    :return: connection to the ChEBI database; ValueError if it is not configured (use_chebi)
+    """
+    if db is None:
+        raise ValueError("the ChEBI database is not configured (use_chebi is false), and no ChEBI index ({}) or "
+                         "SQLite stand-in is available".format(config.chebi_index_path))
+    return db
+
+
+def escape_term(term):
+    """
+    :return: term escaped for the queries of florchebi, which connects to the ChEBI database by itself
+    """
+    import MySQLdb
+    return MySQLdb.escape_string(term)
+
+
 def find_chebi_term(term, adjust=0):
     ''' returns tuple (chebiID, chebiTerm, score)
         if resolution fails, return ('0', 'null', 0.0)
+        uses the ChEBI index instead of the database if config.chebi_backend is "index"
     '''
+    index = get_chebi_index()
+    if index is not None:
+        return index.find_term(term, adjust)
+    from text.chemical_entity import element_base
+    conn = get_chebi_db()
     # print "TERM", term
-    term = MySQLdb.escape_string(term)
+    term = conn.escape_string(term)
     # adjust - adjust the final score
     match = ()
-    cur = db.cursor()
+    cur = conn.cursor()
     # check for exact match
     query = """SELECT distinct id, name
                    FROM term a 
@@ -115,13 +148,16 @@ def find_chebi_term(term, adjust=0):
 
 
 def find_chebi_term2(term):
+    if config.florchebi_workers > 0:
+        # resident florchebi workers, instead of a new process for each term
+        return get_florchebi_pool().resolve(escape_term(term))
     if _platform == "linux" or _platform == "linux2":
         # linux
         cp = "{0}/florchebi.jar:{0}/mysql-connector-java-5.1.24-bin.jar:{0}/Tokenizer.jar".format(florchebi_path)
     elif _platform == "win32":
         # "Windows..."
         cp = "{0}/florchebi.jar;{0}/mysql-connector-java-5.1.24-bin.jar;{0}/Tokenizer.jar".format(florchebi_path)
-    florcall = ["java", "-cp", cp, "xldb.flor.match.FlorTextChebi3star", db.escape_string(term),
+    florcall = ["java", "-cp", cp, "xldb.flor.match.FlorTextChebi3star", escape_term(term),
                 "children", "true", "mychebi201301", "false", "false", "chebi", stoplist, "1"]
     # print ' '.join(florcall)
     flor = Popen(florcall, stdout=PIPE)
@@ -135,7 +171,7 @@ def find_chebi_term2(term):
 
 
 def get_IC():
-    cur = db.cursor()
+    cur = get_chebi_db().cursor()
     # check for exact match
     query = """SELECT distinct term_id, rel_info, hindex_info, seco_info
                FROM SSM_TermDesc"""
@@ -158,6 +194,23 @@ def find_chebi_term3(term):
         logging.info("mapped %s to %s", term.decode("utf-8"), c)
     return c
 
+
+def find_chebi_terms(terms):
+    """
+    Resolve a list of terms, each distinct term only once
+    :param terms: list of utf-8 encoded terms
+    :return: dictionary term => (chebiID, chebiTerm, score)
+    """
+    new_terms = [term for term in set(terms) if term not in chebi]
+    if len(new_terms) > 1 and config.florchebi_workers > 1:
+        # resolve the new terms at the same time with every worker of the pool
+        matches = get_florchebi_pool().resolve_many([escape_term(term) for term in new_terms])
+        for term, c in zip(new_terms, matches):
+            chebi[term] = c
+            logging.info("mapped %s to %s", term.decode("utf-8"), c)
+    return dict((term, find_chebi_term3(term)) for term in set(terms))
+
+
 def exit_handler():
     logging.info('Saving chebi dictionary...!')
     pickle.dump(chebi, open(chebidic, "wb"))
@@ -167,11 +220,12 @@ atexit.register(exit_handler)
 
 def chebi2go(chebiid, go2chebi="chebi2go.pickle"):
     # return a list of GO terms associated with chebi or 0 if none
-    mappings = pickle.load(open("data/chebi2go.pickle"))
-    if "CHEBI:" + str(chebiid) not in mappings:
+    # the mappings are opened once per process, see chebi_go.get_chebi_go_mappings
+    gos = get_chebi_go_mappings().get(chebiid)
+    if not gos:
         return 0
     else:
-        return mappings["CHEBI:" + str(chebiid)]
+        return gos
 
 
 def loadC2G(go2chebi="GO_to_ChEBI.obo", outname="chebi2go.pickle"):
@@ -204,10 +258,11 @@ def loadC2G(go2chebi="GO_to_ChEBI.obo", outname="chebi2go.pickle"):
     print "unique:", len(set(gos)), len(set(chebis))
     pickle.dump(c2gdic, open(outname, 'w'))
     print "mappings written to", outname
+    write_mappings(c2gdic, config.chebi2go_path)
 
 
 def get_description(id):
-    cur = db.cursor()
+    cur = get_chebi_db().cursor()
     query = """SELECT term_definition
            FROM term_definition
            WHERE term_id = %s""" % id
@@ -220,33 +275,23 @@ def get_description(id):
         return "NA"
 
 
-def load_synonyms():
-    syns = []
-    cur = db.cursor()
-    query = """SELECT id, name
-           FROM term """
-    cur.execute(query)
-    ids = cur.fetchall()
-    for i in ids:
-        print "getting synonyms for" + i[1].lower() + '(' + str(i[0]) + ')',
-        synset = set()
-        synset.add(i[1].lower())
-        query = """SELECT term_synonym
-           FROM term_synonym
-           WHERE term_id = %s""" % i[0]
-        cur.execute(query)
-        names = cur.fetchall()
-        print len(names)
-        for name in names:
-            #print name[0], 
-            synset.add(name[0].lower())
-        syns.append(synset)
-    pickle.dump(syns, open("data/chebi_synonyms.pickle", 'wb'))
-    print "done"
+def load_synonyms(conn=None, reload=False):
+    """
+    Sets of synonyms of the ChEBI terms, read in a single pass over the database and saved to
+    data/chebi_synonyms.pickle, which is used instead of the database if it exists
+    :param conn: ChEBI database connection (or a SQLite stand-in, see mysqldump.py); the ChEBI database by default
+    :param reload: read the synonyms from the database even if they were saved
+    :return: list of sets of synonyms
+    """
+    if conn is None and config.use_chebi:
+        conn = db
+    syns = get_synonyms(conn, reload=reload)
+    print "synonyms of {} terms".format(len(syns))
+    return syns
 
 
 def check_dist_between(cid1, cid2):
-    cur = db.cursor()
+    cur = get_chebi_db().cursor()
     query = """SELECT distance 
                FROM graph_path 
                WHERE term1_id = %s and term2_id = %s""" % (cid1, cid2)
@@ -259,34 +304,45 @@ def check_dist_between(cid1, cid2):
     return dist
 
 
-def add_chebi_mappings(results, source):
+def add_chebi_mappings(results, source, go=False):
     """
-
-    :param results: ResultsNER object
+    Add the ChEBI mapping of each entity, resolving each distinct text once
+    :param results: ResultsNER object, with the full corpus or with the reduced corpus of the saved results
+    :param source: Base model path
+    :param go: also add the GO terms mapped to the ChEBI term of each entity
     :return:
     """
     mapped = 0
     not_mapped = 0
     total_score = 0
-    for did in results.corpus.documents:
-        for sentence in results.corpus.documents[did].sentences:
-            for s in sentence.entities.elist:
-                if s.startswith(source):
-                    #if s != source:
-                    #    logging.info("processing %s" % s)
-                    for entity in sentence.entities.elist[s]:
-                        chebi_info = find_chebi_term3(entity.text.encode("utf-8"))
-                        entity.chebi_id = chebi_info[0]
-                        entity.chebi_name = chebi_info[1]
-                        entity.chebi_score = chebi_info[2]
-                        # TODO: check for errors (FP and FN)
-                        if chebi_info[2] == 0:
-                            #logging.info("nothing for %s" % entity.text)
-                            not_mapped += 1
-                        else:
-                            #logging.info("%s => %s %s" % (entity.text, chebi_info[1], chebi_info[2]))
-                            mapped += 1
-                            total_score += chebi_info[2]
+    entities = []
+    seen = set()  # each entity is on the list of its source and on the list of its source and type
+    for sentence_entities in iter_sentence_entities(results.corpus):
+        for s in sentence_entities.elist:
+            if s.startswith(source):
+                #if s != source:
+                #    logging.info("processing %s" % s)
+                for entity in sentence_entities.elist[s]:
+                    if id(entity) not in seen:
+                        seen.add(id(entity))
+                        entities.append(entity)
+    chebi_matches = find_chebi_terms([entity.text.encode("utf-8") for entity in entities])
+    for entity in entities:
+        chebi_info = chebi_matches[entity.text.encode("utf-8")]
+        entity.chebi_id = chebi_info[0]
+        entity.chebi_name = chebi_info[1]
+        entity.chebi_score = chebi_info[2]
+        entity.scores["chebi"] = chebi_info[2]
+        # TODO: check for errors (FP and FN)
+        if chebi_info[2] == 0:
+            #logging.info("nothing for %s" % entity.text)
+            not_mapped += 1
+        else:
+            #logging.info("%s => %s %s" % (entity.text, chebi_info[1], chebi_info[2]))
+            mapped += 1
+            total_score += chebi_info[2]
+    if go:
+        add_go_ids(entities)
     if mapped == 0:
         mapped = 0.000001
     logging.info("{0} mapped, {1} not mapped, average score: {2}".format(mapped, not_mapped, total_score/mapped))
@@ -317,7 +373,11 @@ def main():
         "--datatype", action="store", dest="type", type="string", default="chemdner",
         help="Data type to test (chemdner, patents or ddi)")
     parser.add_option("--action", action="store", dest="action", type="string", default="map",
-                      help="test, batch, info, map, chebi2go")
+                      help="test, batch, info, map, chebi2go, index, synonyms, sqlite")
+    parser.add_option("--sqlite", action="store", dest="sqlite", type="string", default=None,
+                      help="SQLite stand-in of the ChEBI database, used by the synonyms and index actions")
+    parser.add_option("--dump", action="store", dest="dump", type="string", default=None,
+                      help="MySQL dump of the ChEBI database, loaded into the SQLite stand-in by the sqlite action")
     (options, args) = parser.parse_args()
     numeric_level = getattr(logging, options.loglevel.upper(), None)
     #if not isinstance(numeric_level, int):
@@ -397,8 +457,17 @@ def main():
             loadC2G()
         else:
             print chebi2go(options.text)
-    elif options.action == "synonyms":
-        load_synonyms()
+    elif options.action == "sqlite":
+        open_sqlite_dump(options.sqlite, options.dump).close()
+    elif options.action in ("synonyms", "index"):
+        if options.sqlite is not None:
+            conn = open_sqlite_dump(options.sqlite)
+        else:
+            conn = get_chebi_db()
+        if options.action == "synonyms":
+            load_synonyms(conn, reload=options.reload)
+        else:
+            build_index(conn, config.chebi_index_path)
 
 if __name__ == "__main__":
     main()
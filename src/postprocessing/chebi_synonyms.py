@@ -0,0 +1,99 @@
+from __future__ import unicode_literals
+import cPickle as pickle
+import logging
+import os
+import sqlite3
+import time
+
+SYNONYMS_VERSION = 1
+SYNONYMS_PATH = "data/chebi_synonyms.pickle"
+
+loaded_synonyms = {}  # path => list of synonym sets, so that the artifact is read only once per process
+
+
+def streaming_cursor(conn):
+    """
+    :return: cursor that fetches the rows from the server as they are read, instead of all at once
+    """
+    if isinstance(conn, sqlite3.Connection):
+        return conn.cursor()
+    import MySQLdb.cursors
+    return conn.cursor(MySQLdb.cursors.SSCursor)
+
+
+def to_unicode(text):
+    if isinstance(text, bytes):
+        return text.decode("utf-8")
+    return text
+
+
+def stream_synonyms(conn):
+    """
+    Read every ChEBI term with its synonyms in a single pass over the join of the term and term_synonym tables
+    :param conn: DB-API connection to the ChEBI database (MySQL or a SQLite stand-in)
+    :return: generator of (term id, set of the lowercase name and synonyms of the term)
+    """
+    cur = streaming_cursor(conn)
+    cur.execute("""SELECT a.id, a.name, b.term_synonym
+                   FROM term a LEFT JOIN term_synonym b ON (b.term_id=a.id)
+                   ORDER BY a.id""")
+    term_id = None
+    synset = None
+    for tid, name, synonym in cur:
+        if tid != term_id:
+            if synset is not None:
+                yield term_id, synset
+            term_id = tid
+            synset = set([to_unicode(name).lower()])
+        if synonym is not None:
+            synset.add(to_unicode(synonym).lower())
+    if synset is not None:
+        yield term_id, synset
+    cur.close()
+
+
+def build_synonyms(conn, path=SYNONYMS_PATH):
+    """
+    Save the synonym sets of every ChEBI term, with the version of the artifact
+    :return: list of sets of synonyms, one for each term, in the order of the term ids
+    """
+    start_time = time.time()
+    syns = [synset for term_id, synset in stream_synonyms(conn)]
+    with open(path, 'wb') as synfile:
+        pickle.dump({"version": SYNONYMS_VERSION, "terms": len(syns), "synonyms": syns}, synfile,
+                    pickle.HIGHEST_PROTOCOL)
+    logging.info("synonyms of {} terms written to {} in {:.1f}s".format(len(syns), path, time.time() - start_time))
+    return syns
+
+
+def read_synonyms(path=SYNONYMS_PATH):
+    """
+    :return: list of sets of synonyms saved by build_synonyms, or None if the file does not exist or has a different
+    version
+    """
+    if not os.path.isfile(path):
+        return None
+    with open(path, 'rb') as synfile:
+        data = pickle.load(synfile)
+    if not isinstance(data, dict) or data.get("version") != SYNONYMS_VERSION:
+        logging.info("{} has an old version of the synonyms".format(path))
+        return None
+    return data["synonyms"]
+
+
+def get_synonyms(conn=None, path=SYNONYMS_PATH, reload=False):
+    """
+    :param conn: connection used to build the synonyms if the artifact is not available
+    :param reload: build the synonyms even if the artifact exists
+    :return: list of sets of synonyms of the ChEBI terms, loaded once per process
+    """
+    if reload or path not in loaded_synonyms:
+        syns = None
+        if not reload:
+            syns = read_synonyms(path)
+        if syns is None:
+            if conn is None:
+                raise ValueError("{} not available and no database to build it".format(path))
+            syns = build_synonyms(conn, path)
+        loaded_synonyms[path] = syns
+    return loaded_synonyms[path]
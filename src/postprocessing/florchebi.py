@@ -0,0 +1,202 @@
+from __future__ import unicode_literals
+import atexit
+import logging
+import os
+import sys
+import threading
+from multiprocessing.pool import ThreadPool
+from Queue import Queue, Empty
+from subprocess import Popen, PIPE, check_call
+from sys import platform as _platform
+
+from classification.rext.workspace import create_workspace, remove_workspace
+from config import config
+
+NO_MATCH = ('0', 'null', 0.0)
+STUB = os.path.join(os.path.dirname(os.path.abspath(__file__)), "florchebi_stub.py")
+
+florchebi_pool = None  # pool of this process, started by the first call of get_florchebi_pool
+
+
+def florchebi_classpath(*paths):
+    if _platform == "win32":
+        sep = ";"
+    else:
+        sep = ":"
+    return sep.join(["{0}/florchebi.jar".format(config.florchebi_path),
+                     "{0}/mysql-connector-java-5.1.24-bin.jar".format(config.florchebi_path),
+                     "{0}/Tokenizer.jar".format(config.florchebi_path)] + list(paths))
+
+
+def parse_result(line):
+    """
+    :param line: output line of a worker for one term
+    :return: (chebiID, chebiTerm, score)
+    """
+    line = line.decode("utf-8").rstrip("\n")
+    if line.startswith("ERROR\t"):
+        logging.warning("florchebi: {}".format(line[len("ERROR\t"):]))
+        return NO_MATCH
+    chebires = line.split('\t')
+    if len(chebires) == 3:
+        return (chebires[0], chebires[1], float(chebires[2]))
+    return NO_MATCH
+
+
+class FlorChebiWorker(object):
+    """
+    Resident florchebi process, which keeps the matcher and its database connection loaded between terms.
+    Each term is written to its stdin and one result line is read from its stdout; if a term is not resolved
+    before the timeout, or the process exits, the process is restarted.
+    """
+    def __init__(self, command, timeout=30):
+        """
+        :param command: command that starts the worker process
+        :param timeout: seconds to wait for the result of each term
+        """
+        self.command = command
+        self.timeout = timeout
+        self.process = None
+        self.lines = None
+        self.reader = None
+        self.restarts = 0
+        self.terms = 0
+        self.start()
+
+    def start(self):
+        self.process = Popen(self.command, stdin=PIPE, stdout=PIPE)
+        # the output is read by a thread, so that the results can be waited for with a timeout
+        self.lines = Queue()
+        self.reader = threading.Thread(target=self.read_output, args=(self.process, self.lines))
+        self.reader.daemon = True
+        self.reader.start()
+
+    @staticmethod
+    def read_output(process, lines):
+        for line in iter(process.stdout.readline, b""):
+            lines.put(line)
+        lines.put(None)
+
+    def stop(self):
+        if self.process is None:
+            return
+        try:
+            self.process.stdin.close()
+        except IOError:
+            pass
+        if self.process.poll() is None:
+            self.process.kill()
+        self.process.wait()
+        # the reader thread stops at the end of the output, so it is not left running at interpreter shutdown
+        self.reader.join(5)
+        self.process = None
+        self.reader = None
+
+    def restart(self):
+        self.stop()
+        self.restarts += 1
+        self.start()
+
+    def resolve(self, term, retry=True):
+        """
+        :param term: utf-8 encoded term
+        :param retry: send the term again if the process had exited
+        :return: (chebiID, chebiTerm, score)
+        """
+        if isinstance(term, unicode):
+            term = term.encode("utf-8")
+        if self.process is None or self.process.poll() is not None:
+            self.restart()
+        try:
+            self.process.stdin.write(term.replace(b"\n", b" ") + b"\n")
+            self.process.stdin.flush()
+            line = self.lines.get(timeout=self.timeout)
+        except IOError:
+            line = None
+        except Empty:
+            logging.warning("florchebi timed out after {}s resolving {}, restarting".format(self.timeout,
+                                                                                          term.decode("utf-8")))
+            self.restart()
+            return NO_MATCH
+        if line is None:
+            logging.warning("florchebi worker exited resolving {}, restarting".format(term.decode("utf-8")))
+            self.restart()
+            if retry:
+                return self.resolve(term, retry=False)
+            return NO_MATCH
+        self.terms += 1
+        return parse_result(line)
+
+
+class FlorChebiPool(object):
+    """
+    Resident florchebi workers; each term is resolved by the next idle worker, so that several terms are resolved
+    at the same time by resolve_many
+    """
+    def __init__(self, command, nworkers=1, timeout=30):
+        self.nworkers = nworkers
+        self.workers = [FlorChebiWorker(command, timeout) for i in range(nworkers)]
+        self.idle = Queue()
+        for worker in self.workers:
+            self.idle.put(worker)
+        self.pool = ThreadPool(nworkers)
+
+    def resolve(self, term):
+        """
+        :param term: utf-8 encoded term
+        :return: (chebiID, chebiTerm, score)
+        """
+        worker = self.idle.get()
+        try:
+            return worker.resolve(term)
+        finally:
+            self.idle.put(worker)
+
+    def resolve_many(self, terms):
+        """
+        :return: list of (chebiID, chebiTerm, score), in the order of the terms
+        """
+        return self.pool.map(self.resolve, terms)
+
+    def close(self):
+        self.pool.close()
+        self.pool.join()
+        for worker in self.workers:
+            worker.stop()
+        logging.info("florchebi pool finished: {} terms, {} restarts".format(sum([w.terms for w in self.workers]),
+                                                                            sum([w.restarts for w in self.workers])))
+
+
+def java_worker_command(workspace):
+    """
+    Compile FlorChebiWorker to a workspace
+    :return: command that starts a java florchebi worker
+    """
+    source = os.path.join(config.florchebi_path, "FlorChebiWorker.java")
+    check_call(["javac", "-cp", florchebi_classpath(), "-d", workspace, source])
+    return ["java", "-cp", florchebi_classpath(workspace), "FlorChebiWorker",
+            "children", "true", "mychebi201301", "false", "false", "chebi", config.stoplist, "1"]
+
+
+def get_florchebi_pool():
+    """
+    :return: florchebi pool of this process, with config.florchebi_workers workers; the stub worker is used instead
+    of java if config.florchebi_worker is "stub"
+    """
+    global florchebi_pool
+    if florchebi_pool is None:
+        workspace = None
+        if config.florchebi_worker == "stub":
+            command = [sys.executable, STUB]
+        else:
+            workspace = create_workspace("florchebi")
+            command = java_worker_command(workspace)
+        florchebi_pool = FlorChebiPool(command, config.florchebi_workers, config.florchebi_timeout)
+        logging.info("started {} florchebi workers".format(config.florchebi_workers))
+
+        def close_pool():
+            florchebi_pool.close()
+            if workspace is not None:
+                remove_workspace(workspace)
+        atexit.register(close_pool)
+    return florchebi_pool
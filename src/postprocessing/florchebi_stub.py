@@ -0,0 +1,30 @@
+#!/usr/bin/env python
+"""
+Stand-in for the resident florchebi worker, with the same stdin/stdout protocol, so that the worker pool can be used
+without Java or the ChEBI database (florchebi_worker = "stub").
+Every term is matched to itself with a fake id; terms starting with "sleep:" take that many seconds, to test the
+timeouts, "exit:" terms stop the worker, to test the restarts, and "null:" terms have no match.
+"""
+import sys
+import time
+import zlib
+
+
+def main():
+    while True:
+        term = sys.stdin.readline()
+        if not term:
+            break
+        term = term.rstrip("\n")
+        if term.startswith("sleep:"):
+            time.sleep(float(term[len("sleep:"):]))
+        elif term.startswith("exit:"):
+            sys.exit(1)
+        if term.startswith("null:"):
+            sys.stdout.write("\n")
+        else:
+            sys.stdout.write("{}\t{}\t1.0\n".format(zlib.crc32(term) & 0xfffff, term))
+        sys.stdout.flush()
+
+if __name__ == "__main__":
+    main()
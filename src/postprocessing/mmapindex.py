@@ -0,0 +1,146 @@
+from __future__ import unicode_literals
+import json
+import mmap
+import os
+import struct
+import zlib
+from collections import OrderedDict
+
+MAGIC = b"IBENTIDX"
+# format of the values of each type of section
+SECTION_FORMATS = {"int": "i", "long": "q", "float": "d", "bytes": "s"}
+
+
+class IndexWriter(object):
+    """
+    Write read-only tables to a single file, as sections of fixed size values that are read by MappedIndex without
+    loading or unpickling the file
+    """
+    def __init__(self):
+        self.sections = OrderedDict()  # name => (type, packed data)
+
+    def add_values(self, name, values, vtype="int"):
+        fmt = SECTION_FORMATS[vtype]
+        self.sections[name] = (vtype, struct.pack(str("<{}{}".format(len(values), fmt)), *values))
+
+    def add_bytes(self, name, data):
+        self.sections[name] = ("bytes", data)
+
+    def add_strings(self, name, strings, hashed=False):
+        """
+        Add a list of strings, found by position with MappedIndex.get_string
+        :param hashed: also add a hash table, so that the position of a string is found with MappedIndex.find_string;
+        the strings must be unique
+        """
+        encoded = [s.encode("utf-8") for s in strings]
+        offsets = [0]
+        for s in encoded:
+            offsets.append(offsets[-1] + len(s))
+        self.add_bytes(name + ".data", b"".join(encoded))
+        self.add_values(name + ".offsets", offsets, "long")
+        if hashed:
+            nslots = 2
+            while nslots < 2 * len(encoded):
+                nslots *= 2
+            slots = [-1] * nslots
+            for i, s in enumerate(encoded):
+                slot = string_hash(s) & (nslots - 1)
+                while slots[slot] != -1:
+                    slot = (slot + 1) & (nslots - 1)
+                slots[slot] = i
+            self.add_values(name + ".slots", slots)
+
+    def write(self, path, info=None):
+        """
+        :param info: dictionary saved with the sections, e.g. with the version of the data
+        """
+        header = {"info": info or {}, "sections": OrderedDict()}
+        offset = 0
+        for name, (vtype, data) in self.sections.items():
+            # align every section to 8 bytes
+            offset += -offset % 8
+            header["sections"][name] = (vtype, offset, len(data))
+            offset += len(data)
+        header_data = json.dumps(header).encode("utf-8")
+        start = len(MAGIC) + 8 + len(header_data)
+        start += -start % 8
+        # written to a temporary file first, so that other processes never open a partial file
+        tmp_path = "{}.{}.tmp".format(path, os.getpid())
+        with open(tmp_path, "wb") as indexfile:
+            indexfile.write(MAGIC)
+            indexfile.write(struct.pack(str("<q"), len(header_data)))
+            indexfile.write(header_data)
+            for name, (vtype, data) in self.sections.items():
+                indexfile.write(b"\0" * (start + header["sections"][name][1] - indexfile.tell()))
+                indexfile.write(data)
+        os.rename(tmp_path, path)
+
+
+def string_hash(s):
+    return zlib.crc32(s) & 0xffffffff
+
+
+class MappedIndex(object):
+    """
+    Tables written by IndexWriter. The file is memory-mapped, so it opens in constant time and its pages are shared by
+    every process that reads it.
+    """
+    def __init__(self, path):
+        self.path = path
+        with open(path, "rb") as indexfile:
+            self.mm = mmap.mmap(indexfile.fileno(), 0, access=mmap.ACCESS_READ)
+        if self.mm[:len(MAGIC)] != MAGIC:
+            raise ValueError("{} is not an index file".format(path))
+        header_size = struct.unpack_from(str("<q"), self.mm, len(MAGIC))[0]
+        start = len(MAGIC) + 8
+        header = json.loads(self.mm[start:start + header_size].decode("utf-8"))
+        start += header_size
+        start += -start % 8
+        self.info = header["info"]
+        self.sections = {}
+        for name, (vtype, offset, size) in header["sections"].items():
+            fmt = SECTION_FORMATS[vtype]
+            self.sections[name] = (str("<" + fmt), start + offset, struct.calcsize(str(fmt)), size)
+
+    def __contains__(self, name):
+        return name in self.sections
+
+    def length(self, name):
+        fmt, offset, itemsize, size = self.sections[name]
+        return size // itemsize
+
+    def get(self, name, i):
+        fmt, offset, itemsize, size = self.sections[name]
+        return struct.unpack_from(fmt, self.mm, offset + i * itemsize)[0]
+
+    def get_range(self, name, start, end):
+        fmt, offset, itemsize, size = self.sections[name]
+        return struct.unpack_from(str("<{}{}".format(end - start, fmt[1])), self.mm, offset + start * itemsize)
+
+    def get_values(self, name):
+        return self.get_range(name, 0, self.length(name))
+
+    def get_string(self, name, i):
+        start, end = self.get_range(name + ".offsets", i, i + 2)
+        offset = self.sections[name + ".data"][1]
+        return self.mm[offset + start:offset + end].decode("utf-8")
+
+    def find_string(self, name, s):
+        """
+        :return: position of the string on a table added with hashed=True, or -1 if it is not there
+        """
+        encoded = s.encode("utf-8")
+        nslots = self.length(name + ".slots")
+        slot = string_hash(encoded) & (nslots - 1)
+        offset = self.sections[name + ".data"][1]
+        while True:
+            i = self.get(name + ".slots", slot)
+            if i == -1:
+                return -1
+            start, end = self.get_range(name + ".offsets", i, i + 2)
+            if self.mm[offset + start:offset + end] == encoded:
+                return i
+            slot = (slot + 1) & (nslots - 1)
+
+    def close(self):
+        self.mm.close()
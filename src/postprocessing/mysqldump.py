@@ -0,0 +1,117 @@
+from __future__ import unicode_literals
+import codecs
+import logging
+import re
+import sqlite3
+import time
+
+CREATE_RE = re.compile(r"CREATE TABLE `(\w+)`")
+COLUMN_RE = re.compile(r"\s*`(\w+)`")
+INSERT_RE = re.compile(r"INSERT INTO `(\w+)`(?: \(([^)]*)\))? VALUES ")
+VALUE_RE = re.compile(r"\(|\)|'((?:[^'\\]|\\.|'')*)'|(NULL)|([^,()\s']+)")
+ESCAPE_RE = re.compile(r"\\(.)|''")
+ESCAPES = {"0": "\0", "b": "\b", "n": "\n", "r": "\r", "t": "\t", "Z": "\x1a"}
+
+
+def unescape(value):
+    return ESCAPE_RE.sub(lambda m: "'" if m.group(1) is None else ESCAPES.get(m.group(1), m.group(1)), value)
+
+
+def parse_number(value):
+    try:
+        return int(value)
+    except ValueError:
+        try:
+            return float(value)
+        except ValueError:
+            return value
+
+
+def parse_rows(values):
+    """
+    :param values: VALUES part of an INSERT statement of a MySQL dump
+    :return: list of row tuples
+    """
+    rows = []
+    row = None
+    for m in VALUE_RE.finditer(values):
+        token = m.group(0)
+        if token == "(":
+            row = []
+        elif token == ")":
+            rows.append(tuple(row))
+            row = None
+        elif row is None:
+            continue
+        elif m.group(1) is not None:
+            row.append(unescape(m.group(1)))
+        elif m.group(2) is not None:
+            row.append(None)
+        else:
+            row.append(parse_number(m.group(3)))
+    return rows
+
+
+def load_dump(dump_path, conn, tables=None):
+    """
+    Load the tables of a MySQL dump (as written by mysqldump) into a SQLite database, so that the code that queries
+    the database can be run against a local stand-in. Only the column names are kept, not the types or keys.
+    :param dump_path: SQL file
+    :param conn: sqlite3 connection
+    :param tables: names of the tables to be loaded; every table by default
+    :return: dictionary table => number of rows
+    """
+    start_time = time.time()
+    cur = conn.cursor()
+    columns = {}
+    counts = {}
+    create_table = None
+    with codecs.open(dump_path, 'r', 'utf-8') as dump:
+        for line in dump:
+            if create_table is not None:
+                if line.startswith(")"):
+                    cur.execute("DROP TABLE IF EXISTS {}".format(create_table))
+                    cur.execute("CREATE TABLE {} ({})".format(create_table, ", ".join(columns[create_table])))
+                    counts[create_table] = 0
+                    create_table = None
+                else:
+                    m = COLUMN_RE.match(line)
+                    if m is not None:
+                        columns[create_table].append(m.group(1))
+                continue
+            m = CREATE_RE.match(line)
+            if m is not None:
+                if tables is None or m.group(1) in tables:
+                    create_table = m.group(1)
+                    columns[create_table] = []
+                continue
+            m = INSERT_RE.match(line)
+            if m is not None and m.group(1) in counts:
+                table = m.group(1)
+                if m.group(2) is not None:
+                    table_columns = [c.strip().strip("`") for c in m.group(2).split(",")]
+                else:
+                    table_columns = columns[table]
+                rows = parse_rows(line[m.end():])
+                cur.executemany("INSERT INTO {} ({}) VALUES ({})".format(table, ", ".join(table_columns),
+                                                                        ", ".join(["?"] * len(table_columns))),
+                                rows)
+                counts[table] += len(rows)
+    for table in columns:
+        # the queries join the tables by their ids
+        for column in columns[table]:
+            if column == "id" or column.endswith("_id"):
+                cur.execute("CREATE INDEX IF NOT EXISTS {0}_{1} ON {0} ({1})".format(table, column))
+    conn.commit()
+    logging.info("loaded {} from {} in {:.1f}s".format(counts, dump_path, time.time() - start_time))
+    return counts
+
+
+def open_sqlite_dump(sqlite_path, dump_path=None, tables=None):
+    """
+    :return: sqlite3 connection to a SQLite stand-in of a MySQL database, loaded from the dump if it is given
+    """
+    conn = sqlite3.connect(sqlite_path)
+    if dump_path is not None:
+        load_dump(dump_path, conn, tables)
+    return conn
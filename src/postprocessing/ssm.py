@@ -6,6 +6,7 @@ import pickle
 from optparse import OptionParser
 import logging
 from config import config
+from postprocessing.chebi_go import add_go_ids
 if config.use_chebi:
     from config.config import chebi_conn as db
 if config.use_go:
@@ -310,7 +311,7 @@ def get_ontology_id(entity, ontology):
     if ontology == "chebi":
         resid = entity.chebi_id
     elif ontology == "go":
-        resid = entity.best_go
+        resid = getattr(entity, "best_go", None)
     return resid
 
 
@@ -325,6 +326,9 @@ def get_ssm(entities, measure, ontology="chebi", hindex=4):
     AT LEAST 2 predictions with chebi
     """
     ssms = {} #{e1ID:{e2ID:ssm, e3ID:ssm}}
+    if ontology == "go":
+        # GO terms of the chemical entities, looked up once for each distinct ChEBI id
+        add_go_ids([e for e in entities if getattr(e, "best_go", None) is None])
 
     if measure not in measures and measure not in go_measures:
         print 'measure not implement: ' + measure
@@ -193,7 +193,7 @@ def main():
                     for did in results.document_pairs:
                         if did not in all_results.document_pairs:
                             all_results.document_pairs[did] = Pairs(did=did)
-                        all_results.document_pairs[did].pairs += results.document_pairs[did].pairs
+                        all_results.document_pairs[did].merge(results.document_pairs[did])
             if options.ptype == "all":
                 goldset = get_gold_ann_set(paths[options.goldstd[0]]["format"], paths[options.goldstd[0]]["annotations"],
                                        "all", "all", paths[options.goldstd[0]]["text"])
@@ -24,6 +24,7 @@ import json
 
 from text.document import Document
 from text.corpus import Corpus
+from classification.modelregistry import registry
 from classification.ner.taggercollection import TaggerCollection
 from classification.ner.simpletagger import SimpleTaggerModel, feature_extractors
 from postprocessing.ensemble_ner import EnsembleNER
@@ -81,6 +82,7 @@ class IBENT(object):
 
     def load_models(self):
         # Run load_tagger method of all models
+        # models that are already in the registry are not loaded again
         for i, a in enumerate(self.entity_annotators.keys()):
             self.create_annotationset(a[0])
             if a[1] == "stanfordner":
@@ -99,7 +101,7 @@ class IBENT(object):
             self.create_annotationset(a[0])
             if a[1] == "jsre":
                 model = JSREKernel(None, a[2], train=False, modelname="annotators/{}/{}.model".format(a[2], a[0]), ner="all")
-                model.load_classifier()
+                model.load_classifier(server=True)
                 self.relation_annotators[a] = model
             elif a[1] == "smil":
                 model = MILClassifier(None, a[2], relations=[], modelname="{}.model".format(a[0]),
@@ -109,6 +111,11 @@ class IBENT(object):
                 model.load_classifier()
                 self.relation_annotators[a] = model
 
+    def get_models(self):
+        # Load time, hits and memory of the models kept by the registry
+        bottle.response.content_type = "application/json"
+        return json.dumps(registry.stats())
+
     def create_annotationset(self, name):
         # Create DB entries for each annotations set
         cur = self.db_conn.cursor()
@@ -234,7 +241,7 @@ class IBENT(object):
 
                 for sentence in input_sentences:
                     if a[1] == "jsre":
-                        pred, original = sentence_results[s[1]]
+                        pred, original = sentence_results[sentence.sid]
                         sentence_relations = self.relation_annotators[a].process_sentence(pred, original, sentence)
                     elif a[1] == "smil":
                         sentence_relations = self.relation_annotators[a].process_sentence(sentence)
@@ -452,6 +459,9 @@ def main():
     # Test server
     bottle.route("/ibent/status")(server.hello)
 
+    # Models loaded in memory
+    bottle.route("/ibent/models")(server.get_models)
+
     # Fetch an existing document
     bottle.route("/ibent/<doctag>")(server.get_document)
 
@@ -171,6 +171,9 @@ with open(config.stoplist, 'r') as stopfile:
 
 class ChemicalEntity(Entity):
     """Chemical entities"""
+    normalization_backend = "chebi"
+    normalization_attributes = Entity.normalization_attributes + ("chebi_id", "chebi_name", "chebi_score")
+
     def __init__(self, tokens, sid, *args, **kwargs):
         # Entity.__init__(self, kwargs)
         super(ChemicalEntity, self).__init__(tokens, *args, **kwargs)
@@ -143,10 +143,10 @@ class Document(object):
             #    print s.sid, s.tokens[0].dstart, s.tokens[-1].dend, s.text
 
     def add_relation(self, entity1, entity2, subtype, relation, source="goldstandard", **kwargs):
-        if self.pairs.pairs:
-            pid = self.did + ".p" + str(len(self.pairs.pairs))
-        else:
-            pid = self.did + ".p0"
+        existing = self.pairs.find(entity1, entity2, relation if subtype == "tlink" else subtype)
+        if existing is not None:
+            return self.pairs.add_pair(existing, source)
+        pid = self.pairs.new_pid(self.did)
         between_text = self.text[entity1.dend:entity2.start]
         logging.debug("adding {}:{}=>{}".format(pid, entity1.text.encode("utf8"), entity2.text.encode("utf8")))
         # print between_text
@@ -155,8 +155,7 @@ class Document(object):
                                      did=self.did, pid=pid, rtype=subtype, between_text=between_text)
         else:
             pair = Pair((entity1, entity2), subtype, did=self.did, pid=pid, original_id=kwargs.get("original_id"), between_text=between_text)
-        self.pairs.add_pair(pair, source)
-        return pair
+        return self.pairs.add_pair(pair, source)
 
     def get_space_between_sentences(self, totalchars):
         """
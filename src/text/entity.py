@@ -7,6 +7,9 @@ from text.offset import Offset, Offsets, perfect_overlap, contained_by, no_overl
 
 class Entity(object):
     """Base entity class"""
+    # resource used by normalize, and attributes set by it, which are the same for every entity with the same text
+    normalization_backend = "text"
+    normalization_attributes = ("normalized", "normalized_score", "normalized_ref")
 
     def __init__(self, tokens, *args, **kwargs):
         self.type = kwargs.get('e_type', None)
@@ -96,6 +99,17 @@ class Entity(object):
     def normalize(self):
         pass
 
+    def copy_normalization(self, entity):
+        """
+        Copy the results of normalize from an entity with the same type and text
+        """
+        for attribute in self.normalization_attributes:
+            if hasattr(entity, attribute):
+                value = getattr(entity, attribute)
+                if isinstance(value, list):
+                    value = value[:]
+                setattr(self, attribute, value)
+
 
 class Entities(object):
     """Group of entities related to a text"""
@@ -82,6 +82,8 @@ def call_ldpmap(query):
 
 class EventEntity(Entity):
     """Chemical entities"""
+    normalization_backend = "umls"
+
     def __init__(self, tokens, sid, **kwargs):
         # Entity.__init__(self, kwargs)
         super(EventEntity, self).__init__(tokens, **kwargs)
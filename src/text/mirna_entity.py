@@ -24,6 +24,9 @@ mirna_graph = MirbaseDB(config.mirbase_path)
 mirna_graph.load_graph()
 
 class MirnaEntity(Entity):
+    normalization_backend = "mirbase"
+    normalization_attributes = Entity.normalization_attributes + ("go_ids", "best_go")
+
     def __init__(self, tokens, sid, *args, **kwargs):
         # Entity.__init__(self, kwargs)
         super(MirnaEntity, self).__init__(tokens, **kwargs)
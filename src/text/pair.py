@@ -34,12 +34,53 @@ class Pair(object):
 
 
 class Pairs(object):
-    """ List of pairs related to a sentence
+    """ List of pairs related to a sentence or document, indexed by pid, by (entity 1, entity 2, relation type),
+    by entity and by source, so that repeated pairs are merged and lookups do not scan the list.
+    The entities are indexed by object and not by eid, since the same eid is used by entities of different sources.
     """
+    INDEX_VERSION = 2
+
     def __init__(self, **kwargs):
         self.pairs = []
         self.sid = kwargs.get("sid")
         self.did = kwargs.get("did")
+        self.reindex()
+
+    def reindex(self):
+        """
+        Build the indexes from self.pairs; used for pickles created before the indexes existed and when
+        self.pairs was modified directly
+        """
+        self.by_pid = {}
+        self.by_key = {}  # (entity 1, entity 2, relation) => pair
+        self.by_entity = {}  # entity => list of pairs
+        self.by_source = {}  # source => list of pairs
+        self.indexed = []
+        self.index_version = self.INDEX_VERSION
+        self.next_pid = len(self.pairs)
+        pairs, self.pairs = self.pairs, []
+        for pair in pairs:
+            self.index_pair(pair)
+            self.pairs.append(pair)
+
+    def check_index(self):
+        if getattr(self, "index_version", None) != self.INDEX_VERSION or len(self.indexed) != len(self.pairs) or \
+                (self.pairs and self.indexed[-1] is not self.pairs[-1]):
+            self.reindex()
+
+    @staticmethod
+    def pair_key(pair):
+        return pair.entities[0], pair.entities[1], pair.relation
+
+    def index_pair(self, pair):
+        self.by_key[self.pair_key(pair)] = pair
+        if pair.pid is not None:
+            self.by_pid[pair.pid] = pair
+        for entity in set(pair.entities):
+            self.by_entity.setdefault(entity, []).append(pair)
+        for source in pair.recognized_by:
+            self.by_source.setdefault(source, []).append(pair)
+        self.indexed.append(pair)
 
     def get_dic(self):
         dic = []
@@ -48,9 +89,70 @@ class Pairs(object):
         return dic
 
     def add_pair(self, pair, psource):
-            # logging.debug("created new entry %s for %s" % (esource, self.sid))
-        #if entity in self.elist[esource]:
-        #    logging.info("Repeated entity! %s", entity.eid)
-        # print pair.relation, pair.entities
-        pair.recognized_by[psource] = 1
-        self.pairs.append(pair)
\ No newline at end of file
+        """
+        Add a pair recognized by psource. If a pair with the same entities and relation already exists, psource is
+        added to that pair instead
+        :return: the pair that is kept
+        """
+        self.check_index()
+        existing = self.by_key.get(self.pair_key(pair))
+        if existing is None:
+            pair.recognized_by[psource] = 1
+            self.index_pair(pair)
+            self.pairs.append(pair)
+            return pair
+        if psource not in existing.recognized_by:
+            self.by_source.setdefault(psource, []).append(existing)
+        existing.recognized_by[psource] = 1
+        return existing
+
+    def new_pid(self, prefix):
+        """
+        :param prefix: sid or did
+        :return: pid that was not used before by this set of pairs
+        """
+        self.check_index()
+        pid = prefix + ".p" + str(self.next_pid)
+        while pid in self.by_pid:
+            self.next_pid += 1
+            pid = prefix + ".p" + str(self.next_pid)
+        self.next_pid += 1
+        return pid
+
+    def get_pair(self, pid):
+        self.check_index()
+        return self.by_pid.get(pid)
+
+    def find(self, entity1, entity2, relation):
+        """
+        :return: pair between the entity objects entity1 and entity2 with this relation, or None
+        """
+        self.check_index()
+        return self.by_key.get((entity1, entity2, relation))
+
+    def get_entity_pairs(self, entity):
+        self.check_index()
+        return self.by_entity.get(entity, [])
+
+    def get_source_pairs(self, source):
+        self.check_index()
+        return self.by_source.get(source, [])
+
+    def merge(self, other):
+        """
+        Add the pairs of another Pairs object, keeping the sources that recognized each pair
+        :param other: Pairs
+        """
+        for pair in other.pairs:
+            sources = pair.recognized_by.items()
+            kept = self.add_pair(pair, sources[0][0] if sources else "merged")
+            for source, score in sources:
+                if source not in kept.recognized_by:
+                    self.by_source.setdefault(source, []).append(kept)
+                kept.recognized_by[source] = score
+
+    def __len__(self):
+        return len(self.pairs)
+
+    def __iter__(self):
+        return iter(self.pairs)
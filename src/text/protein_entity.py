@@ -93,6 +93,9 @@ def get_uniprot_name(text):
     return normalized, normalized_score, go_ids
 
 class ProteinEntity(Entity):
+    normalization_backend = "uniprot"
+    normalization_attributes = Entity.normalization_attributes + ("go_ids",)
+
     def __init__(self, tokens, sid, *args, **kwargs):
         # Entity.__init__(self, kwargs)
         super(ProteinEntity, self).__init__(tokens, *args, **kwargs)
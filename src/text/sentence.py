@@ -15,6 +15,7 @@ from classification.ner.simpletagger import create_entity
 from text.pair import Pair, Pairs
 from classification.rext import ddi_kernels
 from classification.rext import relations
+from classification.rext.workspace import create_workspace, remove_workspace
 from text.chemical_entity import ChemicalEntity
 from text.mirna_entity import MirnaEntity
 from text.event_entity import EventEntity
@@ -136,17 +137,16 @@ class Sentence(object):
         return newtoken
 
     def add_relation(self, entity1, entity2, subtype, source="goldstandard", **kwargs):
-        if self.pairs.pairs:
-            pid = self.sid + ".p" + str(len(self.pairs.pairs))
-        else:
-            pid = self.sid + ".p0"
+        existing = self.pairs.find(entity1, entity2, False if subtype == "tlink" else subtype)
+        if existing is not None:
+            return self.pairs.add_pair(existing, source)
+        pid = self.pairs.new_pid(self.sid)
         if subtype == "tlink":
             p = TLink(entity1, entity2, original_id=kwargs.get("original_id"),
                                      did=self.did, pid=pid, rtype=subtype)
         else:
             p = Pair((entity1, entity2), subtype, pid=pid, sid=self.sid, did=self.did)
-        self.pairs.add_pair(p, source)
-        return p
+        return self.pairs.add_pair(p, source)
 
     def exclude_entity(self, start, end, source):
         """
@@ -363,23 +363,24 @@ class Sentence(object):
     def test_relations(self, pairs, basemodel, classifiers=[relations.SLK_PRED, relations.SST_PRED],
                        tag="", backup=False, printstd=False):
         #data =  ddi_train_slk.model, ddi_train_sst.model
-        tempfiles = []
-
-        if relations.SLK_PRED in classifiers:
-            logging.info("**Testing SLK classifier %s ..." % (tag,))
-            #testpairdic = ddi_kernels.fromddiDic(testdocs)
-            ddi_kernels.generatejSREdata(pairs, self, basemodel, tag + "ddi_test_jsre.txt")
-            ddi_kernels.testjSRE(tag + "ddi_test_jsre.txt", tag + "ddi_test_result.txt",
-                                 model=tag + "all_ddi_train_slk.model")
-            self.pairs.pairs = ddi_kernels.getjSREPredicitons(tag + "ddi_test_jsre.txt", tag + "ddi_test_result.txt",
-                                                      self.pairs.pairs)
-            tempfiles.append(ddi_kernels.basedir + tag + "ddi_test_jsre.txt")
-            tempfiles.append(ddi_kernels.basedir + tag + "ddi_test_result.txt")
+        tempfiles = []  # the example and output files are removed with the workspace
+        workspace = create_workspace("ddi_kernels")
+        try:
+            if relations.SLK_PRED in classifiers:
+                logging.info("**Testing SLK classifier %s ..." % (tag,))
+                #testpairdic = ddi_kernels.fromddiDic(testdocs)
+                ddi_kernels.generatejSREdata(pairs, self, basemodel, tag + "ddi_test_jsre.txt", workspace=workspace)
+                ddi_kernels.testjSRE(tag + "ddi_test_jsre.txt", tag + "ddi_test_result.txt",
+                                     model=tag + "all_ddi_train_slk.model", workspace=workspace)
+                self.pairs.pairs = ddi_kernels.getjSREPredicitons(tag + "ddi_test_jsre.txt", tag + "ddi_test_result.txt",
+                                                          self.pairs.pairs, workspace=workspace)
 
-        if relations.SST_PRED in classifiers:
-            logging.info("****Testing SST classifier %s ..." % (tag,))
-            self.pairs.pairs = ddi_kernels.testSVMTK(self, self.pairs.pairs, pairs,
-                                             model=tag + "all_ddi_train_sst.model", tag=tag)
+            if relations.SST_PRED in classifiers:
+                logging.info("****Testing SST classifier %s ..." % (tag,))
+                self.pairs.pairs = ddi_kernels.testSVMTK(self, self.pairs.pairs, pairs,
+                                                 model=tag + "all_ddi_train_sst.model", tag=tag, workspace=workspace)
+        finally:
+            remove_workspace(workspace)
         for p in self.pairs.pairs:
             for r in self.pairs.pairs[p].recognized_by:
                 if self.pairs.pairs[p].recognized_by[r] == 1:
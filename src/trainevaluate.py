@@ -3,7 +3,9 @@ import logging
 import time
 import cPickle as pickle
 from collections import OrderedDict
+from classification.rext.bagstore import BagStore
 from classification.rext.multiinstance import MILClassifier
+from classification.rext.workspace import create_workspace, remove_workspace
 from config.corpus_paths import paths
 from evaluate import get_gold_ann_set, get_list_results, get_relations_results
 from text.corpus import Corpus
@@ -45,8 +47,9 @@ def main():
     with open("corpora/transmir/transmir_relations.txt") as rfile:
         for l in rfile:
             relations.add(tuple(l.strip().split('\t')))
-    with open("temp/mil.train", 'w') as f:
-        f.write("")
+    # training bags of every corpus are appended to the same store, so only one corpus is in memory at a time
+    workspace = create_workspace("mil_train")
+    store = BagStore(workspace + "mil_train.bags", mode="w")
     # train_corpus = Corpus("corpus/" + "&".join(options.goldstd[0]))
     total_entities = 0
     for goldstd in options.train:
@@ -63,16 +66,17 @@ def main():
         train_model = MILClassifier(train_corpus, options.ptype, relations, ner=options.emodels[0])
         train_model.load_kb("corpora/transmir/transmir_relations.txt")
         train_model.generateMILdata(test=False)
-        train_model.write_to_file("temp/mil.train")
+        train_model.write_to_store(store)
         train_model = None
         train_corpus = None
     print "total entities:", total_entities
     train_model = MILClassifier(None, options.ptype, relations, ner=options.emodels[0], generate=False,
                                 modelname=options.rmodels)
     train_model.load_kb("corpora/transmir/transmir_relations.txt")
-    train_model.load_from_file("temp/mil.train")
     #train_model.generateMILdata(test=False)
-    train_model.train()
+    train_model.train(store=store)
+    store.close()
+    remove_workspace(workspace)
 
 
     # test_corpus = Corpus("corpus/" + "&".join(options.goldstd[1]))
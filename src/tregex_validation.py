@@ -0,0 +1,62 @@
+from __future__ import division
+import argparse
+import logging
+import time
+import cPickle as pickle
+
+from classification.rext.mirtex_rules import MirtexClassifier
+from classification.rext.treepatterns import NativeTreeMatcher
+from classification.rext.tregexservice import TregexService
+from config.corpus_paths import paths
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare the native tree pattern matcher with tregex')
+    parser.add_argument("--goldstd", nargs="+", default=["miRTex_dev", "miRTex_test"], choices=paths.keys(),
+                        help="Corpora with the parse trees to be matched")
+    parser.add_argument("--log", action="store", dest="loglevel", default="WARNING", help="Log level")
+    options = parser.parse_args()
+    logging.basicConfig(level=getattr(logging, options.loglevel.upper()),
+                        format='%(asctime)s %(levelname)s %(filename)s:%(lineno)s:%(funcName)s %(message)s')
+
+    rules = MirtexClassifier(None, "miRNA-gene")
+    patterns = list(rules.tregexes_agent | rules.tregexes_theme)
+    trees = []
+    for goldstd in options.goldstd:
+        logging.info("loading corpus %s" % paths[goldstd]["corpus"])
+        corpus = pickle.load(open(paths[goldstd]["corpus"], 'rb'))
+        for sentence in corpus.get_sentences():
+            trees.append(sentence.parsetree.replace("\n", "").replace("  ", ""))
+    print "{} patterns, {} trees".format(len(patterns), len(trees))
+
+    native = NativeTreeMatcher(handles=("tr", "arg"))
+    unsupported = []
+    for p in patterns:
+        if native.compile(p) is None:
+            unsupported.append(p)
+            print "unsupported pattern:", p
+    patterns = [p for p in patterns if p not in unsupported]
+
+    start_time = time.time()
+    native_results = native.match(trees, patterns)
+    native_time = time.time() - start_time
+    tregex = TregexService(handles=("tr", "arg"))
+    start_time = time.time()
+    tregex_results = tregex.match(trees, patterns)
+    tregex_time = time.time() - start_time
+    tregex.close()
+
+    print "pattern\tmatches_tregex\tmatches_native\ttrees_same_output\ttrees_same_set"
+    total_same = 0
+    for p in patterns:
+        same = sum([native_results[i][p] == tregex_results[i][p] for i in range(len(trees))])
+        same_set = sum([set(native_results[i][p]) == set(tregex_results[i][p]) for i in range(len(trees))])
+        total_same += same
+        print "{}\t{}\t{}\t{}\t{}".format(p, sum([len(r[p]) for r in tregex_results]),
+                                          sum([len(r[p]) for r in native_results]), same, same_set)
+    print "agreement: {:.2%} of pattern/tree outputs".format(total_same / max(len(patterns) * len(trees), 1))
+    print "tregex: {:.1f}s, native: {:.1f}s".format(tregex_time, native_time)
+
+
+if __name__ == "__main__":
+    main()